@@ -1,14 +1,18 @@
-from fastapi import FastAPI, Depends, HTTPException, Response
+from fastapi import FastAPI, Depends, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from sqlmodel import SQLModel, Session, select
 from dependencies.auth import get_current_user
 from database import engine, get_session
+from migrations import run_migrations
 from services.security import (
     verify_password,
     create_access_token,
     hash_password
 )
+from services.instrumentacion import InstrumentacionMiddleware, instrumentar_engine
+from services.profiler import ProfilerMiddleware, instrumentar_endpoints
+from services import auditoria
 
 # 👇 IMPORT CLAVE: registra TODOS los modelos
 import models
@@ -18,6 +22,8 @@ from routes.chat_routes import router as chat_router
 from routes.mensaje_routes import router as mensaje_router
 from routes.metrics_routes import router as metrics_routes
 from routes.user_routes import router as user_router
+from routes.internal_routes import router as internal_router
+from routes.audit_routes import router as audit_router
 
 
 app = FastAPI()
@@ -30,6 +36,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# user_actions: cola en memoria + INSERT por lotes (GET /audit/actions)
+app.add_middleware(auditoria.AuditoriaMiddleware)
+# profiler por muestreo, opt-in (header X-Profile de admin o PROFILE_SAMPLE_RATE)
+app.add_middleware(ProfilerMiddleware)
+# latencia por ruta + sentencias SQL por request (GET /internal/metrics)
+app.add_middleware(InstrumentacionMiddleware)
+instrumentar_engine(engine)
+
 
 
 # -------------------------
@@ -38,6 +52,15 @@ app.add_middleware(
 @app.on_event("startup")
 def on_startup():
     SQLModel.metadata.create_all(engine)
+    run_migrations(engine)
+    auditoria.iniciar(engine)
+    # el profiler necesita saber qué thread corre cada endpoint
+    instrumentar_endpoints(app)
+
+
+@app.on_event("shutdown")
+def on_shutdown():
+    auditoria.detener()
 
 
 # -------------------------
@@ -55,6 +78,8 @@ app.include_router(chat_router)
 app.include_router(mensaje_router)
 app.include_router(metrics_routes)
 app.include_router(user_router)
+app.include_router(internal_router)
+app.include_router(audit_router)
 
 # =========================
 # AUTH 
@@ -69,6 +94,7 @@ class LoginRequest(BaseModel):
 @app.post("/login")
 def login(
     data: LoginRequest,
+    request: Request,
     response: Response,
     session: Session = Depends(get_session)
 ):
@@ -76,6 +102,11 @@ def login(
         select(models.User).where(models.User.email == data.email)
     ).first()
 
+    # el request todavía no trae el JWT de este usuario: la auditoría lo toma
+    # de acá (también los intentos fallidos contra una cuenta existente)
+    if user:
+        auditoria.anotar_usuario(request, user_id=user.id, team_id=user.team_id)
+
     if not user or not verify_password(data.password, user.password_hash):
         raise HTTPException(status_code=401, detail="Credenciales inválidas")
 
@@ -0,0 +1,17 @@
+# path: benchmarks/__init__.py
+"""
+Benchmarks reproducibles del import de chats y de las consultas de métricas.
+
+- generador: exports de WhatsApp sintéticos (ZIP) con cantidad de mensajes,
+  proporción de mensajes multilínea, adjuntos y formato/locale configurables.
+- importar: corre parseo, resolución de adjuntos, score y el import completo
+  contra SQLite o Postgres y guarda los resultados en JSON para comparar
+  entre commits.
+- semilla_metricas + metricas: un team grande sintético en Postgres y los
+  endpoints de /metrics cronometrados, con EXPLAIN ANALYZE y regresiones
+  marcadas contra un JSON base.
+
+    python -m benchmarks.importar --mensajes 50000 --adjuntos 500 --salida bench.json
+    python -m benchmarks.semilla_metricas --chats 100000 --mensajes 10000000
+    python -m benchmarks.metricas --comparar base.json
+"""
@@ -0,0 +1,218 @@
+# path: benchmarks/generador.py
+"""
+Exports de WhatsApp sintéticos para benchmarks: un ZIP con el .txt del chat
+y los adjuntos que nombra, igual que los que sube la UI.
+
+Todo sale de `semilla`: la misma config genera byte a byte el mismo ZIP, así
+dos commits se comparan contra la misma entrada.
+
+    python -m benchmarks.generador --mensajes 100000 --adjuntos 1000 --locale en_ios /tmp/chat.zip
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import zipfile
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+
+AUTOR_PROPIO = "Ventas Fibra"
+
+# el nombre del ZIP siempre con el prefijo en español: es el que reconoce
+# classify_whatsapp_filename (un contacto sin agendar => se calcula el score)
+PREFIJO_ARCHIVO = "Chat de WhatsApp con "
+
+# día > 12 en las primeras líneas: detectar_orden_fecha resuelve dmy/mdy sin ambigüedad
+FECHA_INICIO = datetime(2026, 1, 15, 9, 0, 0)
+
+_BLOQUE = 1024 * 1024
+
+_PALABRAS = (
+    "hola", "buen", "día", "gracias", "sí", "no", "dale", "perfecto", "mañana", "tarde",
+    "casa", "barrio", "calle", "vecino", "técnico", "horario", "mensaje", "ahora", "después",
+    "bueno", "consulta", "quería", "saber", "tienen", "servicio", "hoy", "ok", "listo",
+)
+# palabras que disparan reglas de calcular_score_chat
+_PALABRAS_SCORE = ("precio", "fibra", "megas", "instalación", "cobertura", "urgente", "wifi", "plan")
+
+# (tipo, extensión, peso, prefijo android, etiqueta ios)
+_ADJUNTOS = (
+    ("imagen", "jpg", 50, "IMG", "PHOTO"),
+    ("audio", "opus", 30, "PTT", "AUDIO"),
+    ("video", "mp4", 10, "VID", "VIDEO"),
+    ("documento", "pdf", 10, "DOC", "DOCUMENT"),
+)
+
+
+def _hora_12(fecha: datetime) -> tuple[int, str]:
+    return (fecha.hour % 12 or 12), ("AM" if fecha.hour < 12 else "PM")
+
+
+def _android_es(fecha: datetime) -> str:
+    return f"{fecha:%d/%m/%Y}, {fecha:%H:%M} - "
+
+
+def _android_es_12h(fecha: datetime) -> str:
+    # Android en es-AR con reloj de 12 h: "p. m." precedido de un espacio angosto
+    hora, meridiano = _hora_12(fecha)
+    return f"{fecha:%d/%m/%Y}, {hora}:{fecha:%M} {meridiano[0].lower()}. m. - "
+
+
+def _android_en(fecha: datetime) -> str:
+    hora, meridiano = _hora_12(fecha)
+    return f"{fecha.month}/{fecha.day}/{fecha:%y}, {hora}:{fecha:%M} {meridiano} - "
+
+
+def _ios_es(fecha: datetime) -> str:
+    return f"[{fecha:%d/%m/%y}, {fecha:%H:%M:%S}] "
+
+
+def _ios_en(fecha: datetime) -> str:
+    hora, meridiano = _hora_12(fecha)
+    return f"[{fecha.month}/{fecha.day}/{fecha:%y}, {hora}:{fecha:%M:%S} {meridiano}] "
+
+
+# locale -> (fecha/hora al principio de cada mensaje, texto de un adjunto, aviso de cifrado)
+LOCALES = {
+    "es_android": (_android_es, "{} (archivo adjunto)",
+                   "Los mensajes y las llamadas están cifrados de extremo a extremo."),
+    "es_android_12h": (_android_es_12h, "{} (archivo adjunto)",
+                       "Los mensajes y las llamadas están cifrados de extremo a extremo."),
+    "en_android": (_android_en, "{} (file attached)",
+                   "Messages and calls are end-to-end encrypted."),
+    "es_ios": (_ios_es, "\u200e<adjunto: {}>",
+               "\u200eLos mensajes y las llamadas están cifrados de extremo a extremo."),
+    "en_ios": (_ios_en, "\u200e<attached: {}>",
+               "\u200eMessages and calls are end-to-end encrypted."),
+}
+
+
+@dataclass(frozen=True)
+class ConfigExport:
+    mensajes: int = 10_000
+    # proporción de mensajes con más de una línea
+    multilinea: float = 0.1
+    adjuntos: int = 100
+    # tamaño medio de cada adjunto (cada uno sale entre 0.5x y 1.5x)
+    bytes_adjunto: int = 100_000
+    locale: str = "es_android"
+    contacto: str = "+54 9 261 555-0100"
+    semilla: int = 1
+
+    def __post_init__(self):
+        if self.locale not in LOCALES:
+            raise ValueError(f"locale desconocido: {self.locale!r} (opciones: {', '.join(LOCALES)})")
+        if not 0 <= self.adjuntos <= self.mensajes:
+            raise ValueError("adjuntos tiene que estar entre 0 y mensajes")
+
+
+@dataclass
+class ResumenExport:
+    path: str
+    lineas: int = 0
+    bytes_txt: int = 0
+    adjuntos: int = 0
+    bytes_adjuntos: int = 0
+
+
+def nombre_archivo(config: ConfigExport) -> str:
+    return f"{PREFIJO_ARCHIVO}{config.contacto}.zip"
+
+
+def _texto(rnd: random.Random) -> str:
+    palabras = rnd.choices(_PALABRAS, k=rnd.randint(2, 14))
+    if rnd.random() < 0.05:
+        palabras.insert(rnd.randrange(len(palabras) + 1), rnd.choice(_PALABRAS_SCORE))
+    return " ".join(palabras)
+
+
+def _nombre_adjunto(rnd: random.Random, config: ConfigExport, n: int, fecha: datetime) -> str:
+    _, ext, _, android, ios = rnd.choices(_ADJUNTOS, weights=[a[2] for a in _ADJUNTOS])[0]
+    if config.locale.endswith("_ios"):
+        return f"{n:08d}-{ios}-{fecha:%Y-%m-%d-%H-%M-%S}.{ext}"
+    return f"{android}-{fecha:%Y%m%d}-WA{n:04d}.{ext}"
+
+
+def _escribir_adjunto(zf: zipfile.ZipFile, nombre: str, size: int, rnd: random.Random) -> None:
+    # por bloques: el tamaño total no depende de la RAM; STORED como WhatsApp
+    with zf.open(zipfile.ZipInfo(nombre, date_time=FECHA_INICIO.timetuple()[:6]), "w", force_zip64=True) as f:
+        restante = size
+        while restante > 0:
+            n = min(_BLOQUE, restante)
+            f.write(rnd.randbytes(n))
+            restante -= n
+
+
+def generar_zip(destino: str | Path, config: ConfigExport) -> ResumenExport:
+    """Escribe el export en `destino` (un .zip) y devuelve qué quedó adentro."""
+    rnd = random.Random(config.semilla)
+    cabecera, formato_adjunto, aviso = LOCALES[config.locale]
+    con_adjunto = set(rnd.sample(range(config.mensajes), config.adjuntos))
+    destino = Path(destino)
+    resumen = ResumenExport(path=str(destino))
+
+    # el aviso de cifrado va sin autor: es un mensaje del sistema
+    lineas = [cabecera(FECHA_INICIO) + aviso]
+    adjuntos: list[tuple[str, int]] = []
+    fecha = FECHA_INICIO
+    for i in range(config.mensajes):
+        fecha += timedelta(seconds=rnd.randint(5, 600))
+        autor = config.contacto if rnd.random() < 0.5 else AUTOR_PROPIO
+        if i in con_adjunto:
+            nombre = _nombre_adjunto(rnd, config, len(adjuntos) + 1, fecha)
+            size = rnd.randint(config.bytes_adjunto // 2, config.bytes_adjunto * 3 // 2)
+            adjuntos.append((nombre, size))
+            texto = formato_adjunto.format(nombre)
+        else:
+            texto = _texto(rnd)
+            if rnd.random() < config.multilinea:
+                texto += "".join("\n" + _texto(rnd) for _ in range(rnd.randint(1, 4)))
+        lineas.append(f"{cabecera(fecha)}{autor}: {texto}")
+
+    txt = "\n".join(lineas) + "\n"
+    resumen.lineas = txt.count("\n")
+    resumen.bytes_txt = len(txt.encode("utf-8"))
+
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    with zipfile.ZipFile(destino, "w") as zf:
+        zf.writestr(
+            zipfile.ZipInfo(nombre_archivo(config)[:-4] + ".txt", date_time=FECHA_INICIO.timetuple()[:6]),
+            txt,
+            compress_type=zipfile.ZIP_DEFLATED,
+        )
+        for nombre, size in adjuntos:
+            _escribir_adjunto(zf, nombre, size, rnd)
+            resumen.adjuntos += 1
+            resumen.bytes_adjuntos += size
+    return resumen
+
+
+def argumentos_config(parser: argparse.ArgumentParser) -> None:
+    """Opciones de ConfigExport (las comparte benchmarks.importar)."""
+    base = ConfigExport()
+    parser.add_argument("--mensajes", type=int, default=base.mensajes)
+    parser.add_argument("--multilinea", type=float, default=base.multilinea)
+    parser.add_argument("--adjuntos", type=int, default=base.adjuntos)
+    parser.add_argument("--bytes-adjunto", type=int, default=base.bytes_adjunto)
+    parser.add_argument("--locale", choices=sorted(LOCALES), default=base.locale)
+    parser.add_argument("--semilla", type=int, default=base.semilla)
+
+
+def config_desde_args(args: argparse.Namespace) -> ConfigExport:
+    return ConfigExport(
+        mensajes=args.mensajes,
+        multilinea=args.multilinea,
+        adjuntos=args.adjuntos,
+        bytes_adjunto=args.bytes_adjunto,
+        locale=args.locale,
+        semilla=args.semilla,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera un export de WhatsApp sintético")
+    argumentos_config(parser)
+    parser.add_argument("destino")
+    args = parser.parse_args()
+    print(asdict(generar_zip(args.destino, config_desde_args(args))))
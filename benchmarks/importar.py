@@ -0,0 +1,305 @@
+# path: benchmarks/importar.py
+"""
+Benchmark del import de chats sobre un export sintético (benchmarks.generador).
+
+Etapas (cada corrida en un proceso nuevo, así el pico de RSS es de esa etapa):
+- parseo: parsear_chat del .txt
+- adjuntos: index_extracted_files + resolve_message_attachments de cada mensaje
+- score: calcular_score_chat con los mensajes del cliente
+- import: importar_chat_controller completo (ZIP -> DB + media), contando
+  las sentencias que llegan a la DB
+
+Sin --db cada corrida del import usa un SQLite nuevo. Con --db (Postgres) las
+corridas reimportan el mismo ZIP sobre la misma base: usar una base
+descartable. La media va siempre a un directorio temporal; miniaturas y
+audios en segundo plano quedan apagados (THUMBS_ON_IMPORT / AUDIO_ON_IMPORT)
+salvo que se pidan por env.
+
+    python -m benchmarks.importar --mensajes 50000 --adjuntos 500 --salida bench.json
+    python -m benchmarks.importar --mensajes 50000 --adjuntos 500 --comparar bench.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict
+
+from benchmarks import resultados
+from benchmarks.generador import (
+    ConfigExport,
+    argumentos_config,
+    config_desde_args,
+    generar_zip,
+    nombre_archivo,
+)
+
+ETAPAS = ("parseo", "adjuntos", "score", "import")
+REPETICIONES = 3
+# formato del JSON de resultados (subirlo si cambia lo que significa un campo)
+VERSION_RESULTADOS = 1
+
+TEAM_BENCHMARK = "benchmark"
+
+
+def _rss_pico_mb() -> float | None:
+    try:
+        import resource
+    except ImportError:  # pragma: no cover - Windows
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux: KiB, macOS: bytes
+    return round(pico / (1024 ** 2 if sys.platform == "darwin" else 1024), 1)
+
+
+def _extraer(zip_path: str, destino: str) -> str:
+    with zipfile.ZipFile(zip_path) as zf:
+        zf.extractall(destino)
+        return os.path.join(destino, next(n for n in zf.namelist() if n.lower().endswith(".txt")))
+
+
+def _cronometrar(fn) -> dict:
+    rss_antes = _rss_pico_mb()
+    t0 = time.perf_counter()
+    unidades, extra = fn()
+    segundos = time.perf_counter() - t0
+    return {
+        "segundos": segundos,
+        "unidades": unidades,
+        "rss_antes_mb": rss_antes,
+        "rss_pico_mb": _rss_pico_mb(),
+        **extra,
+    }
+
+
+# -------------------------
+# Etapas (corren en el proceso hijo)
+# -------------------------
+
+def _etapa_parseo(zip_path: str, workdir: str, config: ConfigExport, db_url: str | None) -> dict:
+    from parser import parsear_chat
+
+    txt = _extraer(zip_path, workdir)
+    return _cronometrar(lambda: (len(parsear_chat(txt)), {}))
+
+
+def _etapa_adjuntos(zip_path: str, workdir: str, config: ConfigExport, db_url: str | None) -> dict:
+    from parser import parsear_chat
+    from services.storage_service import index_extracted_files, resolve_message_attachments
+
+    txt = _extraer(zip_path, workdir)
+    mensajes = parsear_chat(txt)
+
+    def correr():
+        index = index_extracted_files(workdir, chat_txt_path=txt)
+        encontrados = sum(
+            len(resolve_message_attachments(message_text=(m.mensaje or "").strip(), extracted_index=index))
+            for m in mensajes
+        )
+        return len(mensajes), {"adjuntos_encontrados": encontrados}
+
+    return _cronometrar(correr)
+
+
+def _etapa_score(zip_path: str, workdir: str, config: ConfigExport, db_url: str | None) -> dict:
+    from parser import parsear_chat
+    from services.chat_scoring_service import calcular_score_chat
+
+    txt = _extraer(zip_path, workdir)
+    # lo mismo que arma el import: texto del cliente, en minúsculas
+    cliente = [
+        {"mensaje": m.mensaje.strip().lower()}
+        for m in parsear_chat(txt)
+        if m.usuario == config.contacto and m.mensaje.strip()
+    ]
+
+    def correr():
+        eventos = calcular_score_chat(cliente)
+        return len(cliente), {"score_eventos": len(eventos)}
+
+    return _cronometrar(correr)
+
+
+def _etapa_import(zip_path: str, workdir: str, config: ConfigExport, db_url: str | None) -> dict:
+    from fastapi import UploadFile
+    from sqlalchemy import create_engine, event
+    from sqlmodel import Session, SQLModel, select
+
+    import models  # noqa: F401 - registra todas las tablas
+    from migrations import run_migrations
+    from models.team import Team
+    from services.chat_service import importar_chat_controller
+
+    engine = create_engine(db_url or f"sqlite:///{os.path.join(workdir, 'bench.db')}")
+    SQLModel.metadata.create_all(engine)
+    run_migrations(engine)
+    with Session(engine) as session:
+        team = session.exec(select(Team).where(Team.nombre == TEAM_BENCHMARK)).first()
+        if team is None:
+            team = Team(nombre=TEAM_BENCHMARK)
+            session.add(team)
+            session.commit()
+            session.refresh(team)
+        team_id = team.id
+
+    sentencias = 0
+
+    def contar(*_):
+        nonlocal sentencias
+        sentencias += 1
+
+    # un executemany cuenta una vez: es lo que viaja a la DB como un pedido
+    event.listen(engine, "before_cursor_execute", contar)
+
+    def correr():
+        with open(zip_path, "rb") as f, Session(engine) as session:
+            resultado = importar_chat_controller(
+                UploadFile(file=f, filename=nombre_archivo(config)), team_id, 0, session)
+        return resultado["mensajes_guardados"], {
+            "archivos_guardados": resultado["archivos_guardados"],
+            "media_mb_s": resultado["media_mb_s"],
+        }
+
+    medicion = _cronometrar(correr)
+    medicion["sentencias_db"] = sentencias
+    engine.dispose()
+    return medicion
+
+
+_FUNCIONES = {
+    "parseo": _etapa_parseo,
+    "adjuntos": _etapa_adjuntos,
+    "score": _etapa_score,
+    "import": _etapa_import,
+}
+
+
+def _correr_etapa(etapa: str, zip_path: str, workdir: str, config: ConfigExport, db_url: str | None) -> dict:
+    os.makedirs(workdir, exist_ok=True)
+    # antes de importar storage_service: la media nunca va al MEDIA_ROOT real
+    os.environ["MEDIA_ROOT"] = os.path.join(workdir, "media")
+    os.environ.setdefault("THUMBS_ON_IMPORT", "0")
+    os.environ.setdefault("AUDIO_ON_IMPORT", "0")
+    try:
+        return _FUNCIONES[etapa](zip_path, workdir, config, db_url)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+# -------------------------
+# Resultados
+# -------------------------
+
+def _resumir(corridas: list[dict]) -> dict:
+    segundos = [c["segundos"] for c in corridas]
+    unidades = corridas[0]["unidades"]
+    resumen = {
+        "unidades": unidades,
+        "segundos": [round(s, 4) for s in segundos],
+        "segundos_min": round(min(segundos), 4),
+        "segundos_mediana": round(statistics.median(segundos), 4),
+        "por_segundo": round(unidades / (min(segundos) or 1e-9), 1),
+        "rss_pico_mb": None,
+        "rss_etapa_mb": None,
+    }
+    if corridas[0]["rss_pico_mb"] is not None:
+        resumen["rss_pico_mb"] = max(c["rss_pico_mb"] for c in corridas)
+        resumen["rss_etapa_mb"] = max(round(c["rss_pico_mb"] - c["rss_antes_mb"], 1) for c in corridas)
+    # lo propio de cada etapa (sentencias, adjuntos...) es igual en todas las corridas
+    ignorar = {"segundos", "unidades", "rss_antes_mb", "rss_pico_mb"}
+    resumen.update({k: v for k, v in corridas[0].items() if k not in ignorar})
+    return resumen
+
+
+def correr_benchmark(
+    config: ConfigExport,
+    *,
+    db_url: str | None = None,
+    etapas: tuple[str, ...] = ETAPAS,
+    repeticiones: int = REPETICIONES,
+) -> dict:
+    base = tempfile.mkdtemp(prefix="bench_import_")
+    try:
+        t0 = time.perf_counter()
+        export = generar_zip(os.path.join(base, nombre_archivo(config)), config)
+        generacion = time.perf_counter() - t0
+
+        etapas_resumen = {}
+        contexto = multiprocessing.get_context("spawn")
+        for etapa in etapas:
+            corridas = []
+            for n in range(repeticiones):
+                # un proceso por corrida: RSS y caches arrancan de cero
+                with ProcessPoolExecutor(max_workers=1, mp_context=contexto) as pool:
+                    corridas.append(pool.submit(
+                        _correr_etapa, etapa, export.path, os.path.join(base, f"{etapa}_{n}"), config, db_url,
+                    ).result())
+            etapas_resumen[etapa] = _resumir(corridas)
+    finally:
+        shutil.rmtree(base, ignore_errors=True)
+
+    export_dict = asdict(export)
+    export_dict.pop("path")
+    return {
+        **resultados.metadatos(VERSION_RESULTADOS),
+        "db": resultados.dialecto(db_url),
+        "repeticiones": repeticiones,
+        "config": asdict(config),
+        "export": {**export_dict, "segundos_generacion": round(generacion, 3)},
+        "etapas": etapas_resumen,
+    }
+
+
+def comparar(base: dict, actual: dict) -> str:
+    """Tabla de texto base vs actual por etapa (tiempo mínimo, RSS, sentencias)."""
+    lineas = [f"base {base.get('commit')} ({base.get('db')})  ->  actual {actual.get('commit')} ({actual.get('db')})"]
+    if base.get("config") != actual.get("config"):
+        lineas.append("ATENCIÓN: la config del export no es la misma, los números no son comparables")
+    lineas.append(f"{'etapa':<10}{'métrica':<16}{'base':>12}{'actual':>12}{'cambio':>10}")
+    for etapa, actual_etapa in actual["etapas"].items():
+        base_etapa = base.get("etapas", {}).get(etapa)
+        if not base_etapa:
+            continue
+        for metrica in ("segundos_min", "por_segundo", "rss_pico_mb", "sentencias_db"):
+            a, b = actual_etapa.get(metrica), base_etapa.get(metrica)
+            if a is None or b is None:
+                continue
+            lineas.append(f"{etapa:<10}{metrica:<16}{b:>12}{a:>12}{resultados.cambio(b, a):>10}")
+    return "\n".join(lineas)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark del import de chats con un export sintético")
+    argumentos_config(parser)
+    parser.add_argument("--db", default=None, help="URL de SQLAlchemy (default: SQLite nuevo por corrida)")
+    parser.add_argument("--etapas", default=",".join(ETAPAS), help=f"separadas por coma ({', '.join(ETAPAS)})")
+    parser.add_argument("--repeticiones", type=int, default=REPETICIONES)
+    parser.add_argument("--salida", default=None, help="guarda el JSON de resultados")
+    parser.add_argument("--comparar", default=None, help="JSON de una corrida anterior")
+    args = parser.parse_args()
+
+    etapas = tuple(e.strip() for e in args.etapas.split(",") if e.strip())
+    desconocidas = set(etapas) - set(ETAPAS)
+    if desconocidas:
+        parser.error(f"etapas desconocidas: {', '.join(sorted(desconocidas))}")
+
+    resultado = correr_benchmark(
+        config_desde_args(args),
+        db_url=args.db,
+        etapas=etapas,
+        repeticiones=max(1, args.repeticiones),
+    )
+    if args.salida:
+        resultados.guardar(args.salida, resultado)
+    else:
+        print(json.dumps(resultado, ensure_ascii=False, indent=2))
+    if args.comparar:
+        print(comparar(resultados.cargar(args.comparar), resultado))
@@ -0,0 +1,228 @@
+# path: benchmarks/metricas.py
+"""
+Benchmark de los endpoints de /metrics sobre un team cargado con
+benchmarks.semilla_metricas (Postgres).
+
+Por cada consulta: una corrida de calentamiento, N corridas cronometradas
+(las mismas funciones que llaman las rutas) y una corrida más en la que se
+guarda cada SQL emitido para sacarle EXPLAIN (ANALYZE, BUFFERS). Con
+--comparar se marcan regresiones contra un JSON anterior: mediana más lenta
+que --umbral (y por más de --minimo-ms), más sentencias, o un Seq Scan nuevo.
+Sale con código 1 si hay regresiones (sirve para CI).
+
+    python -m benchmarks.metricas --db postgresql://... --salida base.json
+    python -m benchmarks.metricas --db postgresql://... --comparar base.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+from sqlalchemy import create_engine, event, text
+from sqlmodel import Session
+
+from benchmarks import resultados
+from benchmarks.semilla_metricas import PREFIJO_TEAM, resumen_team
+
+REPETICIONES = 5
+UMBRAL_REGRESION = 0.25
+MINIMO_MS = 5.0
+VERSION_RESULTADOS = 1
+
+CATEGORIAS = ("interesado", "potencial_venta", "perdido", "cliente", "no_cliente")
+
+
+def _consultas() -> dict:
+    """nombre -> fn(session, team_id), lo mismo que ejecuta cada ruta de /metrics."""
+    from controllers.metrics_controller import obtener_chats_por_categoria, obtener_metricas
+    from services.metrics.timeseries_metrics_service import get_timeseries
+
+    consultas = {
+        "dashboard": lambda s, t: obtener_metricas(team_id=t, session=s),
+    }
+    for dias in (7, 90, 365):
+        consultas[f"timeseries_{dias}d"] = lambda s, t, dias=dias: get_timeseries(team_id=t, session=s, days=dias)
+    for categoria in CATEGORIAS:
+        consultas[f"lista_{categoria}"] = lambda s, t, categoria=categoria: obtener_chats_por_categoria(
+            team_id=t, session=s, categoria=categoria, q=None, limit=50, offset=0)
+    consultas["lista_busqueda"] = lambda s, t: obtener_chats_por_categoria(
+        team_id=t, session=s, categoria="no_cliente", q="12", limit=50, offset=0)
+    consultas["lista_pagina_profunda"] = lambda s, t: obtener_chats_por_categoria(
+        team_id=t, session=s, categoria="no_cliente", q=None, limit=50, offset=5_000)
+    return consultas
+
+
+# -------------------------
+# Planes
+# -------------------------
+
+def _nodos(plan: dict):
+    yield plan
+    for hijo in plan.get("Plans", []):
+        yield from _nodos(hijo)
+
+
+def _explicar(conn, sql: str, parametros) -> dict:
+    salida = conn.exec_driver_sql(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}", parametros).scalar()
+    explain = (json.loads(salida) if isinstance(salida, str) else salida)[0]
+    plan = explain["Plan"]
+    return {
+        "sql": sql,
+        "ms_ejecucion": round(explain["Execution Time"], 3),
+        "ms_planeo": round(explain["Planning Time"], 3),
+        "bloques_leidos": plan.get("Shared Read Blocks", 0),
+        "bloques_en_cache": plan.get("Shared Hit Blocks", 0),
+        "seq_scans": sorted({n["Relation Name"] for n in _nodos(plan) if n["Node Type"] == "Seq Scan"}),
+        "plan": plan,
+    }
+
+
+# -------------------------
+# Corrida
+# -------------------------
+
+def _medir(engine, team_id: int, fn, repeticiones: int) -> dict:
+    sentencias: list[tuple[str, object]] = []
+
+    def registrar(conn, cursor, statement, parameters, context, executemany):
+        sentencias.append((statement, parameters))
+
+    with Session(engine) as session:
+        fn(session, team_id)  # calentamiento (cache de la DB y de SQLAlchemy)
+
+    tiempos = []
+    for _ in range(repeticiones):
+        with Session(engine) as session:
+            t0 = time.perf_counter()
+            fn(session, team_id)
+            tiempos.append((time.perf_counter() - t0) * 1000)
+
+    event.listen(engine, "before_cursor_execute", registrar)
+    try:
+        with Session(engine) as session:
+            fn(session, team_id)
+    finally:
+        event.remove(engine, "before_cursor_execute", registrar)
+
+    with engine.connect() as conn:
+        planes = [_explicar(conn, sql, parametros) for sql, parametros in sentencias]
+        conn.rollback()
+
+    return {
+        "ms": [round(t, 3) for t in tiempos],
+        "ms_min": round(min(tiempos), 3),
+        "ms_mediana": round(statistics.median(tiempos), 3),
+        "sentencias": len(sentencias),
+        "planes": planes,
+    }
+
+
+def _team_por_defecto(conn) -> int | None:
+    return conn.execute(
+        text("SELECT max(id) FROM team WHERE nombre LIKE :p"), {"p": f"{PREFIJO_TEAM}%"}
+    ).scalar()
+
+
+def correr_benchmark(db_url: str, *, team_id: int | None = None, repeticiones: int = REPETICIONES,
+                     solo: list[str] | None = None) -> dict:
+    engine = create_engine(db_url)
+    if engine.dialect.name != "postgresql":
+        raise RuntimeError("benchmarks.metricas necesita Postgres (EXPLAIN ANALYZE en JSON)")
+
+    with engine.connect() as conn:
+        team_id = team_id or _team_por_defecto(conn)
+        if team_id is None:
+            raise RuntimeError("no hay team de benchmark: correr antes benchmarks.semilla_metricas")
+        servidor = conn.execute(text("SHOW server_version")).scalar()
+        team = resumen_team(conn, team_id)
+
+    consultas = {}
+    for nombre, fn in _consultas().items():
+        if solo and nombre not in solo:
+            continue
+        consultas[nombre] = _medir(engine, team_id, fn, repeticiones)
+    engine.dispose()
+
+    return {
+        **resultados.metadatos(VERSION_RESULTADOS),
+        "db": "postgresql",
+        "servidor": servidor,
+        "team": team,
+        "repeticiones": repeticiones,
+        "consultas": consultas,
+    }
+
+
+def detectar_regresiones(base: dict, actual: dict, *, umbral: float = UMBRAL_REGRESION,
+                         minimo_ms: float = MINIMO_MS) -> list[str]:
+    regresiones = []
+    for nombre, a in actual["consultas"].items():
+        b = base.get("consultas", {}).get(nombre)
+        if not b:
+            continue
+        if a["ms_mediana"] > b["ms_mediana"] * (1 + umbral) and a["ms_mediana"] - b["ms_mediana"] > minimo_ms:
+            regresiones.append(
+                f"{nombre}: mediana {b['ms_mediana']} -> {a['ms_mediana']} ms "
+                f"({resultados.cambio(b['ms_mediana'], a['ms_mediana'])})")
+        if a["sentencias"] > b["sentencias"]:
+            regresiones.append(f"{nombre}: sentencias {b['sentencias']} -> {a['sentencias']}")
+        seq_antes = {t for p in b["planes"] for t in p["seq_scans"]}
+        seq_nuevos = {t for p in a["planes"] for t in p["seq_scans"]} - seq_antes
+        if seq_nuevos:
+            regresiones.append(f"{nombre}: Seq Scan nuevo sobre {', '.join(sorted(seq_nuevos))}")
+    return regresiones
+
+
+def comparar(base: dict, actual: dict) -> str:
+    lineas = [f"base {base.get('commit')}  ->  actual {actual.get('commit')}"]
+    dataset = ("chats", "mensajes", "clientes")
+    if [base.get("team", {}).get(k) for k in dataset] != [actual["team"].get(k) for k in dataset]:
+        lineas.append("ATENCIÓN: el team no tiene los mismos datos, los números no son comparables")
+    lineas.append(f"{'consulta':<26}{'base ms':>12}{'actual ms':>12}{'cambio':>10}")
+    for nombre, a in actual["consultas"].items():
+        b = base.get("consultas", {}).get(nombre)
+        if b:
+            lineas.append(
+                f"{nombre:<26}{b['ms_mediana']:>12}{a['ms_mediana']:>12}"
+                f"{resultados.cambio(b['ms_mediana'], a['ms_mediana']):>10}")
+    return "\n".join(lineas)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de las consultas de /metrics")
+    parser.add_argument("--db", default=os.getenv("DATABASE_URL"), help="URL de Postgres (default: DATABASE_URL)")
+    parser.add_argument("--team-id", type=int, default=None,
+                        help=f"default: el último team '{PREFIJO_TEAM}*' cargado")
+    parser.add_argument("--repeticiones", type=int, default=REPETICIONES)
+    parser.add_argument("--solo", default=None, help="consultas separadas por coma")
+    parser.add_argument("--salida", default=None, help="guarda el JSON de resultados")
+    parser.add_argument("--comparar", default=None, help="JSON base contra el que marcar regresiones")
+    parser.add_argument("--umbral", type=float, default=UMBRAL_REGRESION)
+    parser.add_argument("--minimo-ms", type=float, default=MINIMO_MS)
+    args = parser.parse_args()
+    if not args.db:
+        parser.error("falta --db (o DATABASE_URL)")
+
+    resultado = correr_benchmark(
+        args.db,
+        team_id=args.team_id,
+        repeticiones=max(1, args.repeticiones),
+        solo=[s.strip() for s in args.solo.split(",")] if args.solo else None,
+    )
+    if args.salida:
+        resultados.guardar(args.salida, resultado)
+    if not args.comparar:
+        for nombre, consulta in resultado["consultas"].items():
+            print(f"{nombre:<26}{consulta['ms_mediana']:>10} ms  {consulta['sentencias']} sentencias")
+        sys.exit(0)
+
+    base = resultados.cargar(args.comparar)
+    print(comparar(base, resultado))
+    regresiones = detectar_regresiones(base, resultado, umbral=args.umbral, minimo_ms=args.minimo_ms)
+    for r in regresiones:
+        print("REGRESIÓN", r)
+    sys.exit(1 if regresiones else 0)
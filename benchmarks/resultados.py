@@ -0,0 +1,56 @@
+# path: benchmarks/resultados.py
+"""Lo común a los JSON de resultados de los benchmarks (metadatos y archivos)."""
+from __future__ import annotations
+
+import json
+import os
+import platform
+import subprocess
+from datetime import datetime, timezone
+from pathlib import Path
+
+
+def commit_actual() -> str | None:
+    """`git describe --always --dirty` del repo (None fuera de git)."""
+    try:
+        out = subprocess.run(
+            ["git", "describe", "--always", "--dirty"],
+            cwd=Path(__file__).resolve().parents[1], capture_output=True, text=True, timeout=10,
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    return out.stdout.strip() or None
+
+
+def dialecto(db_url: str | None) -> str:
+    # solo el dialecto: la URL puede tener contraseña
+    if not db_url:
+        return "sqlite"
+    from sqlalchemy.engine import make_url
+
+    return make_url(db_url).get_backend_name()
+
+
+def metadatos(version: int) -> dict:
+    return {
+        "version": version,
+        "commit": commit_actual(),
+        "fecha": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def guardar(path: str, resultado: dict) -> None:
+    Path(path).write_text(json.dumps(resultado, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+def cargar(path: str) -> dict:
+    return json.loads(Path(path).read_text(encoding="utf-8"))
+
+
+def cambio(base: float | None, actual: float | None) -> str:
+    if base is None or actual is None:
+        return "-"
+    return f"{(actual - base) / base * 100:+.1f}%" if base else "-"
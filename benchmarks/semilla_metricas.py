@@ -0,0 +1,228 @@
+# path: benchmarks/semilla_metricas.py
+"""
+Carga un team grande y sintético para medir services/metrics (Postgres).
+
+Todo se genera en la DB con generate_series, por bloques de chats (un
+INSERT ... SELECT encadenado por bloque: contactos -> chats -> mensajes), así
+10M de mensajes no pasan por Python. Cada corrida crea un team nuevo; para
+tener "vecinos" (otros teams en las mismas tablas, como en producción) se
+corre varias veces.
+
+Distribuciones (lo que hace que los planes se parezcan a los reales):
+- mensajes por chat: exponencial (muchos chats cortos, pocos muy largos)
+- score: sesgado hacia abajo (--sesgo-score; 1 = uniforme entre -4 y 20)
+- clientes (contacto.estado = 1): score 0 y sin pipeline, como en el import
+- creado_en: uniforme en los últimos --dias
+
+    python -m benchmarks.semilla_metricas --db postgresql://... --chats 100000 --mensajes 10000000
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import time
+from dataclasses import asdict, dataclass
+
+from sqlalchemy import create_engine, text
+from sqlmodel import SQLModel
+
+PREFIJO_TEAM = "benchmark-metricas"
+
+# chats por INSERT encadenado (y por commit)
+SEMILLA_LOTE = 5_000
+
+# si la tabla está vacía: rangos de score para determinar_pipeline
+# (0..4 queda sin pipeline: "tibio")
+PIPELINE_DEFAULT = (
+    ("Perdido", -1000, -1),
+    ("Interesado", 5, 9),
+    ("Potencial venta", 10, 1000),
+)
+
+_PALABRAS = (
+    "hola", "precio?", "gracias", "cuánto sale el plan", "tienen fibra en mi barrio",
+    "dale", "mañana a la tarde", "ok", "perfecto", "no me interesa", "cuántos megas",
+)
+
+
+@dataclass(frozen=True)
+class ConfigSemilla:
+    chats: int = 100_000
+    mensajes: int = 10_000_000
+    # proporción de contactos agendados (estado = 1)
+    clientes: float = 0.2
+    dias: int = 365
+    sesgo_score: float = 3.0
+    semilla: int = 1
+
+    def __post_init__(self):
+        if self.chats < 1 or self.mensajes < self.chats:
+            raise ValueError("hace falta al menos un chat y un mensaje por chat")
+        if not 0 <= self.clientes <= 1:
+            raise ValueError("clientes es una proporción (0..1)")
+
+
+def _asegurar_pipeline(conn) -> None:
+    if conn.execute(text("SELECT count(*) FROM pipeline_estado")).scalar():
+        return
+    for nombre, score_min, score_max in PIPELINE_DEFAULT:
+        conn.execute(
+            text("INSERT INTO pipeline_estado (nombre, score_min, score_max) VALUES (:n, :a, :b)"),
+            {"n": nombre, "a": score_min, "b": score_max},
+        )
+
+
+# Un bloque de chats [desde, hasta]: cada CTE inserta y pasa los ids al siguiente.
+# random() se llama por fila; setseed() al principio de la conexión hace que
+# la misma config genere los mismos datos.
+_SQL_BLOQUE = text("""
+WITH numeros AS (
+    SELECT
+        g,
+        lpad(g::text, 7, '0') AS sufijo,
+        random() < :clientes AS cliente,
+        random() AS r_score,
+        random() AS r_fecha,
+        random() AS r_mensajes
+    FROM generate_series(:desde, :hasta) AS g
+),
+contactos AS (
+    INSERT INTO contacto (team_id, nombre, telefono, telefono_key, telefono_rev, estado, created_at)
+    SELECT
+        :team_id,
+        CASE WHEN cliente THEN 'Cliente ' || g ELSE '+549261' || sufijo END,
+        '+549261' || sufijo,
+        '+54261' || sufijo,
+        reverse('549261' || sufijo),
+        CASE WHEN cliente THEN 1 ELSE 0 END,
+        now()
+    FROM numeros
+    RETURNING id, telefono, estado
+),
+datos AS (
+    SELECT
+        c.id AS contacto_id,
+        c.telefono,
+        n.cliente,
+        n.r_mensajes,
+        now() - n.r_fecha * make_interval(days => :dias) AS creado_en,
+        CASE WHEN n.cliente THEN 0 ELSE round(-4 + 24 * power(n.r_score, :sesgo))::int END AS score
+    FROM contactos c
+    JOIN numeros n ON '+549261' || n.sufijo = c.telefono
+),
+chats AS (
+    INSERT INTO chat (team_id, nombre, numero, numero_key, numero_rev, score_actual, pipeline_estado_id, creado_en)
+    SELECT
+        :team_id,
+        d.telefono,
+        d.telefono,
+        '+54261' || right(d.telefono, 7),
+        reverse(substr(d.telefono, 2)),
+        d.score,
+        CASE WHEN d.cliente THEN NULL ELSE (
+            SELECT p.id FROM pipeline_estado p
+            WHERE p.score_min <= d.score AND p.score_max >= d.score
+            ORDER BY p.id LIMIT 1
+        ) END,
+        d.creado_en
+    FROM datos d
+    RETURNING id, numero, creado_en
+)
+INSERT INTO mensaje (chat_id, contacto_id, tipo, texto, autor_raw, from_me, created_at)
+SELECT
+    ch.id,
+    d.contacto_id,
+    1,
+    (:palabras ::text[])[1 + floor(random() * cardinality(:palabras ::text[]))::int],
+    CASE WHEN m.from_me THEN 'Ventas' ELSE ch.numero END,
+    m.from_me,
+    ch.creado_en + s * interval '3 minutes'
+FROM chats ch
+JOIN datos d ON d.telefono = ch.numero
+CROSS JOIN LATERAL generate_series(
+    1, 1 + floor(-ln(1 - d.r_mensajes) * (:media - 1))::int
+) AS s
+CROSS JOIN LATERAL (SELECT random() < 0.5 AS from_me WHERE s IS NOT NULL) AS m
+""")
+
+
+def sembrar(engine, config: ConfigSemilla, *, progreso=print) -> dict:
+    """Crea un team nuevo con `config` y devuelve lo que quedó cargado."""
+    if engine.dialect.name != "postgresql":
+        raise RuntimeError("semilla_metricas necesita Postgres (usa generate_series)")
+
+    import models  # noqa: F401 - registra todas las tablas
+    from migrations import run_migrations
+
+    SQLModel.metadata.create_all(engine)
+    run_migrations(engine)
+
+    t0 = time.perf_counter()
+    with engine.connect() as conn:
+        _asegurar_pipeline(conn)
+        team_id = conn.execute(
+            text("INSERT INTO team (nombre, created_at, activo) VALUES (:n, now(), true) RETURNING id"),
+            {"n": f"{PREFIJO_TEAM}-{config.chats}x{config.mensajes // config.chats}"},
+        ).scalar_one()
+        conn.commit()
+
+        # setseed va de -1 a 1
+        conn.execute(text("SELECT setseed(:s)"), {"s": (config.semilla % 2000 - 1000) / 1000})
+        media = config.mensajes / config.chats
+        for desde in range(1, config.chats + 1, SEMILLA_LOTE):
+            hasta = min(desde + SEMILLA_LOTE - 1, config.chats)
+            conn.execute(_SQL_BLOQUE, {
+                "team_id": team_id,
+                "desde": desde,
+                "hasta": hasta,
+                "clientes": config.clientes,
+                "dias": config.dias,
+                "sesgo": config.sesgo_score,
+                "media": media,
+                "palabras": list(_PALABRAS),
+            })
+            conn.commit()
+            progreso(f"chats {hasta}/{config.chats} ({time.perf_counter() - t0:.0f}s)")
+
+        # estadísticas al día: sin esto los planes del benchmark son los de tablas vacías
+        conn.execute(text("ANALYZE team, contacto, chat, mensaje, pipeline_estado"))
+        conn.commit()
+        cargado = resumen_team(conn, team_id)
+
+    return {**cargado, "segundos": round(time.perf_counter() - t0, 1), "config": asdict(config)}
+
+
+def resumen_team(conn, team_id: int) -> dict:
+    fila = conn.execute(text("""
+        SELECT
+            (SELECT count(*) FROM chat WHERE team_id = :t) AS chats,
+            (SELECT count(*) FROM mensaje m JOIN chat c ON c.id = m.chat_id WHERE c.team_id = :t) AS mensajes,
+            (SELECT count(*) FROM contacto WHERE team_id = :t AND estado = 1) AS clientes
+    """), {"t": team_id}).mappings().one()
+    return {"team_id": team_id, **fila}
+
+
+if __name__ == "__main__":
+    base = ConfigSemilla()
+    parser = argparse.ArgumentParser(description="Carga un team sintético grande para benchmarks de métricas")
+    parser.add_argument("--db", default=os.getenv("DATABASE_URL"), help="URL de Postgres (default: DATABASE_URL)")
+    parser.add_argument("--chats", type=int, default=base.chats)
+    parser.add_argument("--mensajes", type=int, default=base.mensajes)
+    parser.add_argument("--clientes", type=float, default=base.clientes)
+    parser.add_argument("--dias", type=int, default=base.dias)
+    parser.add_argument("--sesgo-score", type=float, default=base.sesgo_score)
+    parser.add_argument("--semilla", type=int, default=base.semilla)
+    args = parser.parse_args()
+    if not args.db:
+        parser.error("falta --db (o DATABASE_URL)")
+
+    config = ConfigSemilla(
+        chats=args.chats,
+        mensajes=args.mensajes,
+        clientes=args.clientes,
+        dias=args.dias,
+        sesgo_score=args.sesgo_score,
+        semilla=args.semilla,
+    )
+    print(json.dumps(sembrar(create_engine(args.db), config), ensure_ascii=False, indent=2))
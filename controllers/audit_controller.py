@@ -0,0 +1,104 @@
+# path: controllers/audit_controller.py
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+
+from fastapi import HTTPException
+from sqlalchemy import tuple_
+from sqlmodel import Session, select
+
+from models.user_actions import UserAction
+
+# historial de auditoría
+HISTORIAL_LIMITE_DEFAULT = 100
+HISTORIAL_LIMITE_MAX = 500
+
+_EPOCH = datetime(1970, 1, 1)
+_MICRO = timedelta(microseconds=1)
+
+
+def _cursor(a) -> str:
+    return f"{(a.created_at - _EPOCH) // _MICRO}-{a.id}"
+
+
+def _parse_cursor(antes: str) -> tuple[datetime, int]:
+    try:
+        micros, action_id = antes.split("-", 1)
+        return _EPOCH + int(micros) * _MICRO, int(action_id)
+    except (ValueError, OverflowError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
+def _utc(dt: datetime | None) -> datetime | None:
+    # created_at es UTC sin zona (datetime.utcnow)
+    if dt is None or dt.tzinfo is None:
+        return dt
+    return dt.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def listar_acciones(
+    *,
+    team_id: int,
+    session: Session,
+    user_id: int | None = None,
+    desde: datetime | None = None,
+    hasta: datetime | None = None,
+    action: str | None = None,
+    limite: int = HISTORIAL_LIMITE_DEFAULT,
+    antes: str | None = None,
+) -> dict:
+    """
+    Historial de auditoría del team, más nuevo primero.
+
+    Keyset por (created_at, id) descendente sobre
+    ix_user_actions_{team,user}_id_created_at_id: con user_id el filtro del
+    team se aplica sobre las filas de ese usuario. `desde`/`hasta` en UTC
+    (hasta excluido). `siguiente` es el cursor para `antes` (None = no hay más).
+    Las acciones llegan a la tabla por lotes: las de los últimos segundos
+    pueden no estar todavía.
+    """
+    limite = max(1, min(limite, HISTORIAL_LIMITE_MAX))
+    desde, hasta = _utc(desde), _utc(hasta)
+
+    stmt = select(
+        UserAction.id,
+        UserAction.user_id,
+        UserAction.method,
+        UserAction.path,
+        UserAction.action,
+        UserAction.payload,
+        UserAction.created_at,
+    ).where(UserAction.team_id == team_id)
+    if user_id is not None:
+        stmt = stmt.where(UserAction.user_id == user_id)
+    if desde:
+        stmt = stmt.where(UserAction.created_at >= desde)
+    if hasta:
+        stmt = stmt.where(UserAction.created_at < hasta)
+    if action:
+        stmt = stmt.where(UserAction.action == action)
+    if antes:
+        stmt = stmt.where(tuple_(UserAction.created_at, UserAction.id) < tuple_(*_parse_cursor(antes)))
+    rows = session.exec(
+        stmt.order_by(UserAction.created_at.desc(), UserAction.id.desc()).limit(limite + 1)
+    ).all()
+
+    siguiente = None
+    if len(rows) > limite:
+        rows = rows[:limite]
+        siguiente = _cursor(rows[-1])
+
+    items = [
+        {
+            "id": a.id,
+            "user_id": a.user_id,
+            "method": a.method,
+            "path": a.path,
+            "action": a.action,
+            "payload": a.payload,
+            "created_at": a.created_at,
+        }
+        for a in rows
+    ]
+    return {"items": items, "siguiente": siguiente}
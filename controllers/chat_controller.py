@@ -1,4 +1,4 @@
-from services.chat_service import importar_chat_controller, get_all_chat, get_only_chat, get_chat_full
+from services.chat_service import importar_chat_controller, importar_chats_lote_controller, get_all_chat, get_only_chat, get_chat_full
 
 def procesar_chat(file, current_user, session):
     return importar_chat_controller(
@@ -8,6 +8,14 @@ def procesar_chat(file, current_user, session):
         session=session
     )
 
+def procesar_chats_lote(files, current_user, session):
+    return importar_chats_lote_controller(
+        files=files,
+        team_id=current_user.team_id,
+        user_id=current_user.id,
+        session=session
+    )
+
 def obtener_chats(current_user, session):
     return get_all_chat(
         team_id=current_user.team_id,
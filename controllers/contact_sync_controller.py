@@ -1,7 +1,9 @@
 # controllers/contacts_controller.py
 from fastapi import UploadFile, HTTPException
-import tempfile, os
-from services.contacts_sync_service import sync_contactos_from_outlook_csv
+import tempfile, os, shutil
+from services.contacts_sync_service import get_last_sync_profile, sync_contactos_from_outlook_csv
+
+UPLOAD_COPY_BUFSIZE = 1024 * 1024
 
 def sync_contactos_controller(file: UploadFile, team_id: int, session, dry_run: bool = False):
     if not file.filename.lower().endswith(".csv"):
@@ -10,7 +12,8 @@ def sync_contactos_controller(file: UploadFile, team_id: int, session, dry_run:
     with tempfile.TemporaryDirectory() as d:
         path = os.path.join(d, file.filename)
         with open(path, "wb") as f:
-            f.write(file.file.read())
+            # copia por bloques: no levanta el upload entero a memoria
+            shutil.copyfileobj(file.file, f, length=UPLOAD_COPY_BUFSIZE)
 
         return sync_contactos_from_outlook_csv(
             session=session,
@@ -18,3 +21,10 @@ def sync_contactos_controller(file: UploadFile, team_id: int, session, dry_run:
             csv_path=path,
             dry_run=dry_run,
         )
+
+
+def perfil_ultimo_sync_controller(team_id: int):
+    profile = get_last_sync_profile(team_id)
+    if profile is None:
+        raise HTTPException(404, "Todavía no hay una sincronización registrada para este team")
+    return profile
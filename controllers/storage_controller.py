@@ -2,12 +2,52 @@
 
 from __future__ import annotations
 
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+
 from fastapi import HTTPException
+from fastapi.responses import FileResponse, Response
+from sqlalchemy import func, tuple_
 from sqlmodel import Session, select
 
 from models.archivos import Archivo
 from models.chat import Chat
 from models.mensaje import Mensaje
+from services.audio_service import waveform_a_lista
+from services.storage_service import ruta_local_fijada, soltar
+from services.thumbnail_service import generar_thumbnail, normalizar_lado, soporta_thumbnail
+
+# permisos de descarga cacheados por (archivo_id, team_id): el scrubbing de un
+# audio/video pide muchos Range seguidos y no hace falta el join en cada uno.
+# Solo se cachea lo que no cambia después del import (ver ArchivoDescarga).
+# Las entradas vencen solo por TTL: el GC de storage corre en otro proceso y no
+# llega a este cache; si borró el archivo, respuesta_descarga da 404 igual.
+DESCARGA_CACHE_TTL = float(os.getenv("MEDIA_AUTH_CACHE_TTL", "60"))
+DESCARGA_CACHE_MAX = 4096
+
+# listado de adjuntos de un chat
+LISTADO_LIMITE_DEFAULT = 100
+LISTADO_LIMITE_MAX = 500
+
+# son archivos con permisos: el browser los guarda pero revalida (ETag -> 304)
+DESCARGA_CACHE_CONTROL = "private, max-age=0, must-revalidate"
+
+
+@dataclass(frozen=True)
+class ArchivoDescarga:
+    # sin transcode_path: audio_service lo completa después (en otro proceso,
+    # quizás) y un valor cacheado serviría el original hasta que venza el TTL
+    path: str
+    mime_type: str | None
+    filename: str
+
+
+_descargas: OrderedDict[tuple[int, int], tuple[float, ArchivoDescarga]] = OrderedDict()
+_descargas_lock = threading.Lock()
 
 
 def obtener_archivo_para_descarga(
@@ -35,25 +75,214 @@ def obtener_archivo_para_descarga(
     return archivo
 
 
+def obtener_descarga(
+    *,
+    archivo_id: int,
+    team_id: int,
+    session: Session,
+) -> ArchivoDescarga:
+    """
+    Como obtener_archivo_para_descarga, pero con cache LRU + TTL por
+    (archivo_id, team_id). Los 404 no se cachean; no hay invalidación, las
+    entradas vencen a los DESCARGA_CACHE_TTL segundos.
+    """
+    clave = (archivo_id, team_id)
+    ahora = time.monotonic()
+    with _descargas_lock:
+        hit = _descargas.get(clave)
+        if hit and hit[0] > ahora:
+            _descargas.move_to_end(clave)
+            return hit[1]
+
+    archivo = obtener_archivo_para_descarga(archivo_id=archivo_id, team_id=team_id, session=session)
+    descarga = ArchivoDescarga(
+        path=archivo.path,
+        mime_type=archivo.mime_type,
+        filename=archivo.filename,
+    )
+
+    with _descargas_lock:
+        _descargas[clave] = (ahora + DESCARGA_CACHE_TTL, descarga)
+        _descargas.move_to_end(clave)
+        while len(_descargas) > DESCARGA_CACHE_MAX:
+            _descargas.popitem(last=False)
+    return descarga
+
+
+def _etags(valor: str) -> set[str]:
+    # comparación débil (RFC 9110): W/"x" y "x" son el mismo
+    return {e.strip().removeprefix("W/") for e in valor.split(",") if e.strip()}
+
+
+def _no_modificado(request_headers, response_headers) -> bool:
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match is not None:
+        etags = _etags(if_none_match)
+        return "*" in etags or response_headers["etag"] in etags
+
+    if_modified_since = request_headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return parsedate_to_datetime(response_headers["last-modified"]) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+class _FileResponseFijado(FileResponse):
+    """Suelta el archivo del cache al terminar (o cortarse) el envío."""
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            soltar(self.path)
+
+
+def respuesta_descarga(
+    descarga: ArchivoDescarga,
+    request_headers,
+    *,
+    content_disposition_type: str = "attachment",
+) -> Response:
+    """
+    FileResponse con ETag/Last-Modified del archivo guardado (mtime + tamaño).
+    Range / If-Range los resuelve FileResponse (206 / 416); acá se agrega el
+    304 para If-None-Match / If-Modified-Since.
+    """
+    try:
+        # con backend remoto lo trae al cache local del nodo si no estaba, y
+        # lo deja fijado hasta que _FileResponseFijado termina de mandarlo
+        path = ruta_local_fijada(descarga.path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Archivo no disponible en storage")
+    try:
+        stat_result = os.stat(path)
+    except FileNotFoundError:
+        soltar(path)
+        raise HTTPException(status_code=404, detail="Archivo no disponible en storage")
+
+    response = _FileResponseFijado(
+        path=path,
+        media_type=descarga.mime_type or "application/octet-stream",
+        filename=descarga.filename,
+        stat_result=stat_result,
+        content_disposition_type=content_disposition_type,
+        headers={"cache-control": DESCARGA_CACHE_CONTROL},
+    )
+    if _no_modificado(request_headers, response.headers):
+        soltar(path)
+        return Response(status_code=304, headers={
+            k: response.headers[k] for k in ("etag", "last-modified", "cache-control")
+        })
+    return response
+
+
+def obtener_compatible(descarga: ArchivoDescarga, *, archivo_id: int, session: Session) -> ArchivoDescarga:
+    """
+    La copia AAC (.m4a) si el audio tiene una; si no, el original. El permiso
+    ya lo resolvió obtener_descarga: acá solo se lee transcode_path por PK.
+    """
+    transcode_path = session.exec(
+        select(Archivo.transcode_path).where(Archivo.id == archivo_id)
+    ).first()
+    if not transcode_path:
+        return descarga
+    return ArchivoDescarga(
+        path=transcode_path,
+        mime_type="audio/mp4",
+        filename=f"{os.path.splitext(descarga.filename)[0]}.m4a",
+    )
+
+
+def obtener_thumbnail(descarga: ArchivoDescarga, *, lado: int | None) -> ArchivoDescarga:
+    """
+    Miniatura JPEG del archivo (se genera la primera vez si el import no la
+    dejó lista). 404 si el tipo no tiene miniatura o no se pudo generar.
+    """
+    thumb = generar_thumbnail(descarga.path, descarga.mime_type, normalizar_lado(lado))
+    if thumb is None:
+        raise HTTPException(status_code=404, detail="Sin miniatura para este archivo")
+    return ArchivoDescarga(
+        path=str(thumb),
+        mime_type="image/jpeg",
+        filename=f"{os.path.splitext(descarga.filename)[0]}.jpg",
+    )
+
+
+def _parse_cursor(despues: str) -> tuple[int, int]:
+    try:
+        mensaje_id, archivo_id = despues.split("-", 1)
+        return int(mensaje_id), int(archivo_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
 def listar_archivos_de_chat(
     *,
     chat_id: int,
     team_id: int,
     session: Session,
-) -> list[dict]:
+    tipo: str | None = None,
+    limite: int = LISTADO_LIMITE_DEFAULT,
+    despues: str | None = None,
+) -> dict:
     """
-    Útil para UI: lista los adjuntos de un chat (con permisos).
+    Útil para UI: lista los adjuntos de un chat (con permisos), paginado.
+
+    Keyset por (mensaje_id, id) sobre ix_archivo_chat_id[_tipo]_mensaje_id_id:
+    cada página cuesta lo mismo aunque el chat tenga miles de adjuntos.
+    `siguiente` es el cursor para `despues` (None = no hay más).
+    `totales` (cantidad y bytes por tipo, de todo el chat) viene solo en la
+    primera página: no cambia entre páginas y recalcularlo en cada una
+    volvería a recorrer todo el chat.
     """
+    limite = max(1, min(limite, LISTADO_LIMITE_MAX))
+    # solo columnas (sin instanciar Archivo/Mensaje/Chat); Chat solo para el permiso
+    base_where = (Archivo.chat_id == chat_id, Chat.team_id == team_id)
+
+    stmt = (
+        select(
+            Archivo.id,
+            Archivo.mensaje_id,
+            Archivo.tipo,
+            Archivo.filename,
+            Archivo.path,
+            Archivo.mime_type,
+            Archivo.size,
+            Archivo.duracion_ms,
+            Archivo.waveform,
+            Archivo.transcode_path,
+        )
+        .join(Chat, Chat.id == Archivo.chat_id)
+        .where(*base_where)
+    )
+    if tipo:
+        stmt = stmt.where(Archivo.tipo == tipo)
+    if despues:
+        stmt = stmt.where(tuple_(Archivo.mensaje_id, Archivo.id) > tuple_(*_parse_cursor(despues)))
     rows = session.exec(
-        select(Archivo, Mensaje, Chat)
-        .join(Mensaje, Mensaje.id == Archivo.mensaje_id)
-        .join(Chat, Chat.id == Mensaje.chat_id)
-        .where(Chat.id == chat_id)
-        .where(Chat.team_id == team_id)
-        .order_by(Mensaje.id.asc(), Archivo.id.asc())
+        stmt.order_by(Archivo.mensaje_id.asc(), Archivo.id.asc()).limit(limite + 1)
     ).all()
 
-    return [
+    siguiente = None
+    if len(rows) > limite:
+        rows = rows[:limite]
+        siguiente = f"{rows[-1].mensaje_id}-{rows[-1].id}"
+
+    totales = None
+    if not despues:
+        totales = {
+            t: {"cantidad": cantidad, "bytes": int(total_bytes or 0)}
+            for t, cantidad, total_bytes in session.exec(
+                select(Archivo.tipo, func.count(), func.sum(Archivo.size))
+                .join(Chat, Chat.id == Archivo.chat_id)
+                .where(*base_where)
+                .group_by(Archivo.tipo)
+            ).all()
+        }
+
+    items = [
         {
             "id": a.id,
             "mensaje_id": a.mensaje_id,
@@ -62,6 +291,13 @@ def listar_archivos_de_chat(
             "path": a.path,
             "mime_type": a.mime_type,
             "size": a.size,
+            # la galería usa esto en vez de bajar el original
+            "thumb_url": f"/chats/archivos/{a.id}/thumb" if soporta_thumbnail(a.mime_type) else None,
+            # notas de voz: el reproductor se dibuja sin bajar el audio
+            "duracion_ms": a.duracion_ms or None,
+            "waveform": waveform_a_lista(a.waveform),
+            "compatible_url": f"/chats/archivos/{a.id}?compatible=true" if a.transcode_path else None,
         }
-        for (a, _, _) in rows
+        for a in rows
     ]
+    return {"items": items, "siguiente": siguiente, "totales": totales}
@@ -8,7 +8,8 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise RuntimeError("Falta DATABASE_URL en el .env")
 
-engine = create_engine(DATABASE_URL, echo=True)
+# SQL_ECHO=1 loguea cada sentencia (debug); para medir está /internal/metrics
+engine = create_engine(DATABASE_URL, echo=os.getenv("SQL_ECHO", "0") == "1")
 
 def get_session():
     with Session(engine) as session:
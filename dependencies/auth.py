@@ -28,6 +28,21 @@ def _get_token(request: Request) -> str | None:
     return None
 
 
+def payload_del_token(request: Request) -> dict | None:
+    """
+    Claims del JWT si la firma y el vencimiento son válidos, sin ir a la DB
+    (no mira si el usuario sigue activo). Para decisiones baratas fuera de
+    las rutas, como el profiler; para autorizar endpoints, get_current_user.
+    """
+    token = _get_token(request)
+    if not token:
+        return None
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+
+
 def get_current_user(
     request: Request,
     session: Session = Depends(get_session),
@@ -0,0 +1,106 @@
+# path: migrations/__init__.py
+"""
+Migraciones de esquema versionadas.
+
+create_all solo crea tablas que no existen: cualquier cambio sobre tablas
+ya creadas (índices, columnas, backfills) va en un módulo mNNNN_*.py de este
+paquete y se registra en MIGRATIONS, en orden.
+
+Cada migración corre en su propia transacción, salvo las que declaran
+COMMIT_POR_LOTE = True: esas reciben la conexión sin transacción abierta y
+hacen conn.commit() después de cada paso (ALTER, cada lote del backfill),
+para no tener la tabla entera bloqueada durante todo el backfill. Si se
+cortan a mitad quedan pasos commiteados, así que tienen que poder correr de
+nuevo desde cualquier punto (ADD COLUMN si falta, IF NOT EXISTS, backfill
+idempotente).
+"""
+from __future__ import annotations
+
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, MetaData, String, Table, select, text
+
+from migrations import (
+    m0001_hot_query_indexes,
+    m0002_phone_keys,
+    m0003_contacto_unique_keys,
+    m0004_chat_unique_numero_key,
+    m0005_archivo_audio_meta,
+    m0006_archivo_chat_id,
+    m0007_user_actions_indexes,
+)
+
+MIGRATIONS = (
+    m0001_hot_query_indexes,
+    m0002_phone_keys,
+    m0003_contacto_unique_keys,
+    m0004_chat_unique_numero_key,
+    m0005_archivo_audio_meta,
+    m0006_archivo_chat_id,
+    m0007_user_actions_indexes,
+)
+
+# Tabla propia (no SQLModel.metadata) para que create_all no la toque
+_metadata = MetaData()
+
+schema_migrations = Table(
+    "schema_migrations",
+    _metadata,
+    Column("version", String, primary_key=True),
+    Column("nombre", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+# Clave arbitraria para pg_advisory_lock: evita que dos workers migren a la vez
+_LOCK_KEY = 7_260_026
+
+
+def pending_migrations(conn) -> list:
+    applied = set(conn.execute(select(schema_migrations.c.version)).scalars())
+    return [m for m in MIGRATIONS if m.VERSION not in applied]
+
+
+def _registrar(conn, migration) -> None:
+    conn.execute(
+        schema_migrations.insert().values(
+            version=migration.VERSION,
+            nombre=migration.__name__.rsplit(".", 1)[-1],
+            applied_at=datetime.utcnow(),
+        )
+    )
+
+
+def run_migrations(engine) -> list[str]:
+    """
+    Aplica las migraciones pendientes, cada una en su propia transacción.
+    Devuelve las versiones aplicadas en esta corrida.
+    """
+    _metadata.create_all(engine)
+    is_pg = engine.dialect.name == "postgresql"
+
+    aplicadas: list[str] = []
+    with engine.connect() as lock_conn:
+        if is_pg:
+            lock_conn.execute(text("SELECT pg_advisory_lock(:k)"), {"k": _LOCK_KEY})
+        try:
+            with engine.connect() as conn:
+                pendientes = pending_migrations(conn)
+                conn.rollback()
+
+            for migration in pendientes:
+                if getattr(migration, "COMMIT_POR_LOTE", False):
+                    with engine.connect() as conn:
+                        migration.upgrade(conn)
+                        _registrar(conn, migration)
+                        conn.commit()
+                else:
+                    with engine.begin() as conn:
+                        migration.upgrade(conn)
+                        _registrar(conn, migration)
+                aplicadas.append(migration.VERSION)
+        finally:
+            if is_pg:
+                lock_conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": _LOCK_KEY})
+                lock_conn.commit()
+
+    return aplicadas
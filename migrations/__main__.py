@@ -0,0 +1,12 @@
+# path: migrations/__main__.py
+# Uso: python -m migrations
+import models  # noqa: F401  registra todos los modelos
+from sqlmodel import SQLModel
+
+from database import engine
+from migrations import run_migrations
+
+if __name__ == "__main__":
+    SQLModel.metadata.create_all(engine)
+    aplicadas = run_migrations(engine)
+    print("Migraciones aplicadas:", aplicadas or "ninguna (esquema al día)")
@@ -0,0 +1,38 @@
+# path: migrations/m0001_hot_query_indexes.py
+"""
+Índices compuestos para los patrones de consulta calientes.
+
+Los mismos índices están declarados en los modelos (__table_args__), así que
+en una base nueva create_all ya los crea y acá el IF NOT EXISTS no hace nada.
+"""
+from __future__ import annotations
+
+from sqlalchemy import text
+
+VERSION = "0001"
+
+# (nombre, tabla, columnas) -> consulta que lo usa
+INDEXES = [
+    # get_chat_full (ORDER BY created_at) y get_all_chat (max(created_at) GROUP BY chat_id)
+    ("ix_mensaje_chat_id_created_at", "mensaje", "chat_id, created_at"),
+    # subquery "1 contacto por chat" de chat_service y services/metrics: min(contacto_id) GROUP BY chat_id
+    ("ix_mensaje_chat_id_contacto_id", "mensaje", "chat_id, contacto_id"),
+    # chat_list_service: WHERE team_id ORDER BY score_actual DESC, creado_en DESC
+    ("ix_chat_team_id_score_actual_creado_en", "chat", "team_id, score_actual, creado_en"),
+    # chat_metrics / pipeline_metrics: WHERE team_id + join/filtro por pipeline_estado_id
+    ("ix_chat_team_id_pipeline_estado_id", "chat", "team_id, pipeline_estado_id"),
+    # timeseries_metrics_service: WHERE team_id AND creado_en en rango
+    ("ix_chat_team_id_creado_en", "chat", "team_id, creado_en"),
+    # upsert_contacto / sync outlook
+    ("ix_contacto_team_id_telefono", "contacto", "team_id, telefono"),
+    ("ix_contacto_team_id_nombre", "contacto", "team_id, nombre"),
+    # descarga / listado de adjuntos: join Archivo -> Mensaje
+    ("ix_archivo_mensaje_id", "archivo", "mensaje_id"),
+    # get_chat_full: WHERE chat_id ORDER BY creado_en
+    ("ix_chatscoreevent_chat_id_creado_en", "chatscoreevent", "chat_id, creado_en"),
+]
+
+
+def upgrade(conn) -> None:
+    for nombre, tabla, columnas in INDEXES:
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS {nombre} ON {tabla} ({columnas})"))
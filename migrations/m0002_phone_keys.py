@@ -0,0 +1,79 @@
+# path: migrations/m0002_phone_keys.py
+"""
+Claves de teléfono persistidas (services/phone_normalization):
+contacto.telefono_key/telefono_rev y chat.numero_key/numero_rev.
+
+Agrega las columnas si faltan, las completa en lotes y crea los índices.
+COMMIT_POR_LOTE: cada lote del backfill se commitea solo, así el UPDATE
+bloquea de a BACKFILL_BATCH filas y no la tabla entera hasta el final. El
+ALTER TABLE sí toma un lock exclusivo, pero corto (se commitea enseguida), y
+CREATE INDEX frena las escrituras sobre la tabla mientras se construye.
+Todo es re-ejecutable: si se corta, la próxima corrida recalcula las claves.
+El índice sobre *_rev usa varchar_pattern_ops para que el LIKE 'prefijo%'
+del match por sufijo lo use aunque la base no tenga collation "C".
+"""
+from __future__ import annotations
+
+from sqlalchemy import inspect, select, text
+
+from models.chat import Chat
+from models.contactos import Contacto
+from services.bulk_update import bulk_update_by_id
+from services.phone_normalization import canonical_phone, reversed_phone_key
+
+VERSION = "0002"
+COMMIT_POR_LOTE = True
+
+BACKFILL_BATCH = 10_000
+
+# (tabla, columna origen, columna key, columna rev)
+PHONE_COLUMNS = [
+    (Contacto.__table__, "telefono", "telefono_key", "telefono_rev"),
+    (Chat.__table__, "numero", "numero_key", "numero_rev"),
+]
+
+
+def _add_missing_columns(conn, table, *columns: str) -> None:
+    existing = {c["name"] for c in inspect(conn).get_columns(table.name)}
+    for col in columns:
+        if col not in existing:
+            conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {col} VARCHAR"))
+    conn.commit()
+
+
+def _backfill(conn, table, source: str, key_col: str, rev_col: str) -> None:
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            select(table.c.id, table.c[source])
+            .where(table.c.id > last_id)
+            .order_by(table.c.id)
+            .limit(BACKFILL_BATCH)
+        ).all()
+        if not rows:
+            return
+        bulk_update_by_id(conn, table, [
+            {"id": row_id, key_col: canonical_phone(value), rev_col: reversed_phone_key(value)}
+            for row_id, value in rows
+        ])
+        conn.commit()
+        last_id = rows[-1][0]
+
+
+def upgrade(conn) -> None:
+    is_pg = conn.dialect.name == "postgresql"
+    ops = " varchar_pattern_ops" if is_pg else ""
+
+    for table, source, key_col, rev_col in PHONE_COLUMNS:
+        _add_missing_columns(conn, table, key_col, rev_col)
+        _backfill(conn, table, source, key_col, rev_col)
+
+        conn.execute(text(
+            f"CREATE INDEX IF NOT EXISTS ix_{table.name}_team_id_{key_col} "
+            f"ON {table.name} (team_id, {key_col})"
+        ))
+        conn.execute(text(
+            f"CREATE INDEX IF NOT EXISTS ix_{table.name}_team_id_{rev_col} "
+            f"ON {table.name} (team_id, {rev_col}{ops})"
+        ))
+        conn.commit()
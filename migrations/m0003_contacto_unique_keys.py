@@ -0,0 +1,35 @@
+# path: migrations/m0003_contacto_unique_keys.py
+"""
+Índice único parcial (team_id, telefono_key) WHERE telefono_key IS NOT NULL
+que usa ContactResolver para no duplicar contactos entre imports concurrentes.
+
+Si ya hay contactos con la misma key, la key queda en el más viejo y el resto
+conserva su teléfono pero sin key (no se borra ni fusiona nada).
+
+Reemplaza al índice no único ix_contacto_team_id_telefono_key de 0002.
+"""
+from __future__ import annotations
+
+from sqlalchemy import text
+
+VERSION = "0003"
+
+
+def upgrade(conn) -> None:
+    conn.execute(text("""
+        UPDATE contacto SET telefono_key = NULL
+        WHERE id IN (
+            SELECT id FROM (
+                SELECT id, row_number() OVER (PARTITION BY team_id, telefono_key ORDER BY id) AS rn
+                FROM contacto
+                WHERE telefono_key IS NOT NULL
+            ) d
+            WHERE rn > 1
+        )
+    """))
+
+    conn.execute(text("DROP INDEX IF EXISTS ix_contacto_team_id_telefono_key"))
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_contacto_team_id_telefono_key "
+        "ON contacto (team_id, telefono_key) WHERE telefono_key IS NOT NULL"
+    ))
@@ -0,0 +1,43 @@
+# path: migrations/m0004_chat_unique_numero_key.py
+"""
+Índice único parcial (team_id, numero_key) WHERE numero_key IS NOT NULL:
+un chat por número normalizado y team, para que los imports en paralelo
+no dupliquen chats (ver _get_or_create_chat).
+
+Los chats duplicados que ya existan no se fusionan (tienen mensajes, score y
+pipeline propios): la key queda en el más viejo y el resto sigue con su
+número pero sin key, igual que contacto en 0003.
+
+Reemplaza al índice no único ix_chat_team_id_numero_key de 0002.
+"""
+from __future__ import annotations
+
+import logging
+
+from sqlalchemy import text
+
+VERSION = "0004"
+
+logger = logging.getLogger(__name__)
+
+
+def upgrade(conn) -> None:
+    result = conn.execute(text("""
+        UPDATE chat SET numero_key = NULL
+        WHERE id IN (
+            SELECT id FROM (
+                SELECT id, row_number() OVER (PARTITION BY team_id, numero_key ORDER BY id) AS rn
+                FROM chat
+                WHERE numero_key IS NOT NULL
+            ) d
+            WHERE rn > 1
+        )
+    """))
+    if result.rowcount:
+        logger.warning("chat: %s chats duplicados por numero_key quedaron sin key", result.rowcount)
+
+    conn.execute(text("DROP INDEX IF EXISTS ix_chat_team_id_numero_key"))
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_chat_team_id_numero_key "
+        "ON chat (team_id, numero_key) WHERE numero_key IS NOT NULL"
+    ))
@@ -0,0 +1,31 @@
+# path: migrations/m0005_archivo_audio_meta.py
+"""
+Columnas de audio en archivo (services/audio_service): duracion_ms,
+waveform y transcode_path. Quedan en NULL = pendientes; el procesamiento
+corre después de cada import o con `python -m services.audio_service`.
+
+Índice parcial para encontrar rápido los audios pendientes.
+"""
+from __future__ import annotations
+
+from sqlalchemy import inspect, text
+
+VERSION = "0005"
+
+COLUMNS = {
+    "duracion_ms": "INTEGER",
+    "waveform": "VARCHAR",
+    "transcode_path": "VARCHAR",
+}
+
+
+def upgrade(conn) -> None:
+    existing = {c["name"] for c in inspect(conn).get_columns("archivo")}
+    for col, tipo in COLUMNS.items():
+        if col not in existing:
+            conn.execute(text(f"ALTER TABLE archivo ADD COLUMN {col} {tipo}"))
+
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_archivo_audio_pendiente "
+        "ON archivo (id) WHERE tipo = 'audio' AND duracion_ms IS NULL"
+    ))
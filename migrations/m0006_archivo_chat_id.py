@@ -0,0 +1,45 @@
+# path: migrations/m0006_archivo_chat_id.py
+"""
+archivo.chat_id (copia de mensaje.chat_id) + índices para el listado
+paginado de adjuntos de un chat: (chat_id, mensaje_id, id) y
+(chat_id, tipo, mensaje_id, id). Con eso cada página es un range scan del
+índice, sin recorrer los mensajes del chat que no tienen adjuntos.
+
+El backfill va en lotes por id y, con COMMIT_POR_LOTE, cada lote se
+commitea solo: el UPDATE bloquea de a BACKFILL_BATCH filas de archivo y no la
+tabla entera hasta el final. El ALTER TABLE toma un lock exclusivo corto y
+los CREATE INDEX frenan las escrituras sobre archivo mientras se construyen.
+Si se corta, la próxima corrida sigue con las filas que quedaron en NULL.
+"""
+from __future__ import annotations
+
+from sqlalchemy import inspect, text
+
+VERSION = "0006"
+COMMIT_POR_LOTE = True
+
+BACKFILL_BATCH = 10_000
+
+
+def upgrade(conn) -> None:
+    existing = {c["name"] for c in inspect(conn).get_columns("archivo")}
+    if "chat_id" not in existing:
+        fk = " REFERENCES chat (id)" if conn.dialect.name == "postgresql" else ""
+        conn.execute(text(f"ALTER TABLE archivo ADD COLUMN chat_id INTEGER{fk}"))
+        conn.commit()
+
+    max_id = conn.execute(text("SELECT max(id) FROM archivo")).scalar() or 0
+    for desde in range(0, max_id, BACKFILL_BATCH):
+        conn.execute(text("""
+            UPDATE archivo
+            SET chat_id = (SELECT mensaje.chat_id FROM mensaje WHERE mensaje.id = archivo.mensaje_id)
+            WHERE archivo.id > :desde AND archivo.id <= :hasta AND archivo.chat_id IS NULL
+        """), {"desde": desde, "hasta": desde + BACKFILL_BATCH})
+        conn.commit()
+
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_archivo_chat_id_mensaje_id_id ON archivo (chat_id, mensaje_id, id)"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_archivo_chat_id_tipo_mensaje_id_id ON archivo (chat_id, tipo, mensaje_id, id)"
+    ))
@@ -0,0 +1,29 @@
+# path: migrations/m0007_user_actions_indexes.py
+"""
+Índices del historial de auditoría (user_actions): (team_id, created_at, id)
+y (user_id, created_at, id), para filtrar por rango de fechas y paginar por
+keyset sin ordenar en memoria.
+
+Reemplazan a los de una columna que creaba index=True en el modelo: con los
+compuestos sobran, y cada índice de más es una escritura más por acción
+auditada.
+"""
+from __future__ import annotations
+
+from sqlalchemy import text
+
+VERSION = "0007"
+
+INDEXES = [
+    ("ix_user_actions_team_id_created_at_id", "team_id, created_at, id"),
+    ("ix_user_actions_user_id_created_at_id", "user_id, created_at, id"),
+]
+
+REEMPLAZADOS = ("ix_user_actions_team_id", "ix_user_actions_user_id")
+
+
+def upgrade(conn) -> None:
+    for nombre, columnas in INDEXES:
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS {nombre} ON user_actions ({columnas})"))
+    for nombre in REEMPLAZADOS:
+        conn.execute(text(f"DROP INDEX IF EXISTS {nombre}"))
@@ -8,6 +8,7 @@ from .contactos import Contacto
 
 from .chat import Chat
 from .mensaje import Mensaje
+from .import_checkpoint import ImportCheckpoint
 
 from .pipeline_estado import PipelineEstado
 from .chat_pipeline import ChatPipeline
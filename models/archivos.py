@@ -1,14 +1,31 @@
 # models/archivo.py
 from sqlmodel import SQLModel, Field
 from typing import Optional
+from sqlalchemy import Index
 
 class Archivo(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_archivo_mensaje_id", "mensaje_id"),
+        # listado paginado de adjuntos de un chat (keyset mensaje_id, id), con y sin tipo
+        Index("ix_archivo_chat_id_mensaje_id_id", "chat_id", "mensaje_id", "id"),
+        Index("ix_archivo_chat_id_tipo_mensaje_id_id", "chat_id", "tipo", "mensaje_id", "id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
 
     mensaje_id: int = Field(foreign_key="mensaje.id")
+    # copia de mensaje.chat_id: listar los adjuntos de un chat sin pasar por mensaje
+    chat_id: Optional[int] = Field(default=None, foreign_key="chat.id")
 
     tipo: str
     filename: str
     path: str
     mime_type: Optional[str] = None
     size: Optional[int] = None
+
+    # audios (services/audio_service): None = sin procesar, 0 = no se pudo leer
+    duracion_ms: Optional[int] = None
+    # picos 0..255 en base64 (audio_service.waveform_a_lista)
+    waveform: Optional[str] = None
+    # copia AAC .m4a para browsers que no reproducen el original
+    transcode_path: Optional[str] = None
@@ -2,14 +2,34 @@
 from sqlmodel import SQLModel, Field
 from typing import Optional
 from datetime import datetime
+from sqlalchemy import Index, text
 
 class Chat(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_chat_team_id_score_actual_creado_en", "team_id", "score_actual", "creado_en"),
+        Index("ix_chat_team_id_pipeline_estado_id", "team_id", "pipeline_estado_id"),
+        Index("ix_chat_team_id_creado_en", "team_id", "creado_en"),
+        # un chat por número normalizado y team (imports en paralelo)
+        Index(
+            "ux_chat_team_id_numero_key", "team_id", "numero_key", unique=True,
+            postgresql_where=text("numero_key IS NOT NULL"),
+            sqlite_where=text("numero_key IS NOT NULL"),
+        ),
+        Index(
+            "ix_chat_team_id_numero_rev", "team_id", "numero_rev",
+            postgresql_ops={"numero_rev": "varchar_pattern_ops"},
+        ),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
 
     team_id: int = Field(foreign_key="team.id")
 
     nombre: str
     numero: str
+    # claves derivadas de numero (services/phone_normalization)
+    numero_key: Optional[str] = None
+    numero_rev: Optional[str] = None
 
     score_actual: int = 0
     pipeline_estado_id: Optional[int] = Field(default=None, foreign_key="pipeline_estado.id")
@@ -1,8 +1,13 @@
 from sqlmodel import SQLModel, Field
 from typing import Optional
 from datetime import datetime
+from sqlalchemy import Index
 
 class ChatScoreEvent(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_chatscoreevent_chat_id_creado_en", "chat_id", "creado_en"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
 
     chat_id: int = Field(foreign_key="chat.id")
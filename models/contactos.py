@@ -2,14 +2,33 @@
 from sqlmodel import SQLModel, Field
 from typing import Optional
 from datetime import datetime
+from sqlalchemy import Index, text
 
 class Contacto(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_contacto_team_id_telefono", "team_id", "telefono"),
+        Index("ix_contacto_team_id_nombre", "team_id", "nombre"),
+        # única por team: evita duplicados entre imports concurrentes (ContactResolver)
+        Index(
+            "ux_contacto_team_id_telefono_key", "team_id", "telefono_key", unique=True,
+            postgresql_where=text("telefono_key IS NOT NULL"),
+            sqlite_where=text("telefono_key IS NOT NULL"),
+        ),
+        Index(
+            "ix_contacto_team_id_telefono_rev", "team_id", "telefono_rev",
+            postgresql_ops={"telefono_rev": "varchar_pattern_ops"},
+        ),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     team_id: int = Field(foreign_key="team.id")
 
     nombre: str
     telefono: Optional[str] = None
     telefono2: Optional[str] = None
+    # claves derivadas de telefono (services/phone_normalization)
+    telefono_key: Optional[str] = None   # canónica estilo E.164
+    telefono_rev: Optional[str] = None   # dígitos invertidos, para match por sufijo
     username: Optional[str] = None
     estado : int
 
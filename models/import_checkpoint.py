@@ -0,0 +1,30 @@
+# models/import_checkpoint.py
+from sqlmodel import SQLModel, Field
+from typing import Optional
+from datetime import datetime
+from sqlalchemy import UniqueConstraint
+
+class ImportCheckpoint(SQLModel, table=True):
+    """Avance de un import de chat, para reanudarlo si se corta (uno por ZIP y team)."""
+    __table_args__ = (
+        UniqueConstraint("team_id", "sha256", name="ux_importcheckpoint_team_id_sha256"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+
+    team_id: int = Field(foreign_key="team.id")
+    sha256: str                     # hash del ZIP subido
+    filename: str
+
+    chat_id: Optional[int] = Field(default=None, foreign_key="chat.id")
+
+    # índice (en la salida de parsear_chat) del último mensaje ya commiteado; -1 = ninguno
+    ultimo_indice: int = -1
+    mensajes_guardados: int = 0
+    archivos_guardados: int = 0
+
+    estado: str = "en_curso"        # en_curso | error | completo
+    error: Optional[str] = None
+
+    creado_en: datetime = Field(default_factory=datetime.utcnow)
+    actualizado_en: datetime = Field(default_factory=datetime.utcnow)
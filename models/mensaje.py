@@ -4,9 +4,15 @@ from __future__ import annotations
 from datetime import datetime
 from typing import Optional
 from sqlmodel import SQLModel, Field
+from sqlalchemy import Index
 
 
 class Mensaje(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_mensaje_chat_id_created_at", "chat_id", "created_at"),
+        Index("ix_mensaje_chat_id_contacto_id", "chat_id", "contacto_id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
 
     chat_id: int = Field(foreign_key="chat.id", nullable=False)
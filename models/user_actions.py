@@ -2,15 +2,21 @@
 from sqlmodel import SQLModel, Field
 from typing import Optional
 from datetime import datetime
-from sqlalchemy import Column, JSON
+from sqlalchemy import Column, Index, JSON
 
 class UserAction(SQLModel, table=True):
     __tablename__ = "user_actions"
+    __table_args__ = (
+        # historial de auditoría (services/auditoria): por team o usuario, rango de fechas,
+        # keyset (created_at, id) descendente
+        Index("ix_user_actions_team_id_created_at_id", "team_id", "created_at", "id"),
+        Index("ix_user_actions_user_id_created_at_id", "user_id", "created_at", "id"),
+    )
 
     id: Optional[int] = Field(default=None, primary_key=True)
 
-    user_id: Optional[int] = Field(default=None, index=True)
-    team_id: Optional[int] = Field(default=None, index=True)
+    user_id: Optional[int] = None
+    team_id: Optional[int] = None
 
     method: str                 # GET, POST, PUT, DELETE
     path: str                   # /procesar, /login, etc
@@ -1,40 +1,190 @@
+import io
+import mmap
+import multiprocessing
+import os
 import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from itertools import islice
+from sys import intern
 
-def parsear_chat(path):
-    mensajes = []
+# Fecha y hora comunes a todos los exports; los grupos salen como enteros
+# (sin strptime ni strings intermedios):
+#   día/mes (o mes/día), año de 2 o 4 dígitos, hora, minutos, segundos opcionales,
+#   AM/PM opcional en inglés o español ("10:30 PM", "10:30 p. m.")
+_FECHA = r"(\d{1,2})[/.-](\d{1,2})[/.-](\d{2,4}),?\s+"
+_HORA = r"(\d{1,2}):(\d{2})(?::(\d{2}))?(?:\s*([aApP])\.?\s?[mM]\.?)?"
+# "Autor: texto" o, sin autor, un mensaje del sistema ("Los mensajes ... están cifrados")
+_RESTO = r"(?:([^:]+):(?:\s|$))?(.*)$"
 
-    # Regex tolerante a formatos reales de WhatsApp
-    patron = re.compile(
-        r"^(\d{1,2}/\d{1,2}/\d{2,4}),?\s(\d{1,2}:\d{2})\s-\s([^:]+):\s(.*)$"
-    )
+# líneas del principio que se miran para detectar formato y orden de fecha
+LINEAS_DETECCION = 200
 
-    with open(path, "r", encoding="utf-8-sig", errors="ignore") as f:
-        lineas = f.readlines()
+# timestamps distintos que se recuerdan mientras se parsea (ver _fecha_mensaje)
+_CACHE_FECHAS_MAX = 4096
+
+# exports más grandes que esto se parsean en paralelo (parsear_chat_paralelo)
+PARSEO_PARALELO_MIN_BYTES = int(os.getenv("CHAT_PARSE_PARALLEL_MIN_BYTES", str(64 * 1024 * 1024)))
+PARSEO_PARALELO_WORKERS = int(os.getenv("CHAT_PARSE_WORKERS", str(os.cpu_count() or 1)))
+
+
+@dataclass(frozen=True)
+class FormatoChat:
+    """
+    Un formato de export. `patron` matchea la línea que abre un mensaje con
+    los grupos: d1, d2, año, hora, minutos, segundos, meridiano, autor, texto.
+    """
+    nombre: str
+    patron: re.Pattern
+
+
+class MensajeChat:
+    """
+    Un mensaje parseado. Con __slots__, el autor internado (todas las líneas
+    de un mismo autor comparten el string) y el datetime compartido entre
+    mensajes del mismo minuto, el costo por mensaje queda por debajo de
+    ~100 bytes además del texto. Sin autor (usuario == "") es un mensaje
+    del sistema.
+    """
+    __slots__ = ("created_at", "usuario", "mensaje")
+
+    def __init__(self, created_at, usuario, mensaje):
+        self.created_at = created_at
+        self.usuario = usuario
+        self.mensaje = mensaje
+
+    @property
+    def sistema(self):
+        return not self.usuario
+
+    def __eq__(self, other):
+        if not isinstance(other, MensajeChat):
+            return NotImplemented
+        return (self.created_at, self.usuario, self.mensaje) == (
+            other.created_at, other.usuario, other.mensaje)
+
+    def __repr__(self):
+        return f"MensajeChat({self.created_at!r}, {self.usuario!r}, {self.mensaje!r})"
+
+
+# Registro de formatos, en orden de prioridad para los empates al detectar
+FORMATOS: dict[str, FormatoChat] = {}
+
+
+def registrar_formato(nombre, patron):
+    formato = FormatoChat(nombre=nombre, patron=re.compile(patron))
+    FORMATOS[nombre] = formato
+    return formato
+
+
+# 05/01/2026, 10:30 - Ana: hola   |   1/5/26, 10:30 p. m. - Ana: hola
+ANDROID = registrar_formato("android", rf"^{_FECHA}{_HORA}\s+-\s+{_RESTO}")
+# [05/01/26, 10:30:15] Ana: hola
+IOS = registrar_formato("ios", rf"^\[{_FECHA}{_HORA}\]\s*{_RESTO}")
+
+
+def _limpiar(linea):
+    # iOS antepone una marca LTR invisible a algunas líneas
+    return linea.strip().lstrip("\u200e")
+
+
+def detectar_formato(lineas, max_lineas=LINEAS_DETECCION):
+    """El formato cuyo patrón abre más mensajes en las primeras líneas (android si ninguno)."""
+    muestra = [_limpiar(linea) for linea in lineas[:max_lineas]]
+    mejor, mejor_cuenta = ANDROID, 0
+    for formato in FORMATOS.values():
+        cuenta = sum(1 for linea in muestra if formato.patron.match(linea))
+        if cuenta > mejor_cuenta:
+            mejor, mejor_cuenta = formato, cuenta
+    return mejor
+
+
+def detectar_orden_fecha(lineas, formato, max_lineas=LINEAS_DETECCION):
+    """
+    "dmy" o "mdy" según las primeras líneas con fecha: si algún primer campo
+    pasa de 12 es día/mes, si algún segundo campo pasa de 12 es mes/día.
+    Si no hay forma de saberlo se asume día/mes (locale es-AR).
+    """
+    for linea in lineas[:max_lineas]:
+        match = formato.patron.match(_limpiar(linea))
+        if not match:
+            continue
+        a, b = int(match.group(1)), int(match.group(2))
+        if a > 12:
+            return "dmy"
+        if b > 12:
+            return "mdy"
+    return "dmy"
+
+
+def _fecha_mensaje(match, mes_primero, fechas):
+    """
+    datetime de una línea que matcheó el patrón, o None si la fecha/hora es
+    imposible. `fechas` cachea por texto de fecha/hora: los mensajes del mismo
+    minuto comparten el objeto datetime.
+    """
+    clave = match.group(1, 2, 3, 4, 5, 6, 7)
+    if clave in fechas:
+        return fechas[clave]
+    if len(fechas) >= _CACHE_FECHAS_MAX:
+        fechas.clear()
+
+    d1, d2, anio, hora, minuto, segundo, meridiano = clave
+    dia, mes = (int(d2), int(d1)) if mes_primero else (int(d1), int(d2))
+    y = int(anio)
+    if y < 100:
+        y += 2000
+
+    h = int(hora)
+    if meridiano:
+        # 12 a. m. -> 0, 12 p. m. -> 12
+        h = h % 12 + (12 if meridiano in "pP" else 0)
+
+    try:
+        created_at = datetime(y, mes, dia, h, int(minuto), int(segundo or 0))
+    except ValueError:
+        # fecha/hora imposible: la línea se toma como texto del mensaje anterior
+        created_at = None
+    fechas[clave] = created_at
+    return created_at
+
+
+def parsear_lineas(lineas, formato, mes_primero=False):
+    """
+    Arma los mensajes a partir de las líneas de un export de `formato`.
+    Las líneas que no abren mensaje se suman al anterior (multilínea).
+    """
+    mensajes = []
+    patron = formato.patron
+    fechas = {}
 
     mensaje_actual = None
 
     for linea in lineas:
-        linea = linea.strip()
+        linea = _limpiar(linea)
 
         match = patron.match(linea)
+        created_at = _fecha_mensaje(match, mes_primero, fechas) if match else None
 
-        if match:
+        if created_at is not None:
             # Guardar mensaje anterior
             if mensaje_actual:
                 mensajes.append(mensaje_actual)
 
-            fecha, hora, usuario, texto = match.groups()
-
-            mensaje_actual = {
-                "fecha": normalizar_fecha(fecha),
-                "hora": hora,
-                "usuario": usuario.strip(),
-                "mensaje": texto.strip(),
-            }
+            usuario, texto = match.group(8, 9)
+            # sin autor => mensaje del sistema (cifrado, cambios de grupo, etc.)
+            mensaje_actual = MensajeChat(
+                created_at,
+                intern(usuario.strip()) if usuario else "",
+                texto.strip().lstrip("\u200e"),
+            )
         else:
             # Mensaje multilínea
             if mensaje_actual:
-                mensaje_actual["mensaje"] += "\n" + linea
+                mensaje_actual.mensaje += "\n" + linea
 
     # Guardar último mensaje
     if mensaje_actual:
@@ -43,18 +193,111 @@ def parsear_chat(path):
     return mensajes
 
 
-def normalizar_fecha(fecha):
+def _leer_rango(path, inicio, fin):
+    """
+    Líneas del rango [inicio, fin) de bytes, iguales a las que daría
+    readlines() sobre el archivo completo: el rango arranca después de un
+    fin de línea, así que no corta caracteres UTF-8 ni pares CRLF.
+    """
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        datos = mm[inicio:fin]
+    texto = datos.decode("utf-8-sig" if inicio == 0 else "utf-8", errors="ignore")
+    # newline=None: misma traducción de \r\n y \r que open() en modo texto
+    return io.StringIO(texto, newline=None).readlines()
+
+
+def _parsear_rango(path, inicio, fin, formato, mes_primero):
+    return parsear_lineas(_leer_rango(path, inicio, fin), formato, mes_primero)
+
+
+def _cortes(mm, formato, mes_primero, partes):
+    """
+    Offsets donde partir el archivo en ~`partes` rangos. Cada corte cae al
+    principio de una línea que abre un mensaje (mismo criterio que
+    parsear_lineas), así ningún mensaje multilínea queda partido.
+    """
+    tam = len(mm)
+    fechas = {}
+    cortes = [0]
+    for i in range(1, partes):
+        pos = mm.find(b"\n", max(tam * i // partes, cortes[-1])) + 1
+        while 0 < pos < tam:
+            fin_linea = mm.find(b"\n", pos)
+            if fin_linea == -1:
+                fin_linea = tam
+            # en modo texto un \r suelto también corta línea
+            linea = _limpiar(mm[pos:fin_linea].decode("utf-8", errors="ignore").split("\r", 1)[0])
+            match = formato.patron.match(linea)
+            if match and _fecha_mensaje(match, mes_primero, fechas) is not None:
+                cortes.append(pos)
+                break
+            pos = fin_linea + 1
+        else:
+            break
+    cortes.append(tam)
+    return cortes
+
+
+def parsear_chat_paralelo(path, formato, mes_primero, workers=None):
     """
-    Convierte:
-    5/1/26  -> 05/01/2026
-    05/01/2026 -> 05/01/2026
+    Parseo en paralelo para exports grandes: mmap del archivo, cortes en
+    inicios de mensaje, cada rango en un proceso y los resultados pegados en
+    orden. Devuelve exactamente lo mismo que parsear_lineas sobre el archivo.
     """
-    partes = fecha.split("/")
-    dia = partes[0].zfill(2)
-    mes = partes[1].zfill(2)
-    anio = partes[2]
+    workers = workers or PARSEO_PARALELO_WORKERS
+    if os.path.getsize(path) == 0:
+        return []
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        cortes = _cortes(mm, formato, mes_primero, workers)
+
+    rangos = list(zip(cortes, cortes[1:]))
+    if len(rangos) == 1:
+        return _parsear_rango(path, 0, cortes[-1], formato, mes_primero)
+
+    mensajes = []
+    # spawn: el server corre con threads y fork podría heredar locks tomados
+    with ProcessPoolExecutor(max_workers=len(rangos), mp_context=multiprocessing.get_context("spawn")) as pool:
+        futuros = [
+            pool.submit(_parsear_rango, path, inicio, fin, formato, mes_primero)
+            for inicio, fin in rangos
+        ]
+        for futuro in futuros:
+            mensajes.extend(futuro.result())
+    return mensajes
+
+
+def parsear_chat(path, formato=None):
+    with open(path, "r", encoding="utf-8-sig", errors="ignore") as f:
+        # la detección solo mira el principio: no hace falta leer todo
+        cabecera = list(islice(f, LINEAS_DETECCION))
+
+    if formato is None:
+        formato = detectar_formato(cabecera)
+    mes_primero = detectar_orden_fecha(cabecera, formato) == "mdy"
 
-    if len(anio) == 2:
-        anio = "20" + anio
+    tam = os.path.getsize(path)
+    if tam >= PARSEO_PARALELO_MIN_BYTES and PARSEO_PARALELO_WORKERS > 1:
+        return parsear_chat_paralelo(path, formato, mes_primero)
 
-    return f"{dia}/{mes}/{anio}"
+    with open(path, "r", encoding="utf-8-sig", errors="ignore") as f:
+        lineas = f.readlines()
+    return parsear_lineas(lineas, formato, mes_primero)
+
+
+# --- quick demo / throughput: python parser.py chat.txt [formato] ---
+if __name__ == "__main__":
+    with open(sys.argv[1], "r", encoding="utf-8-sig", errors="ignore") as f:
+        lineas = f.readlines()
+
+    formato = FORMATOS[sys.argv[2]] if len(sys.argv) > 2 else detectar_formato(lineas)
+    mes_primero = detectar_orden_fecha(lineas, formato) == "mdy"
+
+    t0 = time.perf_counter()
+    mensajes = parsear_lineas(lineas, formato, mes_primero)
+    segundos = time.perf_counter() - t0 or 1e-9
+
+    print(
+        f"formato={formato.nombre} mes_primero={mes_primero} lineas={len(lineas)} "
+        f"mensajes={len(mensajes)} sistema={sum(m.sistema for m in mensajes)} "
+        f"{len(lineas) / segundos:,.0f} lineas/s"
+    )
@@ -0,0 +1,33 @@
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, Query
+from sqlmodel import Session
+
+from controllers.audit_controller import HISTORIAL_LIMITE_DEFAULT, HISTORIAL_LIMITE_MAX, listar_acciones
+from database import get_session
+from services.permissions import require_roles
+
+router = APIRouter(prefix="/audit", tags=["Audit"])
+
+
+@router.get("/actions")
+def audit_actions(
+    user_id: int | None = None,
+    desde: datetime | None = None,
+    hasta: datetime | None = None,
+    action: str | None = None,
+    limite: int = Query(default=HISTORIAL_LIMITE_DEFAULT, ge=1, le=HISTORIAL_LIMITE_MAX),
+    antes: str | None = None,
+    current_user = Depends(require_roles(1)),  # Admin
+    session: Session = Depends(get_session),
+):
+    return listar_acciones(
+        team_id=current_user.team_id,
+        session=session,
+        user_id=user_id,
+        desde=desde,
+        hasta=hasta,
+        action=action,
+        limite=limite,
+        antes=antes,
+    )
@@ -1,13 +1,22 @@
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException
-from fastapi.responses import FileResponse
+from typing import Literal
+
+from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Request, Query
 from sqlmodel import Session
 from database import get_session
-from controllers.chat_controller import procesar_chat, obtener_chats, obtener_chat, obtener_chat_full
-from controllers.storage_controller import obtener_archivo_para_descarga, listar_archivos_de_chat
+from controllers.chat_controller import procesar_chat, procesar_chats_lote, obtener_chats, obtener_chat, obtener_chat_full
+from controllers.storage_controller import (
+    obtener_descarga,
+    obtener_compatible,
+    obtener_thumbnail,
+    respuesta_descarga,
+    listar_archivos_de_chat,
+    LISTADO_LIMITE_DEFAULT,
+    LISTADO_LIMITE_MAX,
+)
 from dependencies.auth import get_current_user
 from services.permissions import require_roles
 from models.users import User
-from controllers.contact_sync_controller import sync_contactos_controller 
+from controllers.contact_sync_controller import sync_contactos_controller, perfil_ultimo_sync_controller
 
 router = APIRouter(tags=["Chat"])
 
@@ -20,6 +29,15 @@ def procesar(
     return procesar_chat(file, current_user, session)
 
 
+@router.post("/procesar/lote")
+def procesar_lote(
+    files: list[UploadFile] = File(...),
+    current_user: User = Depends(require_roles(1)),
+    session: Session = Depends(get_session)
+):
+    return procesar_chats_lote(files, current_user, session)
+
+
 @router.get("/chats")
 def listar_chats(
     current_user: User = Depends(require_roles(1)),
@@ -47,6 +65,8 @@ def chat_full(
 @router.get("/chats/archivos/{archivo_id}")
 def descargar_archivo(
     archivo_id: int,
+    request: Request,
+    compatible: bool = False,
     current_user: User = Depends(require_roles(1)),
     session: Session = Depends(get_session),
 ):
@@ -54,22 +74,47 @@ def descargar_archivo(
     if team_id is None:
         raise HTTPException(status_code=500, detail="User sin team_id (ajustar modelo/permiso)")
 
-    archivo = obtener_archivo_para_descarga(
+    descarga = obtener_descarga(
         archivo_id=archivo_id,
         team_id=team_id,
         session=session,
     )
 
-    return FileResponse(
-        path=archivo.path,
-        media_type=archivo.mime_type or "application/octet-stream",
-        filename=archivo.filename,
+    # ?compatible=true: la copia AAC de una nota de voz (si ya se generó)
+    if compatible:
+        descarga = obtener_compatible(descarga, archivo_id=archivo_id, session=session)
+
+    # ETag / 304 y Range (seek de audio/video) sin releer el archivo entero
+    return respuesta_descarga(descarga, request.headers)
+
+
+@router.get("/chats/archivos/{archivo_id}/thumb")
+def miniatura_archivo(
+    archivo_id: int,
+    request: Request,
+    lado: int | None = Query(default=None, ge=1, le=2048),
+    current_user: User = Depends(require_roles(1)),
+    session: Session = Depends(get_session),
+):
+    team_id = getattr(current_user, "team_id", None)
+    if team_id is None:
+        raise HTTPException(status_code=500, detail="User sin team_id (ajustar modelo/permiso)")
+
+    descarga = obtener_descarga(
+        archivo_id=archivo_id,
+        team_id=team_id,
+        session=session,
     )
+    thumb = obtener_thumbnail(descarga, lado=lado)
+    return respuesta_descarga(thumb, request.headers, content_disposition_type="inline")
 
 
 @router.get("/chats/{chat_id}/archivos")
 def archivos_de_chat(
     chat_id: int,
+    tipo: Literal["image", "audio", "video", "file"] | None = None,
+    limite: int = Query(default=LISTADO_LIMITE_DEFAULT, ge=1, le=LISTADO_LIMITE_MAX),
+    despues: str | None = None,
     current_user: User = Depends(require_roles(1)),
     session: Session = Depends(get_session),
 ):
@@ -81,6 +126,9 @@ def archivos_de_chat(
         chat_id=chat_id,
         team_id=team_id,
         session=session,
+        tipo=tipo,
+        limite=limite,
+        despues=despues,
     )
 
 
@@ -98,4 +146,11 @@ def sync_contacts(
         team_id=current_user.team_id,
         # user_id=current_user.id,
         session=session,
-    )
\ No newline at end of file
+    )
+
+
+@router.get("/sync/outlook/profile")
+def sync_contacts_profile(
+    current_user = Depends(require_roles(1)),
+):
+    return perfil_ultimo_sync_controller(team_id=current_user.team_id)
@@ -0,0 +1,70 @@
+# path: routes/internal_routes.py
+"""
+Endpoints operativos (no son de la UI).
+
+/metrics y /slow-queries: con METRICS_TOKEN definido se entra con
+"Authorization: Bearer <token>" (lo que usa el scraper de Prometheus); sin
+él, solo un admin logueado. /metrics incluye los contadores de la auditoría
+(services/auditoria). /profiles: solo admin.
+"""
+from __future__ import annotations
+
+import hmac
+import os
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse
+from sqlmodel import Session
+
+from database import get_session
+from dependencies.auth import get_current_user
+from services import auditoria
+from services.instrumentacion import SLOW_QUERY_MS, consultas_lentas, render_prometheus
+from services.permissions import require_roles
+from services.profiler import leer_perfil, listar_perfiles
+
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+ROL_ADMIN = 1
+
+router = APIRouter(prefix="/internal", tags=["Internal"], include_in_schema=False)
+
+
+def acceso_interno(request: Request, session: Session = Depends(get_session)) -> None:
+    if METRICS_TOKEN:
+        auth = request.headers.get("Authorization", "")
+        esquema, _, token = auth.partition(" ")
+        if esquema.lower() != "bearer" or not hmac.compare_digest(token.strip(), METRICS_TOKEN):
+            raise HTTPException(status_code=401, detail="Token inválido")
+        return
+
+    user = get_current_user(request, session)
+    if user.rol_id != ROL_ADMIN:
+        raise HTTPException(status_code=403, detail="No tenés permisos para esta acción")
+
+
+@router.get("/metrics", dependencies=[Depends(acceso_interno)])
+def metrics():
+    return PlainTextResponse(render_prometheus() + auditoria.render_prometheus(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@router.get("/slow-queries", dependencies=[Depends(acceso_interno)])
+def slow_queries():
+    return {"umbral_ms": SLOW_QUERY_MS, "muestras": consultas_lentas()}
+
+
+@router.get("/profiles", dependencies=[Depends(require_roles(ROL_ADMIN))])
+def perfiles(limite: int = Query(50, ge=1, le=500)):
+    return listar_perfiles(limite)
+
+
+@router.get("/profiles/{perfil_id}", dependencies=[Depends(require_roles(ROL_ADMIN))])
+def perfil(perfil_id: str):
+    # formato folded: flamegraph.pl / inferno / speedscope
+    folded = leer_perfil(perfil_id)
+    if folded is None:
+        raise HTTPException(status_code=404, detail="Perfil no encontrado")
+    return PlainTextResponse(
+        folded,
+        headers={"Content-Disposition": f'attachment; filename="{perfil_id}.folded"'},
+    )
@@ -0,0 +1,310 @@
+# path: services/audio_service.py
+"""
+Procesamiento offline de audios guardados (notas de voz): duración, forma de
+onda compacta y, opcional, una copia transcodificada que reproduce cualquier
+browser (AAC en .m4a; Safari viejo no reproduce Ogg/Opus).
+
+Con ffmpeg/ffprobe en el PATH se usa eso. Sin ffmpeg:
+- Ogg/Opus: se leen las páginas Ogg en Python. Duración exacta por el
+  granule de la última página; la forma de onda sale del tamaño de los
+  paquetes (Opus es VBR: más señal => paquetes más grandes).
+- WAV: módulo wave de la stdlib (picos reales).
+- sin transcode.
+
+Corre en segundo plano después de cada import y se puede correr a mano:
+    python -m services.audio_service [--chat-id N] [--limite N]
+"""
+from __future__ import annotations
+
+import argparse
+import base64
+import json
+import logging
+import os
+import shutil
+import struct
+import subprocess
+import threading
+import wave
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+from sqlmodel import Session, select
+
+from models.archivos import Archivo
+from services.bulk_update import bulk_update_by_id
+from services.storage_service import publicar, ruta_local
+
+logger = logging.getLogger(__name__)
+
+# puntos de la forma de onda (0..255 cada uno, se guarda en base64: 88 chars)
+WAVEFORM_PUNTOS = 64
+
+TRANSCODES_DIRNAME = ".transcodes"
+AUDIO_TRANSCODE = os.getenv("AUDIO_TRANSCODE", "1") == "1"
+# formatos que ya reproduce cualquier browser: no se transcodifican
+_MIME_COMPATIBLES = {"audio/mpeg", "audio/mp4", "audio/aac", "audio/x-m4a"}
+
+AUDIO_ON_IMPORT = os.getenv("AUDIO_ON_IMPORT", "1") == "1"
+AUDIO_WORKERS = int(os.getenv("AUDIO_WORKERS", "1"))
+FFMPEG_TIMEOUT = 120
+# una vez al importar (como thumbnail_service): which() recorre el PATH y
+# analizar_audio corre por cada audio de la tanda
+FFMPEG_DISPONIBLE = shutil.which("ffmpeg") is not None and shutil.which("ffprobe") is not None
+# audios por tanda al procesar pendientes
+AUDIO_LOTE = 200
+
+_pool: ThreadPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class AudioInfo:
+    # 0 = se intentó y no se pudo leer (no se reintenta)
+    duracion_ms: int
+    waveform: str | None = None
+    transcode_path: str | None = None
+
+
+def waveform_a_lista(waveform: str | None) -> list[int] | None:
+    return list(base64.b64decode(waveform)) if waveform else None
+
+
+def _waveform(valores, puntos: int = WAVEFORM_PUNTOS) -> str | None:
+    """Pico (valor absoluto) por tramo, escalado a 0..255 y en base64."""
+    n = len(valores)
+    if not n:
+        return None
+    puntos = min(puntos, n)
+    picos = [max(abs(v) for v in valores[i * n // puntos:(i + 1) * n // puntos]) for i in range(puntos)]
+    tope = max(picos) or 1
+    return base64.b64encode(bytes(round(p * 255 / tope) for p in picos)).decode("ascii")
+
+
+# -------------------------
+# Con ffmpeg
+# -------------------------
+
+def _duracion_ffprobe(path: str) -> int | None:
+    out = subprocess.run(
+        ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "json", path],
+        capture_output=True, timeout=FFMPEG_TIMEOUT,
+    )
+    try:
+        return round(float(json.loads(out.stdout)["format"]["duration"]) * 1000)
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _waveform_ffmpeg(path: str) -> str | None:
+    # PCM mono 16 bits a 4 kHz: alcanza para picos y son ~8 KB por segundo
+    out = subprocess.run(
+        ["ffmpeg", "-v", "error", "-i", path, "-vn", "-ac", "1", "-ar", "4000", "-f", "s16le", "-"],
+        capture_output=True, timeout=FFMPEG_TIMEOUT,
+    )
+    muestras = array("h")
+    muestras.frombytes(out.stdout[: len(out.stdout) // 2 * 2])
+    return _waveform(muestras)
+
+
+def transcode_path(original_path: str) -> Path:
+    original = Path(original_path)
+    return original.parent / TRANSCODES_DIRNAME / f"{original.name}.m4a"
+
+
+def _transcodificar(path: str) -> str | None:
+    destino = transcode_path(path)
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    tmp = destino.with_name(f"{destino.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    out = subprocess.run(
+        ["ffmpeg", "-v", "error", "-y", "-i", path, "-vn", "-ac", "1", "-c:a", "aac", "-b:a", "48k",
+         "-movflags", "+faststart", "-f", "mp4", str(tmp)],
+        capture_output=True, timeout=FFMPEG_TIMEOUT,
+    )
+    if out.returncode != 0 or not tmp.exists():
+        tmp.unlink(missing_ok=True)
+        return None
+    os.replace(tmp, destino)
+    # con backend remoto se sube y se guarda la URI
+    return publicar(str(destino))
+
+
+# -------------------------
+# Sin ffmpeg
+# -------------------------
+
+def _paquetes_ogg(path: str):
+    """(granule, paquetes) por página de un stream Ogg (un solo stream lógico)."""
+    with open(path, "rb") as f:
+        pendiente = b""
+        while True:
+            cabecera = f.read(27)
+            if len(cabecera) < 27 or cabecera[:4] != b"OggS":
+                return
+            granule = struct.unpack_from("<q", cabecera, 6)[0]
+            lacing = f.read(cabecera[26])
+            cuerpo = f.read(sum(lacing))
+            paquetes, pos = [], 0
+            for largo in lacing:
+                pendiente += cuerpo[pos:pos + largo]
+                pos += largo
+                if largo < 255:
+                    paquetes.append(pendiente)
+                    pendiente = b""
+            yield granule, paquetes
+
+
+def _analizar_ogg_opus(path: str) -> AudioInfo | None:
+    pre_skip = None
+    ultimo_granule = 0
+    tamanos: list[int] = []
+    for granule, paquetes in _paquetes_ogg(path):
+        for paquete in paquetes:
+            if paquete.startswith(b"OpusHead"):
+                pre_skip = struct.unpack_from("<H", paquete, 10)[0]
+            elif not paquete.startswith(b"OpusTags"):
+                tamanos.append(len(paquete))
+        if granule > 0:
+            ultimo_granule = granule
+    if pre_skip is None:
+        return None
+    # el granule de Opus siempre va en muestras a 48 kHz
+    duracion_ms = max(0, ultimo_granule - pre_skip) * 1000 // 48000
+    return AudioInfo(duracion_ms=duracion_ms, waveform=_waveform(tamanos))
+
+
+def _analizar_wav(path: str) -> AudioInfo | None:
+    try:
+        with wave.open(path, "rb") as w:
+            if w.getsampwidth() != 2 or not w.getframerate():
+                return AudioInfo(duracion_ms=w.getnframes() * 1000 // (w.getframerate() or 1))
+            frames = w.getnframes()
+            muestras = array("h")
+            muestras.frombytes(w.readframes(frames))
+            return AudioInfo(
+                duracion_ms=frames * 1000 // w.getframerate(),
+                # canales intercalados: alcanza con el pico de cualquiera
+                waveform=_waveform(muestras),
+            )
+    except (wave.Error, EOFError):
+        return None
+
+
+def analizar_audio(path: str, mime_type: str | None) -> AudioInfo:
+    """Duración + forma de onda (+ transcode si corresponde) de un audio guardado."""
+    try:
+        # Archivo.path puede ser una URI del backend: se trabaja sobre la copia local
+        path = ruta_local(path)
+    except FileNotFoundError:
+        return AudioInfo(duracion_ms=0)
+    if not os.path.exists(path):
+        return AudioInfo(duracion_ms=0)
+
+    if FFMPEG_DISPONIBLE:
+        try:
+            duracion_ms = _duracion_ffprobe(path)
+            if duracion_ms is None:
+                return AudioInfo(duracion_ms=0)
+            transcode = None
+            if AUDIO_TRANSCODE and (mime_type or "").lower() not in _MIME_COMPATIBLES:
+                try:
+                    transcode = _transcodificar(path)
+                except Exception:
+                    # publicar() levanta las excepciones del backend (botocore con
+                    # S3): la duración y la forma de onda se guardan igual, sin copia
+                    logger.warning("audio: no se pudo transcodificar/publicar %s", path, exc_info=True)
+            return AudioInfo(duracion_ms=duracion_ms, waveform=_waveform_ffmpeg(path), transcode_path=transcode)
+        except (OSError, subprocess.TimeoutExpired):
+            logger.warning("audio: ffmpeg falló con %s, se usa el parser local", path, exc_info=True)
+
+    info = None
+    try:
+        with open(path, "rb") as f:
+            firma = f.read(4)
+        if firma == b"OggS":
+            info = _analizar_ogg_opus(path)
+        elif firma == b"RIFF":
+            info = _analizar_wav(path)
+    except (OSError, struct.error):
+        info = None
+    return info or AudioInfo(duracion_ms=0)
+
+
+# -------------------------
+# Etapa de procesamiento
+# -------------------------
+
+def procesar_audios_pendientes(session, *, chat_id: int | None = None, limite: int = AUDIO_LOTE) -> int:
+    """
+    Procesa hasta `limite` audios sin duración (del chat, o de todos) y los
+    actualiza en bloque. Devuelve cuántos procesó; 0 = no quedan.
+    """
+    stmt = (
+        select(Archivo.id, Archivo.path, Archivo.mime_type)
+        .where(Archivo.tipo == "audio")
+        .where(Archivo.duracion_ms.is_(None))
+    )
+    if chat_id is not None:
+        stmt = stmt.where(Archivo.chat_id == chat_id)
+    rows = session.exec(stmt.order_by(Archivo.id).limit(limite)).all()
+    if not rows:
+        return 0
+
+    filas = []
+    for archivo_id, path, mime_type in rows:
+        try:
+            info = analizar_audio(path, mime_type)
+        except Exception:
+            # un archivo roto (o el backend caído al bajarlo) no frena la tanda;
+            # queda en 0 como los ilegibles: si quedara NULL se volvería a elegir
+            logger.warning("audio: falló el análisis del archivo %s", archivo_id, exc_info=True)
+            info = AudioInfo(duracion_ms=0)
+        filas.append({
+            "id": archivo_id,
+            "duracion_ms": info.duracion_ms,
+            "waveform": info.waveform,
+            "transcode_path": info.transcode_path,
+        })
+    bulk_update_by_id(session.connection(), Archivo.__table__, filas)
+    session.commit()
+    return len(filas)
+
+
+def _procesar_chat(chat_id: int) -> None:
+    from database import engine
+
+    try:
+        with Session(engine) as session:
+            while procesar_audios_pendientes(session, chat_id=chat_id):
+                pass
+    except Exception:
+        # en segundo plano: se loguea y quedan pendientes para la próxima corrida
+        logger.exception("audio: falló el procesamiento del chat %s", chat_id)
+
+
+def encolar_audios_de_chat(chat_id: int) -> None:
+    """Procesa en segundo plano los audios pendientes del chat (post-import)."""
+    global _pool
+    if not AUDIO_ON_IMPORT:
+        return
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=AUDIO_WORKERS, thread_name_prefix="audio")
+        _pool.submit(_procesar_chat, chat_id)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Procesa audios sin duración/forma de onda")
+    parser.add_argument("--chat-id", type=int, default=None)
+    parser.add_argument("--limite", type=int, default=AUDIO_LOTE)
+    args = parser.parse_args()
+
+    from database import engine
+
+    total = 0
+    with Session(engine) as session:
+        while n := procesar_audios_pendientes(session, chat_id=args.chat_id, limite=args.limite):
+            total += n
+    print("Audios procesados:", total)
@@ -0,0 +1,259 @@
+# path: services/auditoria.py
+"""
+Auditoría de acciones (tabla user_actions) sin sumar una escritura por request.
+
+- AuditoriaMiddleware (ASGI puro): al terminar cada request auditado arma la
+  fila (usuario y team del JWT, sin ir a la DB; acción = nombre del endpoint)
+  y la deja en una cola en memoria acotada a AUDIT_QUEUE_MAX. Nunca espera:
+  si la cola está llena la acción se descarta y se cuenta. Donde el JWT no
+  dice quién es (POST /login) el endpoint lo anota con anotar_usuario.
+- Un thread (iniciar/detener, en el startup/shutdown de la app) vacía la cola
+  con un INSERT por lote: cuando junta AUDIT_BATCH filas o pasan
+  AUDIT_FLUSH_SECONDS desde la primera del lote, lo que llegue antes.
+  Si el INSERT falla el lote se pierde (y se cuenta): el request ya respondió.
+
+Se auditan los métodos de AUDIT_METHODS (default los que modifican) sobre
+rutas que matchearon, salvo los prefijos de AUDIT_EXCLUDE. Del body no se
+guarda nada (puede traer contraseñas o archivos): el payload es status,
+duración, query string, path params e IP. Los contadores salen en
+GET /internal/metrics.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import insert
+from starlette.requests import Request
+
+from models.user_actions import UserAction
+
+logger = logging.getLogger(__name__)
+
+AUDIT_ENABLED = os.getenv("AUDIT_ENABLED", "1") == "1"
+AUDIT_METHODS = frozenset(m.strip().upper() for m in os.getenv("AUDIT_METHODS", "POST,PUT,PATCH,DELETE").split(",") if m.strip())
+AUDIT_EXCLUDE = tuple(p.strip() for p in os.getenv("AUDIT_EXCLUDE", "/internal").split(",") if p.strip())
+AUDIT_QUEUE_MAX = int(os.getenv("AUDIT_QUEUE_MAX", "10000"))
+AUDIT_BATCH = int(os.getenv("AUDIT_BATCH", "500"))
+AUDIT_FLUSH_SECONDS = float(os.getenv("AUDIT_FLUSH_SECONDS", "2"))
+# al apagar: cuánto se espera a que se escriba lo que quedó en la cola
+AUDIT_SHUTDOWN_SECONDS = float(os.getenv("AUDIT_SHUTDOWN_SECONDS", "5"))
+
+# largo máximo de la query string guardada
+QUERY_MAX = 500
+
+_cola: queue.Queue[dict] = queue.Queue(maxsize=AUDIT_QUEUE_MAX)
+
+_lock = threading.Lock()
+_contadores = {
+    "encoladas": 0,
+    "escritas": 0,
+    "lotes": 0,
+    "descartadas_cola_llena": 0,
+    "descartadas_error": 0,
+}
+
+
+def _sumar(clave: str, n: int = 1) -> None:
+    with _lock:
+        _contadores[clave] += n
+
+
+def estadisticas() -> dict:
+    with _lock:
+        return {**_contadores, "en_cola": _cola.qsize()}
+
+
+# -------------------------
+# Captura
+# -------------------------
+
+def _auditable(scope) -> bool:
+    return (
+        scope["method"] in AUDIT_METHODS
+        and scope.get("endpoint") is not None  # 404: no hay acción
+        and not scope["path"].startswith(AUDIT_EXCLUDE)
+    )
+
+
+def anotar_usuario(request: Request, *, user_id: int | None, team_id: int | None) -> None:
+    """Usuario y team de la fila de este request, en lugar de los del JWT."""
+    request.state.auditoria_usuario = (user_id, team_id)
+
+
+def _usuario(scope) -> tuple[int | None, int | None]:
+    from dependencies.auth import payload_del_token
+
+    # request.state vive en scope["state"]: lo que anotó el endpoint
+    anotado = scope.get("state", {}).get("auditoria_usuario")
+    if anotado is not None:
+        return anotado
+    token = payload_del_token(Request(scope)) or {}
+    try:
+        user_id = int(token["sub"])
+    except (KeyError, TypeError, ValueError):
+        user_id = None
+    return user_id, token.get("team_id")
+
+
+def _fila(scope, status: int, segundos: float) -> dict:
+    user_id, team_id = _usuario(scope)
+    client = scope.get("client")
+    query = scope.get("query_string", b"").decode("latin-1")
+    return {
+        "user_id": user_id,
+        "team_id": team_id,
+        "method": scope["method"],
+        "path": scope["path"],
+        "action": getattr(scope["endpoint"], "__name__", "desconocida"),
+        "payload": {
+            "status": status,
+            "ms": round(segundos * 1000, 1),
+            "query": query[:QUERY_MAX] or None,
+            "path_params": {k: str(v) for k, v in scope.get("path_params", {}).items()} or None,
+            "ip": client[0] if client else None,
+        },
+        "created_at": datetime.utcnow(),
+    }
+
+
+def registrar(fila: dict) -> bool:
+    """Encola una fila de user_actions; False si se descartó (cola llena)."""
+    try:
+        _cola.put_nowait(fila)
+    except queue.Full:
+        _sumar("descartadas_cola_llena")
+        return False
+    _sumar("encoladas")
+    return True
+
+
+class AuditoriaMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if not AUDIT_ENABLED or scope["type"] != "http" or scope["method"] not in AUDIT_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        t0 = time.perf_counter()
+
+        async def send_con_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_con_status)
+        finally:
+            if _auditable(scope):
+                registrar(_fila(scope, status, time.perf_counter() - t0))
+
+
+# -------------------------
+# Escritura por lotes
+# -------------------------
+
+class _Escritor(threading.Thread):
+    def __init__(self, engine):
+        super().__init__(name="auditoria", daemon=True)
+        self.engine = engine
+        self._parar = threading.Event()
+
+    def _lote(self) -> list[dict]:
+        # espera la primera fila sin límite (de a ratos, para ver _parar) y
+        # después junta hasta AUDIT_BATCH o hasta que vence el plazo
+        while True:
+            try:
+                lote = [_cola.get(timeout=0.5)]
+                break
+            except queue.Empty:
+                if self._parar.is_set():
+                    return []
+        limite = time.monotonic() + AUDIT_FLUSH_SECONDS
+        while len(lote) < AUDIT_BATCH:
+            restante = 0 if self._parar.is_set() else limite - time.monotonic()
+            try:
+                lote.append(_cola.get(timeout=restante) if restante > 0 else _cola.get_nowait())
+            except queue.Empty:
+                break
+        return lote
+
+    def _escribir(self, lote: list[dict]) -> None:
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(insert(UserAction.__table__), lote)
+        except Exception:
+            _sumar("descartadas_error", len(lote))
+            logger.warning("auditoria: no se pudo escribir un lote de %s acciones", len(lote), exc_info=True)
+            return
+        with _lock:
+            _contadores["escritas"] += len(lote)
+            _contadores["lotes"] += 1
+
+    def run(self) -> None:
+        while True:
+            lote = self._lote()
+            if not lote:
+                return  # _parar y la cola vacía
+            self._escribir(lote)
+
+    def parar(self, timeout: float) -> None:
+        self._parar.set()
+        self.join(timeout)
+
+
+_escritor: _Escritor | None = None
+
+
+def iniciar(engine) -> None:
+    global _escritor
+    if not AUDIT_ENABLED or (_escritor is not None and _escritor.is_alive()):
+        return
+    _escritor = _Escritor(engine)
+    _escritor.start()
+
+
+def detener() -> None:
+    """Escribe lo que quedó en la cola (hasta AUDIT_SHUTDOWN_SECONDS) y frena el thread."""
+    global _escritor
+    if _escritor is None:
+        return
+    _escritor.parar(AUDIT_SHUTDOWN_SECONDS)
+    if _escritor.is_alive():
+        logger.warning("auditoria: quedaron %s acciones sin escribir al apagar", _cola.qsize())
+    _escritor = None
+
+
+# -------------------------
+# Exposición (se suma a GET /internal/metrics)
+# -------------------------
+
+def render_prometheus() -> str:
+    e = estadisticas()
+    lineas = [
+        "# HELP audit_actions_enqueued_total Acciones auditadas encoladas.",
+        "# TYPE audit_actions_enqueued_total counter",
+        f"audit_actions_enqueued_total {e['encoladas']}",
+        "# HELP audit_actions_written_total Acciones escritas en user_actions.",
+        "# TYPE audit_actions_written_total counter",
+        f"audit_actions_written_total {e['escritas']}",
+        "# HELP audit_batches_total INSERTs por lote ejecutados.",
+        "# TYPE audit_batches_total counter",
+        f"audit_batches_total {e['lotes']}",
+        "# HELP audit_actions_dropped_total Acciones perdidas, por motivo.",
+        "# TYPE audit_actions_dropped_total counter",
+        f'audit_actions_dropped_total{{reason="queue_full"}} {e["descartadas_cola_llena"]}',
+        f'audit_actions_dropped_total{{reason="db_error"}} {e["descartadas_error"]}',
+        "# HELP audit_queue_size Acciones esperando a escribirse.",
+        "# TYPE audit_queue_size gauge",
+        f"audit_queue_size {e['en_cola']}",
+    ]
+    return "\n".join(lineas) + "\n"
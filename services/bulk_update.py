@@ -0,0 +1,61 @@
+# path: services/bulk_update.py
+
+from __future__ import annotations
+
+import time
+from typing import Any
+
+from sqlalchemy import bindparam, text, update
+
+# filas por UPDATE (en Postgres viajan como un array por columna)
+WRITE_CHUNK_SIZE = 10000
+
+
+def bulk_update_by_id(conn, table, rows: list[dict[str, Any]], *, chunk_size: int = WRITE_CHUNK_SIZE) -> list[dict[str, Any]]:
+    """
+    UPDATE por id en bloques; `conn` puede ser Session o Connection y todas
+    las filas traen las mismas columnas.
+
+    En Postgres: UPDATE ... FROM unnest(arrays), un statement y un parámetro
+    por columna por bloque. En otros motores: executemany del UPDATE por id.
+    Devuelve el tiempo de cada bloque.
+    """
+    if not rows:
+        return []
+
+    cols = [k for k in rows[0] if k != "id"]
+    dialect = conn.get_bind().dialect if hasattr(conn, "get_bind") else conn.dialect
+
+    if dialect.name == "postgresql":
+        all_cols = ["id", *cols]
+        arrays = ", ".join(
+            f"CAST(:{c} AS {table.c[c].type.compile(dialect=dialect)}[])" for c in all_cols
+        )
+        stmt = text(
+            f"UPDATE {table.name} AS t SET {', '.join(f'{c} = v.{c}' for c in cols)} "
+            f"FROM unnest({arrays}) AS v({', '.join(all_cols)}) "
+            f"WHERE t.id = v.id"
+        )
+    else:
+        stmt = (
+            update(table)
+            .where(table.c.id == bindparam("_id"))
+            .values({c: bindparam(c) for c in cols})
+        )
+
+    timings: list[dict[str, Any]] = []
+    for i in range(0, len(rows), chunk_size):
+        chunk = rows[i:i + chunk_size]
+        t0 = time.perf_counter()
+
+        if dialect.name == "postgresql":
+            conn.execute(stmt, {c: [r[c] for r in chunk] for c in all_cols})
+        else:
+            conn.execute(stmt, [{"_id": r["id"], **{c: r[c] for c in cols}} for r in chunk])
+
+        timings.append({
+            "tabla": table.name,
+            "filas": len(chunk),
+            "ms": round((time.perf_counter() - t0) * 1000, 2),
+        })
+    return timings
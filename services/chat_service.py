@@ -2,11 +2,13 @@
 
 from __future__ import annotations
 
+import hashlib
+import mimetypes
 import os
 import shutil
 import tempfile
 import zipfile
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Any
 
 from fastapi import HTTPException
@@ -16,16 +18,33 @@ from models.archivos import Archivo
 from models.chat import Chat
 from models.contactos import Contacto
 from models.mensaje import Mensaje
+from models.import_checkpoint import ImportCheckpoint
 from models.chat_score_event import ChatScoreEvent
 from models.pipeline_estado import PipelineEstado
 
 from parser import parsear_chat
 from services.chat_scoring_service import aplicar_score, calcular_score_chat
 from services.parserwsp import classify_whatsapp_filename
-from services.storage_service import index_extracted_files, resolve_message_attachments, store_media_file
+from services.contact_resolver import ContactResolver
+from services.phone_normalization import (
+    canonical_phone,
+    phone_suffix_clause,
+    reversed_phone_key,
+    same_phone,
+)
+from services.upserts import LOCK_NS_CHAT, insert_on_conflict, team_xact_lock
+from services.storage_service import (
+    MediaCopyStats,
+    index_extracted_files,
+    resolve_message_attachments,
+    store_media_files,
+)
+from services.thumbnail_service import encolar_thumbnails
+from services.audio_service import encolar_audios_de_chat
 import re
 import unicodedata
-from sqlalchemy import func
+from sqlalchemy import func, insert, update
+from sqlalchemy.exc import IntegrityError
 
 
 DEFAULT_TIPO_TEXTO = "text"
@@ -36,6 +55,15 @@ TIPO_IMG = 2
 TIPO_ARCHIVO = 3
 TIPO_AUDIO = 4
 
+# mensajes por INSERT multi-fila y por commit (checkpoint) durante el import
+IMPORT_BATCH_SIZE = 1000
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# un checkpoint en_curso que se actualizó hace menos que esto es de un import
+# que sigue corriendo (se actualiza en cada commit por bloque); más viejo, el
+# proceso se cortó y se puede reanudar
+IMPORT_EN_CURSO_TTL = int(os.getenv("IMPORT_EN_CURSO_TTL", "600"))
+
 SYSTEM_PATTERNS = [
     "los mensajes y las llamadas están cifrados",
     "cambió tu código de seguridad",
@@ -52,10 +80,6 @@ def _norm_name(s: str) -> str:
     return s
 
 
-def _norm_phone(s: str) -> str:
-    return re.sub(r"\D", "", s or "")
-
-
 def _is_system_line(texto: str) -> bool:
     t = (texto or "").strip().lower()
     return any(p in t for p in SYSTEM_PATTERNS)
@@ -69,24 +93,14 @@ def _is_from_me(*, autor: str, peer_nombre: str, peer_tel: str | None) -> bool:
     if a_name and p_name and a_name == p_name:
         return False
 
-    a_phone = _norm_phone(autor)
-    p_phone = _norm_phone(peer_tel or "")
     # a veces viene con +549... y tu contacto “corto”
-    if a_phone and p_phone and (a_phone.endswith(p_phone) or p_phone.endswith(a_phone)):
+    if same_phone(autor, peer_tel):
         return False
 
     # si no coincide con el contacto => asumimos que es de tu lado (empresa)
     return True
 
 
-def _same_phone(a: str | None, b: str | None) -> bool:
-    aa = _norm_phone(a or "")
-    bb = _norm_phone(b or "")
-    if not aa or not bb:
-        return False
-    return aa.endswith(bb) or bb.endswith(aa)
-
-
 def _find_existing_chat(
     session,
     *,
@@ -94,21 +108,29 @@ def _find_existing_chat(
     nombre_contacto: str,
     telefono_contacto: str | None,
 ) -> Chat | None:
-    tel_norm = _norm_phone(telefono_contacto or "")
-    chat: Chat | None = None
-
-    # 1) buscar por teléfono (si sirve)
-    if tel_norm and tel_norm != _norm_phone("desconocido"):
-        suffix = tel_norm[-8:]  # últimos 8 dígitos para achicar candidatos
+    # 1) buscar por teléfono (si sirve): primero clave canónica exacta,
+    #    después match por sufijo como prefijo de numero_rev
+    numero_key = canonical_phone(telefono_contacto)
+    if numero_key:
+        chat = session.exec(
+            select(Chat)
+            .where(Chat.team_id == team_id)
+            .where(Chat.numero_key == numero_key)
+        ).first()
+        if chat:
+            return chat
 
+    suffix_clause = phone_suffix_clause(Chat.numero_rev, telefono_contacto)
+    if suffix_clause is not None:
         candidatos = session.exec(
             select(Chat)
             .where(Chat.team_id == team_id)
-            .where(Chat.numero.like(f"%{suffix}%"))
+            .where(suffix_clause)
+            .order_by(Chat.id)
         ).all()
 
         for c in candidatos:
-            if _same_phone(c.numero, telefono_contacto):
+            if same_phone(c.numero, telefono_contacto):
                 return c
 
     # 2) fallback por nombre (cuando numero = desconocido)
@@ -126,10 +148,80 @@ def _find_existing_chat(
     return None
 
 
+def _get_or_create_chat(
+    session,
+    *,
+    team_id: int,
+    nombre_contacto: str,
+    telefono_contacto: str | None,
+) -> tuple[Chat, bool]:
+    """
+    Busca o crea el chat del contacto bajo un advisory lock del team (se
+    libera en el próximo commit), así dos imports en paralelo del mismo
+    número no crean dos chats. El ON CONFLICT sobre (team_id, numero_key)
+    cubre además a quien cree chats sin pasar por acá.
+    Devuelve (chat, si se completó el número de un chat "desconocido").
+    """
+    team_xact_lock(session, LOCK_NS_CHAT, team_id)
+
+    chat = _find_existing_chat(
+        session,
+        team_id=team_id,
+        nombre_contacto=nombre_contacto,
+        telefono_contacto=telefono_contacto,
+    )
+
+    if chat:
+        # opcional: si antes estaba "desconocido" y ahora vino número, lo actualizo
+        if (chat.numero == "desconocido" or not chat.numero) and telefono_contacto and telefono_contacto != "desconocido":
+            chat.numero = telefono_contacto
+            chat.numero_key = canonical_phone(telefono_contacto)
+            chat.numero_rev = reversed_phone_key(telefono_contacto)
+            session.add(chat)
+            return chat, True
+        return chat, False
+
+    numero_key = canonical_phone(telefono_contacto)
+    chat_id = insert_on_conflict(
+        session,
+        Chat.__table__,
+        {
+            "team_id": team_id,
+            "nombre": nombre_contacto,
+            "numero": telefono_contacto or "desconocido",
+            "numero_key": numero_key,
+            "numero_rev": reversed_phone_key(telefono_contacto),
+            "score_actual": 0,
+            "creado_en": datetime.utcnow(),
+        },
+        index_elements=["team_id", "numero_key"],
+        index_where=Chat.numero_key.isnot(None),
+    )
+    if chat_id is None:
+        chat = session.exec(
+            select(Chat)
+            .where(Chat.team_id == team_id)
+            .where(Chat.numero_key == numero_key)
+        ).one()
+        return chat, False
+    return session.get(Chat, chat_id), False
+
+
 def _pick_message_tipo(texto: str, attachment_paths: list[str]) -> int:
     if not attachment_paths:
         return TIPO_TEXTO
 
+    # por mime del primer adjunto reconocible (.opus -> audio, .jpg -> imagen)
+    for path in attachment_paths:
+        mime_type, _ = mimetypes.guess_type(path)
+        if mime_type:
+            major = mime_type.split("/", 1)[0]
+            if major == "audio":
+                return TIPO_AUDIO
+            if major == "image":
+                return TIPO_IMG
+            return TIPO_ARCHIVO
+
     t = (texto or "").lower()
     # heurística rápida si whatsapp pone "<Multimedia omitido>"
     if "audio" in t or "ptt" in t or "opus" in t:
@@ -139,6 +231,129 @@ def _pick_message_tipo(texto: str, attachment_paths: list[str]) -> int:
     return TIPO_ARCHIVO
 
 
+def _insertar_mensajes(
+    session,
+    filas: list[dict[str, Any]],
+    adjuntos: dict[int, list[str]],
+    *,
+    team_id: int,
+    chat_id: int,
+    media: MediaCopyStats,
+) -> int:
+    """
+    Inserta un bloque de mensajes con un INSERT multi-fila (RETURNING id en el
+    orden de las filas) y después sus archivos, sin instanciar Mensaje/Archivo
+    ni llenar el identity map. Los adjuntos del bloque se copian juntos en el
+    pool de store_media_files antes del commit; `media` acumula el throughput.
+    Devuelve cuántos archivos se guardaron.
+    """
+    if not filas:
+        return 0
+
+    tabla = Mensaje.__table__
+    ids = session.execute(
+        insert(tabla).returning(tabla.c.id, sort_by_parameter_order=True),
+        filas,
+    ).scalars().all()
+
+    # (fila, src) en orden; un src repetido en el mismo mensaje se copia una vez
+    pares = [
+        (idx, src)
+        for idx, attachment_paths in adjuntos.items()
+        for src in dict.fromkeys(attachment_paths)
+    ]
+    stored, stats = store_media_files(
+        [src for _, src in pares], team_id=team_id, chat_id=chat_id)
+    media.sumar(stats)
+
+    archivos: list[dict[str, Any]] = []
+    for (idx, _), archivo in zip(pares, stored):
+        # si el zip no trae ese archivo, no tires toda la importación
+        if archivo is None:
+            continue
+        archivos.append({
+            "mensaje_id": ids[idx],
+            "chat_id": chat_id,
+            "tipo": archivo.tipo,
+            "filename": archivo.filename,
+            "path": archivo.path,
+            "mime_type": archivo.mime_type,
+            "size": archivo.size,
+        })
+
+    if archivos:
+        session.execute(insert(Archivo.__table__), archivos)
+        # miniaturas para la galería, en segundo plano (no frena el import)
+        encolar_thumbnails([(a["path"], a["mime_type"]) for a in archivos])
+    return len(archivos)
+
+
+def _leer_checkpoint(session, *, team_id: int, sha256: str) -> ImportCheckpoint | None:
+    # FOR UPDATE: dos requests con el mismo ZIP no deciden a la vez (en Postgres)
+    return session.exec(
+        select(ImportCheckpoint)
+        .where(ImportCheckpoint.team_id == team_id)
+        .where(ImportCheckpoint.sha256 == sha256)
+        .with_for_update()
+    ).first()
+
+
+def _abrir_checkpoint(
+    session,
+    *,
+    team_id: int,
+    sha256: str,
+    filename: str,
+    chat_id: int,
+) -> ImportCheckpoint:
+    """
+    Checkpoint del import de este ZIP. Si hay uno cortado (error, o en_curso
+    sin actualizarse hace IMPORT_EN_CURSO_TTL) del mismo chat se reanuda; si
+    ya estaba completo se arranca de cero (reimportar un ZIP duplica
+    mensajes, igual que antes). 409 si el mismo ZIP se está importando ahora.
+    """
+    checkpoint = _leer_checkpoint(session, team_id=team_id, sha256=sha256)
+
+    if checkpoint is None:
+        nuevo = ImportCheckpoint(
+            team_id=team_id, sha256=sha256, filename=filename, chat_id=chat_id)
+        try:
+            with session.begin_nested():
+                session.add(nuevo)
+                session.flush()
+            return nuevo
+        except IntegrityError:
+            # otro request con el mismo ZIP lo creó entre el SELECT y el INSERT
+            checkpoint = _leer_checkpoint(session, team_id=team_id, sha256=sha256)
+
+    if (checkpoint.estado == "en_curso"
+            and datetime.utcnow() - checkpoint.actualizado_en < timedelta(seconds=IMPORT_EN_CURSO_TTL)):
+        raise HTTPException(status_code=409, detail="Este ZIP ya se está importando")
+
+    if checkpoint.estado == "completo" or checkpoint.chat_id != chat_id:
+        checkpoint.chat_id = chat_id
+        checkpoint.ultimo_indice = -1
+        checkpoint.mensajes_guardados = 0
+        checkpoint.archivos_guardados = 0
+
+    checkpoint.filename = filename
+    checkpoint.estado = "en_curso"
+    checkpoint.error = None
+    checkpoint.actualizado_en = datetime.utcnow()
+    session.add(checkpoint)
+    session.flush()
+    return checkpoint
+
+
+def _actualizar_checkpoint(session, checkpoint_id: int, **values: Any) -> None:
+    # UPDATE directo: no depende de que el objeto siga en la sesión entre commits
+    session.execute(
+        update(ImportCheckpoint)
+        .where(ImportCheckpoint.id == checkpoint_id)
+        .values(actualizado_en=datetime.utcnow(), **values)
+    )
+
+
 def upsert_contacto(
     session,
     *,
@@ -146,58 +361,47 @@ def upsert_contacto(
     nombre: str,
     telefono: str | None,
     estado: int,
+    resolver: ContactResolver | None = None,
 ) -> Contacto:
-    if telefono:
-        existing = session.exec(
-            select(Contacto)
-            .where(Contacto.team_id == team_id)
-            .where(Contacto.telefono == telefono)
-        ).first()
-    else:
-        existing = session.exec(
-            select(Contacto)
-            .where(Contacto.team_id == team_id)
-            .where(Contacto.nombre == nombre)
-        ).first()
-
-    if existing:
-        existing.estado = estado
-        if telefono and not existing.telefono:
-            existing.telefono = telefono
-        if nombre and existing.nombre != nombre:
-            existing.nombre = nombre
-        session.add(existing)
-        return existing
+    # sin resolver (import suelto) => una consulta indexada; en lote se comparte el mapa del team
+    if resolver is None:
+        resolver = ContactResolver(session, team_id, preload=False)
+    return resolver.upsert(nombre=nombre, telefono=telefono, estado=estado)
 
-    contacto = Contacto(
-        team_id=team_id,
-        estado=estado,
-        nombre=nombre,
-        telefono=telefono,
-        username=None,
-    )
-    session.add(contacto)
-    return contacto
 
-
-def importar_chat_controller(file, team_id: int, user_id: int, session) -> dict[str, Any]:
+def importar_chat_controller(
+    file,
+    team_id: int,
+    user_id: int,
+    session,
+    *,
+    resolver: ContactResolver | None = None,
+) -> dict[str, Any]:
     nombre_contacto, telefono_contacto, estado_contacto = classify_whatsapp_filename(
         file.filename)
 
     workdir = tempfile.mkdtemp(prefix="wsp_import_")
     upload_path = os.path.join(workdir, os.path.basename(file.filename))
+    checkpoint_id: int | None = None
 
     try:
+        # copia por bloques + sha256 del ZIP (identifica el import para reanudarlo)
+        sha = hashlib.sha256()
         with open(upload_path, "wb") as f:
-            f.write(file.file.read())
-
-        with zipfile.ZipFile(upload_path, "r") as zip_ref:
-            zip_ref.extractall(workdir)
-            chat_txt = next(
-                (os.path.join(workdir, n)
-                 for n in zip_ref.namelist() if n.lower().endswith(".txt")),
-                None,
-            )
+            for bloque in iter(lambda: file.file.read(UPLOAD_CHUNK_SIZE), b""):
+                sha.update(bloque)
+                f.write(bloque)
+
+        try:
+            with zipfile.ZipFile(upload_path, "r") as zip_ref:
+                zip_ref.extractall(workdir)
+                chat_txt = next(
+                    (os.path.join(workdir, n)
+                     for n in zip_ref.namelist() if n.lower().endswith(".txt")),
+                    None,
+                )
+        except zipfile.BadZipFile:
+            raise HTTPException(status_code=400, detail="El archivo no es un ZIP válido")
 
         if not chat_txt:
             raise HTTPException(
@@ -212,59 +416,65 @@ def importar_chat_controller(file, team_id: int, user_id: int, session) -> dict[
             nombre=nombre_contacto,
             telefono=telefono_contacto,
             estado=estado_contacto,
+            resolver=resolver,
         )
         session.commit()
         session.refresh(contacto)
 
-        chat = _find_existing_chat(
+        chat, numero_actualizado = _get_or_create_chat(
             session,
             team_id=team_id,
             nombre_contacto=nombre_contacto,
             telefono_contacto=telefono_contacto,
         )
+        # libera el lock de chats del team antes de importar los mensajes
+        session.commit()
+        if numero_actualizado:
+            extracted_index = index_extracted_files(
+                workdir, chat_txt_path=chat_txt)
 
-        if not chat:
-            chat = Chat(
-                nombre=nombre_contacto,
-                numero=telefono_contacto or "desconocido",
-                team_id=team_id,
-                creado_por=user_id,
-            )
-            session.add(chat)
-            session.commit()
-            session.refresh(chat)
-        else:
-            # opcional: si antes estaba "desconocido" y ahora vino número, lo actualizo
-            if (chat.numero == "desconocido" or not chat.numero) and telefono_contacto and telefono_contacto != "desconocido":
-                chat.numero = telefono_contacto
-                session.add(chat)
-                session.commit()
+        checkpoint = _abrir_checkpoint(
+            session,
+            team_id=team_id,
+            sha256=sha.hexdigest(),
+            filename=file.filename,
+            chat_id=chat.id,
+        )
+        session.commit()
+        checkpoint_id = checkpoint.id
+        # mensajes con índice < desde ya quedaron commiteados en una corrida anterior
+        desde = checkpoint.ultimo_indice + 1
+        archivos_guardados = checkpoint.archivos_guardados
+        mensajes_guardados = checkpoint.mensajes_guardados
+        texto_cliente_para_score: list[str] = []
 
-                extracted_index = index_extracted_files(
-                    workdir, chat_txt_path=chat_txt)
+        # bloque pendiente de INSERT: filas planas + adjuntos por índice de fila
+        filas: list[dict[str, Any]] = []
+        adjuntos: dict[int, list[str]] = {}
+        media = MediaCopyStats()
 
-        archivos_guardados = 0
-        mensajes_guardados = 0
-        texto_cliente_para_score: list[str] = []
-        for m in mensajes:
-            texto = (m.get("mensaje") or "").strip()
-            autor = (m.get("usuario") or "").strip()
-
-            # si no hay autor o es línea sistema => saltar
-            if not autor:
-                if _is_system_line(texto):
-                    continue
+        for idx, m in enumerate(mensajes):
+            texto = (m.mensaje or "").strip()
+            autor = m.usuario.strip()
+
+            # mensajes del sistema (sin autor) o línea sistema => saltar
+            if not autor or _is_system_line(texto):
                 continue
 
-            if _is_system_line(texto):
+            # from_me (también para los ya guardados: el score usa todo el chat)
+            from_me = _is_from_me(
+                autor=autor,
+                peer_nombre=nombre_contacto,
+                peer_tel=telefono_contacto,
+            )
+            if not from_me and texto:
+                texto_cliente_para_score.append(texto.lower())
+
+            if idx < desde:
                 continue
 
-            # fecha/hora
-            if m.get("fecha") and m.get("hora"):
-                created_at = datetime.strptime(
-                    f"{m['fecha']} {m['hora']}", "%d/%m/%Y %H:%M")
-            else:
-                created_at = datetime.utcnow()
+            # fecha/hora (el parser ya la entrega como datetime)
+            created_at = m.created_at or datetime.utcnow()
 
             # ✅ adjuntos (NO lo dejes comentado)
             attachment_paths = resolve_message_attachments(
@@ -275,63 +485,55 @@ def importar_chat_controller(file, team_id: int, user_id: int, session) -> dict[
             # ✅ dedupe manteniendo orden
             attachment_paths = list(dict.fromkeys(attachment_paths))
 
-            # from_me
-            from_me = _is_from_me(
-                autor=autor,
-                peer_nombre=nombre_contacto,
-                peer_tel=telefono_contacto,
-            )
-            if not from_me and texto:
-                texto_cliente_para_score.append(texto.lower())
-            msg = Mensaje(
-                chat_id=chat.id,
-                contacto_id=contacto.id,
-                tipo=_pick_message_tipo(texto, attachment_paths),
-                texto=texto,
-                autor_raw=autor,
-                from_me=from_me,
-                created_at=created_at,
-            )
-            session.add(msg)
-            session.flush()  # para tener msg.id
-            mensajes_guardados += 1
-
-            # ✅ por si un mismo archivo aparece repetido en el texto
-            stored_cache: dict[str, Any] = {}
-
-            for src in attachment_paths:
-                if src in stored_cache:
-                    stored = stored_cache[src]
-                else:
-                    try:
-                        stored = store_media_file(
-                            src_path=src, team_id=team_id, chat_id=chat.id)
-                    except FileNotFoundError:
-                        # si el zip no trae ese archivo, no tires toda la importación
-                        continue
-                    stored_cache[src] = stored
-
-                # ✅ ESTE add VA DENTRO DEL LOOP
-                session.add(
-                    Archivo(
-                        mensaje_id=msg.id,
-                        tipo=stored.tipo,
-                        filename=stored.filename,
-                        path=stored.path,
-                        mime_type=stored.mime_type,
-                        size=stored.size,
-                    )
+            if attachment_paths:
+                adjuntos[len(filas)] = attachment_paths
+            filas.append({
+                "chat_id": chat.id,
+                "contacto_id": contacto.id,
+                "tipo": _pick_message_tipo(texto, attachment_paths),
+                "texto": texto,
+                "autor_raw": autor,
+                "from_me": from_me,
+                "created_at": created_at,
+            })
+
+            # ✅ commit por bloque + checkpoint: si se corta, se reanuda desde acá
+            if len(filas) >= IMPORT_BATCH_SIZE:
+                archivos_guardados += _insertar_mensajes(
+                    session, filas, adjuntos, team_id=team_id, chat_id=chat.id, media=media)
+                mensajes_guardados += len(filas)
+                _actualizar_checkpoint(
+                    session,
+                    checkpoint_id,
+                    ultimo_indice=idx,
+                    mensajes_guardados=mensajes_guardados,
+                    archivos_guardados=archivos_guardados,
                 )
-                archivos_guardados += 1
+                session.commit()
+                filas, adjuntos = [], {}
 
-        # ✅ commit UNA sola vez al final
+        archivos_guardados += _insertar_mensajes(
+            session, filas, adjuntos, team_id=team_id, chat_id=chat.id, media=media)
+        mensajes_guardados += len(filas)
+        _actualizar_checkpoint(
+            session,
+            checkpoint_id,
+            ultimo_indice=len(mensajes) - 1,
+            mensajes_guardados=mensajes_guardados,
+            archivos_guardados=archivos_guardados,
+        )
         session.commit()
 
+        # duración / forma de onda / transcode de las notas de voz, en segundo plano
+        if archivos_guardados:
+            encolar_audios_de_chat(chat.id)
+
         # ✅ score y commit al final
         ESTADO_CLIENTE = 1  # ajustá según tu sistema
         if estado_contacto == ESTADO_CLIENTE:
             chat.pipeline_estado_id = None  # opcional
             session.add(chat)
+            _actualizar_checkpoint(session, checkpoint_id, estado="completo")
             session.commit()
             return {
                 "chat_id": chat.id,
@@ -343,12 +545,15 @@ def importar_chat_controller(file, team_id: int, user_id: int, session) -> dict[
                 "contacto_telefono": telefono_contacto,
                 "contacto_nombre": nombre_contacto,
                 "score_skipped": True,
+                "reanudado_desde": desde or None,
+                "media_mb_s": round(media.mb_s, 1),
             }
 
         # ✅ calcular score solo con texto del cliente
         mensajes_cliente = [{"mensaje": t} for t in texto_cliente_para_score]
         eventos = calcular_score_chat(mensajes_cliente)
         aplicar_score(chat, eventos, session)
+        _actualizar_checkpoint(session, checkpoint_id, estado="completo")
         session.commit()
 
         return {
@@ -360,11 +565,48 @@ def importar_chat_controller(file, team_id: int, user_id: int, session) -> dict[
             "contacto_estado": estado_contacto,
             "contacto_telefono": telefono_contacto,
             "contacto_nombre": nombre_contacto,
+            "reanudado_desde": desde or None,
+            "media_mb_s": round(media.mb_s, 1),
         }
 
+    except Exception as e:
+        # lo commiteado queda; el checkpoint marca el error para reanudar con el mismo ZIP
+        if checkpoint_id is not None:
+            session.rollback()
+            _actualizar_checkpoint(session, checkpoint_id, estado="error", error=repr(e)[:500])
+            session.commit()
+        raise
+
     finally:
         shutil.rmtree(workdir, ignore_errors=True)
 
+def importar_chats_lote_controller(files, team_id: int, user_id: int, session) -> dict[str, Any]:
+    """
+    Importa varios ZIP del mismo team compartiendo un ContactResolver: las
+    claves de contacto del team se cargan una vez para todo el lote.
+    Un ZIP inválido (o cualquier error al importarlo) no corta el lote:
+    queda en "errores" y los ya importados se devuelven igual.
+    """
+    resolver = ContactResolver(session, team_id)
+    importados: list[dict[str, Any]] = []
+    errores: list[dict[str, Any]] = []
+
+    for file in files:
+        try:
+            resultado = importar_chat_controller(
+                file, team_id, user_id, session, resolver=resolver)
+        except Exception as e:
+            session.rollback()
+            # lo que quedó en el mapa puede no existir más después del rollback
+            resolver.invalidate()
+            detail = e.detail if isinstance(e, HTTPException) else repr(e)
+            errores.append({"archivo": file.filename, "detail": detail})
+            continue
+        importados.append({"archivo": file.filename, **resultado})
+
+    return {"importados": importados, "errores": errores}
+
+
 def descargar_archivo_controller(*, archivo_id: int, team_id: int, session) -> Archivo:
     """
     Valida que el archivo pertenezca al team:
@@ -0,0 +1,157 @@
+# path: services/contact_resolver.py
+
+from __future__ import annotations
+
+from datetime import datetime
+
+from sqlmodel import select
+
+from models.contactos import Contacto
+from services.phone_normalization import canonical_phone, reversed_phone_key
+from services.upserts import LOCK_NS_CONTACTO_NOMBRE, insert_on_conflict, team_xact_lock
+
+
+class ContactResolver:
+    """
+    Resuelve (nombre, teléfono) -> Contacto de un team.
+
+    Con preload=True carga una sola vez las claves del team (telefono_key y
+    nombre -> id) y las mantiene al día con lo que inserta o completa, así un
+    lote de imports no consulta Contacto por cada chat. Sin preload hace una
+    consulta indexada por llamada (import suelto).
+
+    Entre imports concurrentes no se duplican contactos:
+    - con teléfono: INSERT ... ON CONFLICT sobre el índice único parcial
+      (team_id, telefono_key); si ya existía se actualiza en el mismo statement.
+    - solo por nombre: el alta se serializa por team con un advisory lock de
+      transacción (Postgres) y se revisa la DB antes de insertar. No hay
+      índice único por nombre porque el sync de Outlook renombra contactos.
+    """
+
+    def __init__(self, session, team_id: int, *, preload: bool = True):
+        self.session = session
+        self.team_id = team_id
+        self.preload = preload
+        self._by_key: dict[str, int] | None = None
+        self._by_nombre: dict[str, int] | None = None
+        self._stale_nombres: set[str] = set()
+
+    def invalidate(self) -> None:
+        """Descarta el mapa (ej: después de un rollback); se recarga en el próximo uso."""
+        self._by_key = None
+        self._by_nombre = None
+        self._stale_nombres.clear()
+
+    def _load(self) -> None:
+        self._by_key = {}
+        self._by_nombre = {}
+        rows = self.session.exec(
+            select(Contacto.id, Contacto.telefono_key, Contacto.nombre)
+            .where(Contacto.team_id == self.team_id)
+            .order_by(Contacto.id)
+        ).all()
+        for contacto_id, key, nombre in rows:
+            if key:
+                self._by_key.setdefault(key, contacto_id)
+            self._by_nombre.setdefault(nombre, contacto_id)
+
+    def _remember(self, contacto: Contacto) -> None:
+        if self._by_key is None:
+            return
+        if contacto.telefono_key:
+            self._by_key.setdefault(contacto.telefono_key, contacto.id)
+        self._by_nombre.setdefault(contacto.nombre, contacto.id)
+
+    def _query(self, telefono_key: str | None, nombre: str) -> Contacto | None:
+        stmt = select(Contacto).where(Contacto.team_id == self.team_id)
+        if telefono_key:
+            stmt = stmt.where(Contacto.telefono_key == telefono_key)
+        else:
+            stmt = stmt.where(Contacto.nombre == nombre)
+        return self.session.exec(stmt.order_by(Contacto.id)).first()
+
+    def find(self, *, nombre: str, telefono: str | None) -> Contacto | None:
+        telefono_key = canonical_phone(telefono)
+        if not self.preload:
+            return self._query(telefono_key, nombre)
+
+        if self._by_key is None:
+            self._load()
+        if telefono_key:
+            contacto_id = self._by_key.get(telefono_key)
+        elif nombre in self._stale_nombres:
+            return self._query(None, nombre)
+        else:
+            contacto_id = self._by_nombre.get(nombre)
+        if contacto_id is None:
+            return None
+        return self.session.get(Contacto, contacto_id)
+
+    def upsert(self, *, nombre: str, telefono: str | None, estado: int) -> Contacto:
+        existing = self.find(nombre=nombre, telefono=telefono)
+        if existing:
+            return self._update(existing, nombre=nombre, telefono=telefono, estado=estado)
+
+        telefono_key = canonical_phone(telefono)
+        if telefono_key:
+            # con key: upsert atómico contra ux_contacto_team_id_telefono_key
+            set_ = {"estado": estado}
+            if nombre:
+                set_["nombre"] = nombre
+            contacto_id = insert_on_conflict(
+                self.session,
+                Contacto.__table__,
+                self._values(nombre=nombre, telefono=telefono, estado=estado),
+                index_elements=["team_id", "telefono_key"],
+                index_where=Contacto.telefono_key.isnot(None),
+                set_=set_,
+            )
+            if contacto_id is None:
+                # motor sin ON CONFLICT: otro import lo creó en paralelo
+                existing = self._query(telefono_key, nombre)
+                return self._update(existing, nombre=nombre, telefono=telefono, estado=estado)
+
+            contacto = self.session.get(Contacto, contacto_id, populate_existing=True)
+            self._remember(contacto)
+            return contacto
+
+        # solo nombre: sin índice único (el sync de Outlook renombra), se serializa por team
+        team_xact_lock(self.session, LOCK_NS_CONTACTO_NOMBRE, self.team_id)
+        # el mapa puede no tener lo que otro import creó recién
+        existing = self._query(None, nombre)
+        if existing:
+            return self._update(existing, nombre=nombre, telefono=telefono, estado=estado)
+
+        contacto = Contacto(**self._values(nombre=nombre, telefono=telefono, estado=estado))
+        self.session.add(contacto)
+        self.session.flush()
+        self._remember(contacto)
+        return contacto
+
+    def _values(self, *, nombre: str, telefono: str | None, estado: int) -> dict:
+        return {
+            "team_id": self.team_id,
+            "estado": estado,
+            "nombre": nombre,
+            "telefono": telefono,
+            "telefono_key": canonical_phone(telefono),
+            "telefono_rev": reversed_phone_key(telefono),
+            "username": None,
+            "created_at": datetime.utcnow(),
+        }
+
+    def _update(self, existing: Contacto, *, nombre: str, telefono: str | None, estado: int) -> Contacto:
+        existing.estado = estado
+        if telefono and not existing.telefono:
+            existing.telefono = telefono
+            existing.telefono_key = canonical_phone(telefono)
+            existing.telefono_rev = reversed_phone_key(telefono)
+        if nombre and existing.nombre != nombre:
+            if self._by_nombre is not None and self._by_nombre.get(existing.nombre) == existing.id:
+                # el nombre viejo puede corresponder a otro contacto: se resuelve por DB
+                del self._by_nombre[existing.nombre]
+                self._stale_nombres.add(existing.nombre)
+            existing.nombre = nombre
+        self.session.add(existing)
+        self._remember(existing)
+        return existing
@@ -2,16 +2,71 @@
 
 from __future__ import annotations
 
+import csv
+import json
+import logging
+import os
 import re
+import sys
+import threading
+import time
 import unicodedata
-import math
-from typing import Any
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Iterator
 
 import pandas as pd
 from sqlmodel import select
 
 from models.contactos import Contacto
 from models.chat import Chat
+from services.bulk_update import bulk_update_by_id
+from services.phone_normalization import (
+    canonical_phone,
+    phone_digits,
+    phone_suffix_key,
+    reversed_phone_key,
+    same_phone,
+)
+
+logger = logging.getLogger(__name__)
+
+# 1 de cada N filas deja un evento de diagnóstico (debug=True => todas)
+SYNC_LOG_SAMPLE_EVERY = int(os.getenv("SYNC_LOG_SAMPLE_EVERY", "1000"))
+# eventos muestreados que se guardan en el perfil de la última corrida
+SYNC_PROFILE_MAX_SAMPLES = 50
+
+
+# -------------------------
+# Instrumentación
+# -------------------------
+
+_last_profiles: dict[int, dict[str, Any]] = {}
+_last_profiles_lock = threading.Lock()
+
+
+def _log_event(event: str, level: int = logging.DEBUG, **fields: Any) -> None:
+    # el json se arma solo si el nivel está habilitado
+    if logger.isEnabledFor(level):
+        logger.log(level, "%s %s", event, json.dumps(fields, ensure_ascii=False, default=str))
+
+
+@contextmanager
+def _span(spans: dict[str, float], name: str):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        spans[name] = spans.get(name, 0.0) + (time.perf_counter() - t0) * 1000
+
+
+def get_last_sync_profile(team_id: int) -> dict[str, Any] | None:
+    """Perfil (spans, contadores, eventos muestreados) del último sync del team."""
+    with _last_profiles_lock:
+        return _last_profiles.get(team_id)
 
 
 # -------------------------
@@ -47,225 +102,403 @@ def _name_key(name: str) -> str:
     return _norm_name(_clean_outlook_name(name or ""))
 
 
-def _norm_phone(s: Any) -> str:
-    if s is None:
-        return ""
-    if isinstance(s, float):
-        if math.isnan(s):
-            return ""
-        if s.is_integer():
-            s = int(s)
-    return re.sub(r"\D", "", str(s))
-
-
-def _same_phone(a: str | None, b: str | None) -> bool:
-    aa = _norm_phone(a or "")
-    bb = _norm_phone(b or "")
-    if not aa or not bb:
-        return False
-    return aa.endswith(bb) or bb.endswith(aa)
-
-
-def _phone_key(s: str | None) -> str:
-    """Key para mapear rápido: últimos 10 dígitos (o lo que haya)."""
-    d = _norm_phone(s or "")
-    if not d:
-        return ""
-    return d[-10:] if len(d) >= 10 else d
-
-
-def _iter_phones(*phones: Any) -> list[str]:
-    out: list[str] = []
-    for p in phones:
-        d = _norm_phone(p)
-        if len(d) >= 7:
-            out.append(str(p))
-    # dedupe por normalizado
-    seen = set()
-    uniq: list[str] = []
-    for p in out:
-        k = _norm_phone(p)
-        if k not in seen:
-            seen.add(k)
-            uniq.append(p)
-    return uniq
+def _has_phone(c: _ContactoRow) -> bool:
+    return bool(c.telefono) and c.telefono != "desconocido"
+
+
+# -------------------------
+# Normalizadores vectorizados (misma salida que los de arriba, por columna)
+# -------------------------
+
+@lru_cache(maxsize=1)
+def _combining_table() -> dict[int, None]:
+    """Tabla para str.translate que borra los caracteres combinantes (acentos tras NFKD)."""
+    return {cp: None for cp in range(sys.maxunicode + 1) if unicodedata.combining(chr(cp))}
+
+
+def _clean_outlook_name_series(s: pd.Series) -> pd.Series:
+    return (
+        s.str.strip()
+        .str.replace(r"^\d+\s*", "", regex=True)
+        .str.replace(r"\s+", " ", regex=True)
+        .str.strip()
+    )
+
+
+def _name_key_series(s: pd.Series) -> pd.Series:
+    s = _clean_outlook_name_series(s.fillna(""))
+    s = s.str.strip().str.lower().str.normalize("NFKD").str.translate(_combining_table())
+    s = s.str.replace(r"[^a-z0-9\s]", " ", regex=True)
+    return s.str.replace(r"\s+", " ", regex=True).str.strip()
+
+
+def _digits_series(s: pd.Series) -> pd.Series:
+    return s.fillna("").astype(str).str.replace(r"\D", "", regex=True)
+
+
+def _first_nonempty(df: pd.DataFrame, *cols: str) -> pd.Series:
+    """Equivalente por columna de tomar, por fila, la primera de `cols` que tenga valor."""
+    out = pd.Series("", index=df.index, dtype=object)
+    for c in reversed(cols):
+        if c in df.columns:
+            col = df[c].fillna("")
+            out = col.where(col != "", out)
+    return out
+
+
+def _suffix_match(a: str, b: str) -> bool:
+    return bool(a) and bool(b) and (a.endswith(b) or b.endswith(a))
 
 
 # -------------------------
 # CSV Reader robusto
 # -------------------------
 
-def _read_outlook_file(path: str) -> pd.DataFrame:
-    try:
-        df = pd.read_csv(
-            path,
-            sep=None,
-            engine="python",
-            dtype=str,
-            keep_default_na=False,
-        )
-    except UnicodeDecodeError:
-        df = pd.read_csv(
-            path,
-            sep=None,
-            engine="python",
-            dtype=str,
-            keep_default_na=False,
-            encoding="utf-16",
-        )
+NAME_COLS = ("First Name", "Nombre", "Full Name", "Display Name")
+PHONE1_COLS = ("Phone 1 - Value", "Teléfono 1 - Valor", "Telefono 1 - Valor")
+PHONE2_COLS = ("Phone 2 - Value", "Teléfono 2 - Valor", "Telefono 2 - Valor")
+
+# filas por bloque de lectura del CSV
+CSV_CHUNK_ROWS = 50_000
 
-    df.columns = [c.strip().lstrip("\ufeff") for c in df.columns]
-    return df
 
+def _sniff_delimiter(path: str, encoding: str) -> str:
+    """
+    Detecta el separador una sola vez sobre la primera línea
+    (lo mismo que hace pandas con sep=None, pero sin quedarse en el engine python).
+    """
+    with open(path, "r", encoding=encoding, newline="") as f:
+        first_line = f.readline()
+    return csv.Sniffer().sniff(first_line).delimiter
 
-def _get(row: dict, *cols: str) -> str:
-    for c in cols:
-        if c in row:
-            v = row.get(c)
-            if v not in (None, ""):
-                return str(v)
-    return ""
+
+def _detect_encoding(path: str) -> str:
+    with open(path, "rb") as f:
+        head = f.read(2)
+    return "utf-16" if head in (b"\xff\xfe", b"\xfe\xff") else "utf-8"
+
+
+def _iter_outlook_chunks(path: str, *, encoding: str, chunk_rows: int = CSV_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """
+    Lee el CSV en bloques de `chunk_rows` filas: memoria acotada aunque el
+    export pese varios GB. El índice de filas sigue corrido entre bloques.
+    """
+    sep = _sniff_delimiter(path, encoding)
+    reader = pd.read_csv(
+        path,
+        sep=sep,
+        engine="c",
+        dtype=str,
+        keep_default_na=False,
+        encoding=encoding,
+        chunksize=chunk_rows,
+    )
+    with reader:
+        for df in reader:
+            df.columns = [c.strip().lstrip("\ufeff") for c in df.columns]
+            yield df
 
 
 # -------------------------
-# Sync principal
+# Filas livianas
 # -------------------------
 
-def sync_contactos_from_outlook_csv(
-    *,
-    session,
-    team_id: int,
-    csv_path: str,
-    dry_run: bool = False,
-    debug: bool = True,
-) -> dict[str, Any]:
-    df = _read_outlook_file(csv_path)
-
-    if debug:
-        print("\n[OUTLOOK SYNC] df.columns =", list(df.columns))
-        print("[OUTLOOK SYNC] head(2):")
-        try:
-            print(df.head(2).to_string(index=False))
-        except Exception:
-            print(df.head(2))
-
-    contactos: list[Contacto] = session.exec(
-        select(Contacto).where(Contacto.team_id == team_id)
-    ).all()
-
-    chats: list[Chat] = session.exec(
-        select(Chat).where(Chat.team_id == team_id)
-    ).all()
-
-    # Index por phone_key
-    contactos_by_key: dict[str, list[Contacto]] = {}
-    for c in contactos:
-        for tel in [c.telefono, getattr(c, "telefono2", None)]:
-            k = _phone_key(tel)
-            if k:
-                contactos_by_key.setdefault(k, []).append(c)
-
-    chats_by_key: dict[str, list[Chat]] = {}
-    for ch in chats:
-        k = _phone_key(ch.numero)
-        if k:
-            chats_by_key.setdefault(k, []).append(ch)
-
-    # ✅ Index por nombre usando _name_key (FIX)
-    contactos_by_name: dict[str, list[Contacto]] = {}
-    for c in contactos:
-        nk = _name_key(c.nombre)
-        if nk:
-            contactos_by_name.setdefault(nk, []).append(c)
-
-    if debug:
-        # muestra 5 keys para verificar
-        sample = list(contactos_by_name.keys())[:5]
-        print("\n[OUTLOOK SYNC] sample name keys from DB:", sample)
-
-    stats = {
-        "rows": 0,
-        "contactos_actualizados": 0,
-        "chats_actualizados": 0,
-        "sin_match": 0,
-        "match_por_tel": 0,
-        "match_por_nombre": 0,
-        "rows_sin_telefonos": 0,
+@dataclass(slots=True)
+class _ContactoRow:
+    id: int
+    nombre: str
+    telefono: str | None
+    telefono2: str | None
+    telefono_key: str | None = None
+
+
+@dataclass(slots=True)
+class _ChatRow:
+    id: int
+    nombre: str
+    numero: str
+
+
+# -------------------------
+# Índices en memoria
+# -------------------------
+
+class _LiveIndex:
+    """
+    key -> posiciones de contacto/chat, en el mismo orden de inserción que los
+    dicts que armaba el sync fila a fila.
+
+    Arranca de un groupby (vectorizado) y solo materializa listas para las keys
+    que se modifican durante el sync. Las keys tocadas quedan en `dirty`: para
+    esas el match precalculado con merges ya no vale y se resuelve en vivo.
+    """
+
+    def __init__(self, keys: pd.Series, positions: pd.Series):
+        keys = keys.reset_index(drop=True)
+        positions = positions.to_numpy()
+        self._static = {
+            k: positions[idx]
+            for k, idx in keys.groupby(keys, sort=False).indices.items()
+            if k != ""
+        }
+        self._live: dict[str, list[int]] = {}
+        self.dirty: set[str] = set()
+
+    def get(self, key: str):
+        if key in self._live:
+            return self._live[key]
+        return self._static.get(key, ())
+
+    def append(self, key: str, pos: int) -> None:
+        if key not in self._live:
+            self._live[key] = [int(p) for p in self._static.get(key, ())]
+        self._live[key].append(pos)
+        self.dirty.add(key)
+
+    def keys(self) -> list[str]:
+        return list(self._static.keys())
+
+
+def _contact_phone_frame(contactos: list[_ContactoRow]) -> pd.DataFrame:
+    """Una fila por (contacto, slot de teléfono) con key, en orden contacto -> telefono -> telefono2."""
+    n = len(contactos)
+    tels = pd.Series(
+        [t for c in contactos for t in (c.telefono, c.telefono2)],
+        dtype=object,
+    )
+    digits = _digits_series(tels)
+    return pd.DataFrame({
+        "pos": [i for i in range(n) for _ in (0, 1)],
+        "key": digits.str[-10:],
+    })
+
+
+# -------------------------
+# Match vectorizado
+# -------------------------
+
+def _static_phone_matches(
+    csv_phones: pd.DataFrame,
+    contact_keys: pd.DataFrame,
+    contact_digits: tuple[list[str], list[str]],
+) -> dict[tuple[int, int], int]:
+    """
+    Para cada (fila, pidx) del CSV: primer contacto (en orden de índice) cuyo
+    telefono o telefono2 matchea por sufijo. Merge por key + filtro same_phone.
+    """
+    cand = csv_phones.merge(contact_keys[contact_keys["key"] != ""], on="key", how="inner")
+    if cand.empty:
+        return {}
+
+    # orden de candidatos = orden de inserción en contactos_by_key
+    cand = cand.sort_values(["row", "pidx", "cand_order"], kind="stable")
+    tel1, tel2 = contact_digits
+    ok = [
+        _suffix_match(tel1[p], d) or _suffix_match(tel2[p], d)
+        for p, d in zip(cand["pos"].to_numpy(), cand["digits"].to_numpy())
+    ]
+    first = cand[ok].drop_duplicates(["row", "pidx"], keep="first")
+    return {
+        (int(r), int(pidx)): int(pos)
+        for r, pidx, pos in zip(first["row"], first["pidx"], first["pos"])
     }
 
-    for i, row in df.iterrows():
-        stats["rows"] += 1
-        r = row.to_dict()
 
-        nombre_raw = _get(r, "First Name", "Nombre", "Full Name", "Display Name")
-        nombre_csv = _clean_outlook_name(nombre_raw)
+def _static_name_matches(contactos: list[_ContactoRow], contact_name_keys: pd.Series) -> pd.Series:
+    """nk -> contacto elegido: primero los que NO tienen teléfono (sort estable por _has_phone)."""
+    frame = pd.DataFrame({
+        "nk": contact_name_keys.to_numpy(),
+        "has_phone": [_has_phone(c) for c in contactos],
+        "pos": range(len(contactos)),
+    })
+    frame = frame[frame["nk"] != ""]
+    elegido = frame.sort_values(["has_phone", "pos"], kind="stable").drop_duplicates("nk", keep="first")
+    return pd.Series(elegido["pos"].to_numpy(), index=elegido["nk"].to_numpy())
 
-        if not nombre_csv:
-            continue
 
-        p1 = _get(r, "Phone 1 - Value", "Teléfono 1 - Valor", "Telefono 1 - Valor")
-        p2 = _get(r, "Phone 2 - Value", "Teléfono 2 - Valor", "Telefono 2 - Valor")
+# -------------------------
+# Sync principal
+# -------------------------
 
-        phones = _iter_phones(p1, p2)
-        if not phones:
-            stats["rows_sin_telefonos"] += 1
+class _OutlookSync:
+    """
+    Estado que se arrastra entre bloques del CSV: índices en memoria,
+    contadores y cambios pendientes de escribir.
+    """
 
-        if debug and i < 3:
-            print(f"\n[OUTLOOK SYNC] Row {i}")
-            print("  nombre_raw:", nombre_raw)
-            print("  nombre_csv:", nombre_csv)
-            print("  name_key:", _name_key(nombre_csv))
-            print("  p1:", p1, "| p2:", p2)
-            print("  phones(norm):", [_norm_phone(x) for x in phones])
+    def __init__(self, contactos: list[_ContactoRow], chats: list[_ChatRow], *, sample_every: int):
+        self.contactos = contactos
+        self.chats = chats
+        self.sample_every = max(1, sample_every)
+        self.samples: deque[dict[str, Any]] = deque(maxlen=SYNC_PROFILE_MAX_SAMPLES)
 
-        matched_contacto: Contacto | None = None
-        matched_by: str | None = None
+        # Index por phone_key (contactos: telefono y telefono2; chats: numero)
+        self.contact_keys = _contact_phone_frame(contactos)
+        self.contact_keys["cand_order"] = range(len(self.contact_keys))
+        self.contactos_by_key = _LiveIndex(self.contact_keys["key"], self.contact_keys["pos"])
 
-        # 1) match por teléfono
-        for p in phones:
-            k = _phone_key(p)
-            if not k:
-                continue
-            candidatos = contactos_by_key.get(k, [])
-            for c in candidatos:
-                if _same_phone(c.telefono, p) or _same_phone(getattr(c, "telefono2", None), p):
-                    matched_contacto = c
-                    matched_by = "tel"
-                    break
-            if matched_contacto:
-                break
-
-        # 2) match por nombre (FIX)
-        if not matched_contacto:
-            nk = _name_key(nombre_csv)
-            candidatos = contactos_by_name.get(nk, [])
-            if candidatos:
-                candidatos = sorted(
-                    candidatos,
-                    key=lambda c: (1 if (c.telefono and c.telefono != "desconocido") else 0),
+        chat_keys = _digits_series(pd.Series([ch.numero for ch in chats], dtype=object)).str[-10:]
+        self.chats_by_key = _LiveIndex(chat_keys, pd.Series(range(len(chats))))
+
+        self.contact_digits = (
+            _digits_series(pd.Series([c.telefono for c in contactos], dtype=object)).tolist(),
+            _digits_series(pd.Series([c.telefono2 for c in contactos], dtype=object)).tolist(),
+        )
+
+        # ✅ Index por nombre usando la misma key que el CSV
+        contact_name_keys = _name_key_series(pd.Series([c.nombre for c in contactos], dtype=object))
+        self.contactos_by_name = _LiveIndex(contact_name_keys, pd.Series(range(len(contactos))))
+        self.static_by_name = _static_name_matches(contactos, contact_name_keys)
+
+        _log_event(
+            "outlook_sync.index",
+            contactos=len(contactos),
+            chats=len(chats),
+            sample_name_keys=self.contactos_by_name.keys()[:5],
+        )
+
+        self.stats = {
+            "rows": 0,
+            "contactos_actualizados": 0,
+            "chats_actualizados": 0,
+            "sin_match": 0,
+            "match_por_tel": 0,
+            "match_por_nombre": 0,
+            "rows_sin_telefonos": 0,
+        }
+        self.contactos_cambiados: dict[int, _ContactoRow] = {}
+        # telefono_key es única por team (ux_contacto_team_id_telefono_key)
+        self.telefono_keys = {c.telefono_key for c in contactos if c.telefono_key}
+        self.chats_cambiados: dict[int, _ChatRow] = {}
+
+    def _sample(self, event: str, **fields: Any) -> None:
+        self.samples.append({"event": event, **fields})
+        _log_event(event, **fields)
+
+    # --- match en vivo (solo keys "dirty") ---
+
+    def _match_tel_en_vivo(self, raw: str, key: str) -> int:
+        for pos in self.contactos_by_key.get(key):
+            c = self.contactos[pos]
+            if same_phone(c.telefono, raw) or same_phone(c.telefono2, raw):
+                return int(pos)
+        return -1
+
+    def _match_nombre_en_vivo(self, nk: str) -> int:
+        candidatos = sorted(
+            self.contactos_by_name.get(nk),
+            key=lambda pos: (1 if _has_phone(self.contactos[pos]) else 0),
+        )
+        return int(candidatos[0]) if candidatos else -1
+
+    # --- un bloque del CSV ---
+
+    def process_chunk(self, df: pd.DataFrame) -> None:
+        stats = self.stats
+
+        # --- columnas del CSV -> keys, todo por columna ---
+        stats["rows"] += len(df)
+
+        p1 = _first_nonempty(df, *PHONE1_COLS)
+        p2 = _first_nonempty(df, *PHONE2_COLS)
+        nombre_csv = _clean_outlook_name_series(_first_nonempty(df, *NAME_COLS))
+
+        d1 = _digits_series(p1)
+        d2 = _digits_series(p2)
+        ok1 = d1.str.len() >= 7
+        ok2 = (d2.str.len() >= 7) & ~(ok1 & (d2 == d1))  # dedupe por normalizado
+
+        # phones[0] / phones[1] de la versión fila a fila
+        ph0 = p1.where(ok1, p2.where(ok2, ""))
+        ph1 = p2.where(ok1 & ok2, "")
+        dg0 = d1.where(ok1, d2.where(ok2, ""))
+        dg1 = d2.where(ok1 & ok2, "")
+
+        rows = pd.DataFrame({
+            "label": df.index,
+            "nombre": nombre_csv,
+            "nk": _name_key_series(nombre_csv),
+            "ph0": ph0, "ph1": ph1,
+            "dg0": dg0, "dg1": dg1,
+            "k0": dg0.str[-10:], "k1": dg1.str[-10:],
+        })
+        rows = rows[rows["nombre"] != ""].reset_index(drop=True)
+        stats["rows_sin_telefonos"] += int((rows["ph0"] == "").sum())
+
+        csv_phones = pd.concat([
+            pd.DataFrame({"row": rows.index, "pidx": pidx, "key": rows[f"k{pidx}"], "digits": rows[f"dg{pidx}"]})
+            for pidx in (0, 1)
+        ])
+        csv_phones = csv_phones[csv_phones["key"] != ""]
+
+        static_tel = _static_phone_matches(csv_phones, self.contact_keys, self.contact_digits)
+        m_nombre = rows["nk"].map(self.static_by_name).fillna(-1).astype("int64").to_numpy()
+
+        # --- resolución en orden de filas: solo las keys "dirty" se evalúan en vivo ---
+        for j, (label, nombre, nk, ph0_raw, ph1_raw, k0, k1) in enumerate(zip(
+            rows["label"], rows["nombre"], rows["nk"], rows["ph0"], rows["ph1"], rows["k0"], rows["k1"],
+        )):
+            phones = [
+                (raw, k, static_tel.get((j, pidx), -1))
+                for pidx, (raw, k) in enumerate(((ph0_raw, k0), (ph1_raw, k1)))
+                if raw
+            ]
+
+            sampled = label % self.sample_every == 0
+            if sampled:
+                self._sample(
+                    "outlook_sync.row",
+                    row=int(label),
+                    nombre_csv=nombre,
+                    name_key=nk,
+                    p1=p1.loc[label],
+                    p2=p2.loc[label],
+                    phones=[phone_digits(raw) for raw, _, _ in phones],
                 )
-                matched_contacto = candidatos[0]
-                matched_by = "nombre"
 
-        if not matched_contacto:
-            stats["sin_match"] += 1
-            if debug and i < 10:
-                print(f"[OUTLOOK SYNC] ❌ sin match: {nombre_csv} phones={phones}")
-            continue
+            matched_pos = -1
+            matched_by: str | None = None
 
-        if matched_by == "tel":
-            stats["match_por_tel"] += 1
-        else:
-            stats["match_por_nombre"] += 1
+            # 1) match por teléfono
+            for raw, k, static_pos in phones:
+                pos = self._match_tel_en_vivo(raw, k) if k in self.contactos_by_key.dirty else static_pos
+                if pos >= 0:
+                    matched_pos, matched_by = pos, "tel"
+                    break
+
+            # 2) match por nombre
+            if matched_pos < 0:
+                pos = self._match_nombre_en_vivo(nk) if nk in self.contactos_by_name.dirty else m_nombre[j]
+                if pos >= 0:
+                    matched_pos, matched_by = pos, "nombre"
+
+            if matched_pos < 0:
+                stats["sin_match"] += 1
+                if sampled:
+                    self._sample("outlook_sync.sin_match", row=int(label), nombre_csv=nombre)
+                continue
+
+            if matched_by == "tel":
+                stats["match_por_tel"] += 1
+            else:
+                stats["match_por_nombre"] += 1
+
+            if sampled:
+                self._sample("outlook_sync.match", row=int(label), by=matched_by, contacto_id=self.contactos[matched_pos].id)
 
-        c = matched_contacto
+            self._apply_match(matched_pos, [raw for raw, _, _ in phones], sampled=sampled)
+
+    def _apply_match(self, pos: int, phones: list[str], *, sampled: bool) -> None:
+        stats = self.stats
+        c = self.contactos[pos]
         changed = False
+        keys_antes = (phone_suffix_key(c.telefono), phone_suffix_key(c.telefono2), _name_key(c.nombre))
 
         # ✅ opcional: normalizar nombre en DB (sacar 001, etc)
         cleaned_db_name = _clean_outlook_name(c.nombre or "")
         if cleaned_db_name and c.nombre != cleaned_db_name:
-            if debug:
-                print(f"[OUTLOOK SYNC] ✅ clean DB nombre: '{c.nombre}' -> '{cleaned_db_name}'")
+            if sampled:
+                self._sample("outlook_sync.clean_nombre", contacto_id=c.id, antes=c.nombre, despues=cleaned_db_name)
             c.nombre = cleaned_db_name
             changed = True
 
@@ -273,53 +506,188 @@ def sync_contactos_from_outlook_csv(
         if phones:
             p_first = phones[0]
             if (not c.telefono) or c.telefono == "desconocido":
-                if debug:
-                    print(f"[OUTLOOK SYNC] ✅ set telefono: '{c.telefono}' -> '{p_first}'")
+                if sampled:
+                    self._sample("outlook_sync.set_telefono", contacto_id=c.id, antes=c.telefono, despues=p_first)
                 c.telefono = p_first
+                # si otro contacto ya tiene esa key, este queda con teléfono pero sin key
+                key = canonical_phone(p_first)
+                c.telefono_key = key if key not in self.telefono_keys else None
+                if c.telefono_key:
+                    self.telefono_keys.add(key)
                 changed = True
 
-            if hasattr(c, "telefono2") and len(phones) >= 2:
+            if len(phones) >= 2:
                 p_second = phones[1]
-                if not _same_phone(c.telefono, p_second) and (not getattr(c, "telefono2", None)):
-                    if debug:
-                        print(f"[OUTLOOK SYNC] ✅ set telefono2 -> '{p_second}'")
-                    setattr(c, "telefono2", p_second)
+                if not same_phone(c.telefono, p_second) and not c.telefono2:
+                    if sampled:
+                        self._sample("outlook_sync.set_telefono2", contacto_id=c.id, despues=p_second)
+                    c.telefono2 = p_second
                     changed = True
 
-        if changed:
-            stats["contactos_actualizados"] += 1
-            session.add(c)
-
-            # ✅ actualizar índices en memoria por si le agregamos teléfono
-            for tel in [c.telefono, getattr(c, "telefono2", None)]:
-                k = _phone_key(tel)
-                if k:
-                    contactos_by_key.setdefault(k, []).append(c)
-
-            # ✅ reindex por nombre también si limpiamos nombre
-            nk_db = _name_key(c.nombre)
-            if nk_db:
-                contactos_by_name.setdefault(nk_db, []).append(c)
-
-            # Propagar nombre a chats por teléfono
-            for tel in [c.telefono, getattr(c, "telefono2", None)]:
-                k = _phone_key(tel)
-                if not k:
-                    continue
-                for ch in chats_by_key.get(k, []):
-                    if _same_phone(ch.numero, tel) and ch.nombre != c.nombre:
-                        if debug:
-                            print(f"[OUTLOOK SYNC] ✅ chat rename: chat#{ch.id} '{ch.nombre}' -> '{c.nombre}'")
-                        ch.nombre = c.nombre
-                        stats["chats_actualizados"] += 1
-                        session.add(ch)
-
-    if not dry_run:
-        session.commit()
-    else:
+        if not changed:
+            return
+
+        stats["contactos_actualizados"] += 1
+        self.contactos_cambiados[c.id] = c
+
+        # ✅ el contacto cambió: sus keys viejas dejan de servir para el match precalculado
+        self.contactos_by_key.dirty.update(k for k in keys_antes[:2] if k)
+        if keys_antes[2]:
+            self.contactos_by_name.dirty.add(keys_antes[2])
+
+        # ✅ actualizar índices en memoria por si le agregamos teléfono
+        for tel in [c.telefono, c.telefono2]:
+            k = phone_suffix_key(tel)
+            if k:
+                self.contactos_by_key.append(k, pos)
+
+        # ✅ reindex por nombre también si limpiamos nombre
+        nk_db = _name_key(c.nombre)
+        if nk_db:
+            self.contactos_by_name.append(nk_db, pos)
+
+        # Propagar nombre a chats por teléfono
+        for tel in [c.telefono, c.telefono2]:
+            k = phone_suffix_key(tel)
+            if not k:
+                continue
+            for ch_pos in self.chats_by_key.get(k):
+                ch = self.chats[ch_pos]
+                if same_phone(ch.numero, tel) and ch.nombre != c.nombre:
+                    if sampled:
+                        self._sample("outlook_sync.chat_rename", chat_id=ch.id, antes=ch.nombre, despues=c.nombre)
+                    ch.nombre = c.nombre
+                    stats["chats_actualizados"] += 1
+                    self.chats_cambiados[ch.id] = ch
+
+    # --- write-back: un UPDATE por bloque con el estado final de cada fila ---
+
+    def write_back(self, session) -> list[dict[str, Any]]:
+        write_chunks = bulk_update_by_id(session, Contacto.__table__, [
+            {
+                "id": c.id,
+                "nombre": c.nombre,
+                "telefono": c.telefono,
+                "telefono2": c.telefono2,
+                "telefono_key": c.telefono_key,
+                "telefono_rev": reversed_phone_key(c.telefono),
+            }
+            for c in self.contactos_cambiados.values()
+        ])
+        write_chunks += bulk_update_by_id(session, Chat.__table__, [
+            {"id": ch.id, "nombre": ch.nombre}
+            for ch in self.chats_cambiados.values()
+        ])
+        return write_chunks
+
+
+def _sync_pass(
+    *,
+    session,
+    team_id: int,
+    csv_path: str,
+    encoding: str,
+    dry_run: bool,
+    sample_every: int,
+) -> tuple[dict[str, Any], dict[str, Any]]:
+    spans: dict[str, float] = {}
+    chunks = 0
+
+    with _span(spans, "index"):
+        # Solo las columnas que usa el sync: sin objetos ORM ni identity map
+        contactos = [
+            _ContactoRow(*r)
+            for r in session.exec(
+                select(Contacto.id, Contacto.nombre, Contacto.telefono, Contacto.telefono2, Contacto.telefono_key)
+                .where(Contacto.team_id == team_id)
+            ).all()
+        ]
+
+        chats = [
+            _ChatRow(*r)
+            for r in session.exec(
+                select(Chat.id, Chat.nombre, Chat.numero).where(Chat.team_id == team_id)
+            ).all()
+        ]
+
+        sync = _OutlookSync(contactos, chats, sample_every=sample_every)
+
+    reader = _iter_outlook_chunks(csv_path, encoding=encoding)
+    while True:
+        with _span(spans, "read"):
+            chunk = next(reader, None)
+        if chunk is None:
+            break
+        if chunks == 0:
+            _log_event("outlook_sync.columns", columns=list(chunk.columns))
+        chunks += 1
+        with _span(spans, "match"):
+            sync.process_chunk(chunk)
+
+    stats = sync.stats
+    with _span(spans, "write"):
+        if not dry_run:
+            stats["write_chunks"] = sync.write_back(session)
+            session.commit()
+        else:
+            stats["write_chunks"] = []
+            session.rollback()
+
+    profile = {
+        "encoding": encoding,
+        "csv_chunks": chunks,
+        "spans_ms": {k: round(v, 2) for k, v in spans.items()},
+        "samples": list(sync.samples),
+    }
+    return stats, profile
+
+
+def sync_contactos_from_outlook_csv(
+    *,
+    session,
+    team_id: int,
+    csv_path: str,
+    dry_run: bool = False,
+    debug: bool = False,
+) -> dict[str, Any]:
+    """
+    Lee el CSV en bloques de CSV_CHUNK_ROWS filas y va matcheando a medida que
+    lee; los cambios se escriben recién al final, así que si el archivo falla
+    a mitad de camino no queda nada a medio aplicar.
+
+    debug=True muestrea todas las filas (ver SYNC_LOG_SAMPLE_EVERY); el perfil
+    de la corrida queda disponible en get_last_sync_profile(team_id).
+    """
+    started_at = datetime.utcnow()
+    kwargs = dict(
+        session=session,
+        team_id=team_id,
+        csv_path=csv_path,
+        dry_run=dry_run,
+        sample_every=1 if debug else SYNC_LOG_SAMPLE_EVERY,
+    )
+    encoding = _detect_encoding(csv_path)
+    try:
+        stats, profile = _sync_pass(encoding=encoding, **kwargs)
+    except UnicodeDecodeError:
+        if encoding == "utf-16":
+            raise
+        # mismo fallback que antes: Outlook a veces exporta en UTF-16
         session.rollback()
+        stats, profile = _sync_pass(encoding="utf-16", **kwargs)
+
+    counters = {k: v for k, v in stats.items() if k != "write_chunks"}
+    profile = {
+        "team_id": team_id,
+        "started_at": started_at.isoformat(),
+        "dry_run": dry_run,
+        "counters": counters,
+        "write_chunks": stats["write_chunks"],
+        **profile,
+    }
+    with _last_profiles_lock:
+        _last_profiles[team_id] = profile
 
-    if debug:
-        print("\n[OUTLOOK SYNC] STATS:", stats)
+    _log_event("outlook_sync.done", logging.INFO, team_id=team_id, spans_ms=profile["spans_ms"], **counters)
 
     return stats
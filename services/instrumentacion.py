@@ -0,0 +1,236 @@
+# path: services/instrumentacion.py
+"""
+Latencia por ruta y consultas a la DB por request, en memoria del proceso y
+expuestas en formato Prometheus (GET /internal/metrics).
+
+- InstrumentacionMiddleware (ASGI puro, sin BaseHTTPMiddleware): mide cada
+  request hasta el último byte y lo suma al histograma de su ruta (el
+  template, "/chats/{chat_id}", no la URL: así las series no crecen con los ids).
+- instrumentar_engine: eventos de SQLAlchemy que cuentan sentencias y tiempo
+  de DB. Lo del request en curso va a un ContextVar (los endpoints sync corren
+  en el threadpool con una copia del contexto, que apunta al mismo objeto).
+- Consultas más lentas que SLOW_QUERY_MS: contador + las últimas
+  SLOW_QUERY_MUESTRAS (SQL sin parámetros) en GET /internal/slow-queries.
+
+Todo se actualiza bajo un único lock con sumas y un bisect: el costo por
+request es de microsegundos.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+from sqlalchemy import event
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+SLOW_QUERY_MUESTRAS = int(os.getenv("SLOW_QUERY_MUESTRAS", "50"))
+# largo máximo del SQL guardado en cada muestra
+SLOW_QUERY_SQL_MAX = 2000
+
+# límites (segundos) de los buckets de latencia, como los default de Prometheus
+BUCKETS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# sentencias por request: 20+ en un endpoint de listado suele ser un N+1
+BUCKETS_CONSULTAS = (0, 1, 2, 5, 10, 20, 50, 100, 500)
+
+# requests que no matchean ninguna ruta (404): una sola serie
+RUTA_DESCONOCIDA = "<sin ruta>"
+
+
+class Histograma:
+    """Buckets acumulativos al estilo Prometheus + suma y cantidad."""
+    __slots__ = ("limites", "cuentas", "suma", "cantidad")
+
+    def __init__(self, limites: tuple[float, ...]):
+        self.limites = limites
+        self.cuentas = [0] * (len(limites) + 1)  # el último es +Inf
+        self.suma = 0.0
+        self.cantidad = 0
+
+    def observar(self, valor: float) -> None:
+        self.cuentas[bisect_left(self.limites, valor)] += 1
+        self.suma += valor
+        self.cantidad += 1
+
+
+def _ruta(scope) -> str:
+    # el router de FastAPI deja la ruta que matcheó en el mismo scope
+    return getattr(scope.get("route"), "path", None) or RUTA_DESCONOCIDA
+
+
+class _Request:
+    """Lo que acumulan los eventos de SQLAlchemy durante un request."""
+    __slots__ = ("scope", "consultas", "db_segundos")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.consultas = 0
+        self.db_segundos = 0.0
+
+
+_request_actual: ContextVar[_Request | None] = ContextVar("request_instrumentado", default=None)
+
+_lock = threading.Lock()
+# (método, ruta, status) -> histograma de latencia
+_latencias: dict[tuple[str, str, str], Histograma] = {}
+# (método, ruta) -> [histograma de sentencias, segundos de DB]
+_db_por_ruta: dict[tuple[str, str], list] = {}
+_db_totales = {"consultas": 0, "segundos": 0.0, "lentas": 0}
+_lentas: deque[dict] = deque(maxlen=SLOW_QUERY_MUESTRAS)
+
+
+def _registrar_request(metodo: str, ruta: str, status: int, segundos: float, req: _Request) -> None:
+    with _lock:
+        clave = (metodo, ruta, str(status))
+        hist = _latencias.get(clave)
+        if hist is None:
+            hist = _latencias[clave] = Histograma(BUCKETS_LATENCIA)
+        hist.observar(segundos)
+
+        db = _db_por_ruta.get(clave[:2])
+        if db is None:
+            db = _db_por_ruta[clave[:2]] = [Histograma(BUCKETS_CONSULTAS), 0.0]
+        db[0].observar(req.consultas)
+        db[1] += req.db_segundos
+
+
+class InstrumentacionMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        req = _Request(scope)
+        token = _request_actual.set(req)
+        status = 500
+        t0 = time.perf_counter()
+
+        async def send_con_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_con_status)
+        finally:
+            segundos = time.perf_counter() - t0
+            _request_actual.reset(token)
+            _registrar_request(scope["method"], _ruta(scope), status, segundos, req)
+
+
+# -------------------------
+# SQLAlchemy
+# -------------------------
+
+def _antes(conn, cursor, statement, parameters, context, executemany):
+    # t0 va en el contexto de ejecución, no en una pila en conn.info: si la
+    # sentencia falla after_cursor_execute no corre, y una entrada que quedara
+    # en la pila de la conexión corrompería las duraciones siguientes
+    if context is not None:
+        context._instrumentacion_t0 = time.perf_counter()
+
+
+def _despues(conn, cursor, statement, parameters, context, executemany):
+    t0 = getattr(context, "_instrumentacion_t0", None)
+    if t0 is None:
+        return
+    segundos = time.perf_counter() - t0
+
+    req = _request_actual.get()
+    if req is not None:
+        req.consultas += 1
+        req.db_segundos += segundos
+
+    lenta = segundos * 1000 >= SLOW_QUERY_MS
+    ruta = _ruta(req.scope) if lenta and req is not None else None
+    with _lock:
+        _db_totales["consultas"] += 1
+        _db_totales["segundos"] += segundos
+        if lenta:
+            _db_totales["lentas"] += 1
+            _lentas.append({
+                "ms": round(segundos * 1000, 1),
+                "sql": statement[:SLOW_QUERY_SQL_MAX],
+                "executemany": executemany,
+                "ruta": ruta,
+                "cuando": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            })
+
+
+def instrumentar_engine(engine) -> None:
+    if not event.contains(engine, "before_cursor_execute", _antes):
+        event.listen(engine, "before_cursor_execute", _antes)
+        event.listen(engine, "after_cursor_execute", _despues)
+
+
+def consultas_lentas() -> list[dict]:
+    """Las últimas consultas lentas, la más reciente primero."""
+    with _lock:
+        return list(reversed(_lentas))
+
+
+# -------------------------
+# Exposición (text format 0.0.4)
+# -------------------------
+
+def _etiquetas(**valores: str) -> str:
+    partes = []
+    for k, v in valores.items():
+        v = str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        partes.append(f'{k}="{v}"')
+    return "{" + ",".join(partes) + "}"
+
+
+def _histograma(lineas: list[str], nombre: str, etiquetas: dict, hist: Histograma) -> None:
+    acumulado = 0
+    for limite, cuenta in zip((*hist.limites, "+Inf"), hist.cuentas):
+        acumulado += cuenta
+        lineas.append(f"{nombre}_bucket{_etiquetas(**etiquetas, le=limite)} {acumulado}")
+    lineas.append(f"{nombre}_sum{_etiquetas(**etiquetas)} {hist.suma}")
+    lineas.append(f"{nombre}_count{_etiquetas(**etiquetas)} {hist.cantidad}")
+
+
+def render_prometheus() -> str:
+    lineas = [
+        "# HELP http_request_duration_seconds Latencia de cada request hasta el último byte.",
+        "# TYPE http_request_duration_seconds histogram",
+    ]
+    with _lock:
+        for (metodo, ruta, status), hist in sorted(_latencias.items()):
+            _histograma(lineas, "http_request_duration_seconds",
+                        {"method": metodo, "route": ruta, "status": status}, hist)
+
+        lineas += [
+            "# HELP http_request_db_queries Sentencias SQL por request.",
+            "# TYPE http_request_db_queries histogram",
+        ]
+        for (metodo, ruta), (hist, _) in sorted(_db_por_ruta.items()):
+            _histograma(lineas, "http_request_db_queries", {"method": metodo, "route": ruta}, hist)
+
+        lineas += [
+            "# HELP http_request_db_seconds_total Tiempo en la DB de los requests de cada ruta.",
+            "# TYPE http_request_db_seconds_total counter",
+        ]
+        for (metodo, ruta), (_, segundos) in sorted(_db_por_ruta.items()):
+            lineas.append(f"http_request_db_seconds_total{_etiquetas(method=metodo, route=ruta)} {segundos}")
+
+        lineas += [
+            "# HELP db_queries_total Sentencias SQL ejecutadas (también fuera de requests).",
+            "# TYPE db_queries_total counter",
+            f"db_queries_total {_db_totales['consultas']}",
+            "# HELP db_query_seconds_total Tiempo total en la DB.",
+            "# TYPE db_query_seconds_total counter",
+            f"db_query_seconds_total {_db_totales['segundos']}",
+            f"# HELP db_slow_queries_total Sentencias de {SLOW_QUERY_MS:g} ms o más.",
+            "# TYPE db_slow_queries_total counter",
+            f"db_slow_queries_total {_db_totales['lentas']}",
+        ]
+    return "\n".join(lineas) + "\n"
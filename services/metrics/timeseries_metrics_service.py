@@ -1,6 +1,6 @@
 # services/metrics/timeseries_metrics_service.py
 
-from datetime import date, datetime, timedelta
+from datetime import date, datetime, time, timedelta
 from sqlalchemy import case, cast, Date
 from sqlmodel import select, func
 from models.chat import Chat
@@ -64,8 +64,9 @@ def get_timeseries(team_id: int, session, days: int = 7):
         .join(Contacto, Contacto.id == chat_contacto_sq.c.contacto_id)
         .outerjoin(PipelineEstado, PipelineEstado.id == Chat.pipeline_estado_id)  # clientes suelen tener null
         .where(Chat.team_id == team_id)
-        .where(day_col >= start)
-        .where(day_col <= end)
+        # rango sobre la columna (no sobre el cast): usa ix_chat_team_id_creado_en
+        .where(Chat.creado_en >= datetime.combine(start, time.min))
+        .where(Chat.creado_en < datetime.combine(end + timedelta(days=1), time.min))
         .group_by(day_col)
         .order_by(day_col)
     ).all()
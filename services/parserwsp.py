@@ -4,6 +4,8 @@ from __future__ import annotations
 import os
 import re
 
+from services.phone_normalization import compact_phone
+
 WHATSAPP_PREFIX = "Chat de WhatsApp con "
 
 # Solo símbolos típicos de teléfono (sin letras)
@@ -18,13 +20,6 @@ def _strip_extension_and_prefix(filename: str) -> str:
     return base_no_ext
 
 
-def _normalize_phone(text: str) -> str:
-    text = text.strip()
-    keep_plus = text.startswith("+")
-    digits = "".join(ch for ch in text if ch.isdigit())
-    return f"+{digits}" if keep_plus else digits
-
-
 def classify_whatsapp_filename(filename: str) -> tuple[str, str | None, int]:
     """
     Returns (nombre, telefono, estado)
@@ -44,7 +39,7 @@ def classify_whatsapp_filename(filename: str) -> tuple[str, str | None, int]:
 
     # Si no hay letras, y es formato teléfono => no agendado
     if _PHONE_ONLY_RE.match(nombre):
-        normalized = _normalize_phone(nombre)
+        normalized = compact_phone(nombre)
         if len(normalized.lstrip("+")) >= 7:
             return nombre, normalized, 0
 
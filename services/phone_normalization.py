@@ -0,0 +1,115 @@
+# path: services/phone_normalization.py
+"""
+Normalización de teléfonos compartida por el import de chats, el sync de
+Outlook y las búsquedas.
+
+- phone_digits: solo dígitos (base de todo lo demás)
+- canonical_phone: clave estilo E.164 para igualdad / unicidad
+- reversed_phone_key: dígitos al revés. "a termina en b" equivale a
+  "rev(a) empieza con rev(b)", así el match por sufijo pasa a ser una
+  consulta por prefijo sobre una columna indexada.
+"""
+from __future__ import annotations
+
+import math
+import os
+import re
+from typing import Any
+
+from sqlalchemy import or_
+
+DEFAULT_COUNTRY_CODE = os.getenv("PHONE_DEFAULT_COUNTRY_CODE", "54")
+
+# largo de número nacional (AR: área + abonado = 10 dígitos)
+NATIONAL_NUMBER_DIGITS = 10
+
+# sufijo mínimo para considerar que dos teléfonos son el mismo en búsquedas por DB
+MIN_SUFFIX_DIGITS = 7
+
+_NON_DIGIT_RE = re.compile(r"\D")
+
+
+def phone_digits(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        # pandas a veces entrega teléfonos como float (o NaN)
+        if math.isnan(value):
+            return ""
+        if value.is_integer():
+            value = int(value)
+    return _NON_DIGIT_RE.sub("", str(value))
+
+
+def compact_phone(text: str) -> str:
+    """"+54 9 261 276-7072" -> "+5492612767072" (conserva el + si venía)."""
+    text = text.strip()
+    digits = phone_digits(text)
+    return f"+{digits}" if text.startswith("+") else digits
+
+
+def canonical_phone(value: Any) -> str | None:
+    """
+    Clave canónica estilo E.164 (+<código país><número>).
+
+    Sin "+" se asume DEFAULT_COUNTRY_CODE para números nacionales (con o sin 0
+    de larga distancia). En AR se saca el 9 de celulares internacionales para
+    que "+54 9 261 ..." y "261 ..." den la misma clave. Si no se puede inferir
+    el país devuelve los dígitos tal cual (sin "+").
+    """
+    raw = str(value).strip() if value is not None else ""
+    digits = phone_digits(value)
+    if not digits:
+        return None
+
+    cc = DEFAULT_COUNTRY_CODE
+    if raw.startswith("+"):
+        intl = digits
+    elif digits.startswith("00"):
+        intl = digits[2:]
+    elif digits.startswith(cc) and len(digits) > NATIONAL_NUMBER_DIGITS:
+        intl = digits
+    elif digits.startswith("0"):
+        intl = cc + digits[1:]
+    elif len(digits) == NATIONAL_NUMBER_DIGITS:
+        intl = cc + digits
+    else:
+        return digits
+
+    if cc == "54" and intl.startswith("549") and len(intl) == 13:
+        intl = "54" + intl[3:]
+    return f"+{intl}"
+
+
+def reversed_phone_key(value: Any) -> str | None:
+    digits = phone_digits(value)
+    return digits[::-1] or None
+
+
+def phone_suffix_key(value: Any) -> str:
+    """Key para agrupar en memoria: últimos 10 dígitos (o lo que haya)."""
+    return phone_digits(value)[-NATIONAL_NUMBER_DIGITS:]
+
+
+def same_phone(a: Any, b: Any) -> bool:
+    """Mismo teléfono si uno es sufijo del otro (ej: +549261... vs 261...)."""
+    aa = phone_digits(a)
+    bb = phone_digits(b)
+    if not aa or not bb:
+        return False
+    return aa.endswith(bb) or bb.endswith(aa)
+
+
+def phone_suffix_clause(rev_column, value: Any):
+    """
+    Filtro SQL equivalente a same_phone(columna, value) sobre la columna de
+    dígitos invertidos, con sufijos de al menos MIN_SUFFIX_DIGITS:
+    - la columna termina en value  -> rev_column LIKE 'rev%'
+    - value termina en la columna  -> rev_column IN (prefijos de rev)
+    Ambas ramas usan el índice (varchar_pattern_ops en Postgres).
+    """
+    rev = reversed_phone_key(value) or ""
+    if len(rev) < MIN_SUFFIX_DIGITS:
+        return None
+    prefixes = [rev[:n] for n in range(MIN_SUFFIX_DIGITS, len(rev))]
+    return or_(rev_column.startswith(rev), rev_column.in_(prefixes))
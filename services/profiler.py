@@ -0,0 +1,256 @@
+# path: services/profiler.py
+"""
+Profiler por muestreo de requests, opt-in.
+
+Se activa para un request:
+- con el header "X-Profile: 1" de un admin (rol en el JWT; PROFILE_HEADER=0 lo apaga)
+- o al azar, con probabilidad PROFILE_SAMPLE_RATE (default 0)
+
+Mientras dura el request, un thread mira cada PROFILE_INTERVAL_MS el stack
+del thread que corre el endpoint y cuenta cada stack. Los endpoints son sync
+y FastAPI los corre en el threadpool: instrumentar_endpoints los envuelve para
+que, si el request se está perfilando (ContextVar que pone el middleware y el
+threadpool hereda), anoten su thread al empezar. Así un request concurrente a
+la misma ruta no se mezcla en el perfil. Al terminar se guarda en
+PROFILE_DIR en formato "folded" (una línea "f1;f2;f3 N" por stack), que
+abren flamegraph.pl, inferno o speedscope, más un .json con los datos del
+request. La respuesta trae X-Profile-Id; se bajan con GET /internal/profiles.
+
+Apagado cuesta un recorrido de los headers por request. Hay un solo perfil a
+la vez por proceso: si llega otro pedido mientras tanto, no se perfila.
+"""
+from __future__ import annotations
+
+import functools
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from pathlib import Path
+
+import anyio
+from starlette.requests import Request
+
+logger = logging.getLogger(__name__)
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_HEADER = os.getenv("PROFILE_HEADER", "1") == "1"
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+# perfiles que se conservan en disco (los más viejos se borran); mínimo 1,
+# el que se acaba de guardar (su id ya salió en la respuesta)
+PROFILE_MAX = max(1, int(os.getenv("PROFILE_MAX", "100")))
+
+HEADER_PEDIDO = b"x-profile"
+HEADER_ID = b"x-profile-id"
+ROL_ADMIN = 1
+
+_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+_RAIZ = str(Path(__file__).resolve().parents[1]) + os.sep
+
+# un perfil a la vez: acota el costo y evita mezclar muestras de dos requests
+_en_curso = threading.Lock()
+
+
+def _nombre_frame(code) -> str:
+    archivo = code.co_filename
+    if archivo.startswith(_RAIZ):
+        archivo = archivo[len(_RAIZ):]
+    return f"{code.co_name} ({archivo}:{code.co_firstlineno})"
+
+
+class _Muestreador(threading.Thread):
+    def __init__(self, intervalo: float):
+        super().__init__(name="profiler", daemon=True)
+        self.intervalo = intervalo
+        # thread del threadpool que corre el endpoint (lo anota _anotar_hilo)
+        self.hilo: int | None = None
+        self.stacks: Counter[tuple] = Counter()
+        self.muestras = 0
+        self._parar = threading.Event()
+
+    def run(self) -> None:
+        while not self._parar.wait(self.intervalo):
+            hilo = self.hilo
+            frame = sys._current_frames().get(hilo) if hilo is not None else None
+            pila = []
+            while frame is not None:
+                if frame.f_code is _CODIGO_ENVOLTORIO:
+                    break
+                pila.append(frame.f_code)
+                frame = frame.f_back
+            else:
+                continue  # el endpoint todavía no arrancó o ya terminó
+            self.stacks[tuple(reversed(pila))] += 1
+            self.muestras += 1
+
+    def parar(self) -> None:
+        self._parar.set()
+        self.join()
+
+    def folded(self) -> str:
+        return "".join(
+            ";".join(_nombre_frame(c) for c in pila) + f" {n}\n"
+            for pila, n in self.stacks.most_common()
+        )
+
+
+_muestreador_actual: ContextVar[_Muestreador | None] = ContextVar("muestreador", default=None)
+
+
+def _anotar_hilo(endpoint):
+    @functools.wraps(endpoint)
+    def envoltorio(*args, **kwargs):
+        muestreador = _muestreador_actual.get()
+        if muestreador is None:
+            return endpoint(*args, **kwargs)
+        muestreador.hilo = threading.get_ident()
+        try:
+            return endpoint(*args, **kwargs)
+        finally:
+            muestreador.hilo = None
+    envoltorio.perfilable = True
+    return envoltorio
+
+
+_CODIGO_ENVOLTORIO = _anotar_hilo(lambda: None).__code__
+
+
+def instrumentar_endpoints(app) -> None:
+    """
+    Envuelve los endpoints sync ya registrados (se llama en el startup, con
+    todas las rutas cargadas). FastAPI decide sync/async al crear la ruta, así que
+    cambiar dependant.call después no cambia cómo se ejecuta.
+    """
+    for route in app.routes:
+        dependant = getattr(route, "dependant", None)
+        if dependant is None or dependant.call is None or getattr(dependant.call, "perfilable", False):
+            continue
+        if not dependant.is_coroutine_callable:
+            dependant.call = _anotar_hilo(dependant.call)
+
+
+def _header(scope, nombre: bytes) -> bytes | None:
+    for k, v in scope.get("headers", ()):
+        if k == nombre:
+            return v
+    return None
+
+
+def _pedido_por_admin(scope) -> dict | None:
+    if not PROFILE_HEADER or _header(scope, HEADER_PEDIDO) != b"1":
+        return None
+    from dependencies.auth import payload_del_token
+
+    payload = payload_del_token(Request(scope))
+    if not payload or payload.get("rol_id") != ROL_ADMIN:
+        return None
+    return payload
+
+
+def _guardar(perfil_id: str, muestreador: _Muestreador, meta: dict) -> None:
+    carpeta = Path(PROFILE_DIR)
+    carpeta.mkdir(parents=True, exist_ok=True)
+    (carpeta / f"{perfil_id}.folded").write_text(muestreador.folded(), encoding="utf-8")
+    # el .json va último: listar_perfiles solo ve perfiles completos
+    (carpeta / f"{perfil_id}.json").write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+
+    viejos = sorted(carpeta.glob("*.json"), key=lambda p: p.stat().st_mtime)[:-PROFILE_MAX]
+    for meta_path in viejos:
+        meta_path.unlink(missing_ok=True)
+        meta_path.with_suffix(".folded").unlink(missing_ok=True)
+
+
+class ProfilerMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        payload = _pedido_por_admin(scope)
+        if payload is None and not (PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE):
+            await self.app(scope, receive, send)
+            return
+        if not _en_curso.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        perfil_id = uuid.uuid4().hex
+        status = 500
+
+        async def send_con_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message = {**message, "headers": [*message.get("headers", []), (HEADER_ID, perfil_id.encode())]}
+            await send(message)
+
+        muestreador = _Muestreador(PROFILE_INTERVAL_MS / 1000)
+        token = _muestreador_actual.set(muestreador)
+        t0 = time.perf_counter()
+        muestreador.start()
+        try:
+            await self.app(scope, receive, send_con_id)
+        finally:
+            duracion_ms = round((time.perf_counter() - t0) * 1000, 1)
+            _muestreador_actual.reset(token)
+            # join del thread y disco: fuera del event loop
+            await anyio.to_thread.run_sync(muestreador.parar)
+            _en_curso.release()
+            meta = {
+                "id": perfil_id,
+                "fecha": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "metodo": scope["method"],
+                "ruta": getattr(scope.get("route"), "path", None),
+                "path": scope["path"],
+                "status": status,
+                "duracion_ms": duracion_ms,
+                "muestras": muestreador.muestras,
+                "intervalo_ms": PROFILE_INTERVAL_MS,
+                "motivo": "header" if payload else "muestreo",
+                "user_id": payload.get("sub") if payload else None,
+            }
+            try:
+                await anyio.to_thread.run_sync(_guardar, perfil_id, muestreador, meta)
+            except OSError:
+                # la respuesta ya salió: perder el perfil no tiene que romper el request
+                logger.warning("profiler: no se pudo guardar %s", perfil_id, exc_info=True)
+
+
+# -------------------------
+# Lectura (endpoints de admin)
+# -------------------------
+
+def listar_perfiles(limite: int = 50) -> list[dict]:
+    carpeta = Path(PROFILE_DIR)
+    if not carpeta.is_dir():
+        return []
+    metas = sorted(carpeta.glob("*.json"), key=lambda p: p.stat().st_mtime, reverse=True)[:limite]
+    perfiles = []
+    for meta_path in metas:
+        try:
+            perfiles.append(json.loads(meta_path.read_text(encoding="utf-8")))
+        except (FileNotFoundError, json.JSONDecodeError):
+            continue  # se borró o se está escribiendo
+    return perfiles
+
+
+def leer_perfil(perfil_id: str) -> str | None:
+    """El perfil en formato folded; None si no existe (o el id no es válido)."""
+    if not _ID_RE.match(perfil_id):
+        return None
+    try:
+        return (Path(PROFILE_DIR) / f"{perfil_id}.folded").read_text(encoding="utf-8")
+    except FileNotFoundError:
+        return None
@@ -0,0 +1,385 @@
+# path: services/storage_service/__init__.py
+"""
+Guardado de adjuntos. Dónde quedan lo decide el backend (STORAGE_BACKEND):
+
+- local (default): MEDIA_ROOT es el storage; Archivo.path es la ruta.
+- s3: los archivos van a un bucket S3/MinIO y Archivo.path es la URI
+  s3://...; MEDIA_ROOT pasa a ser un cache LRU por nodo acotado por
+  MEDIA_CACHE_MAX_BYTES, así los nodos de la API no comparten disco.
+
+Todo lo que lee un adjunto (descarga, miniaturas, audio) pasa por
+ruta_local(), que lo baja al cache si hace falta.
+"""
+from __future__ import annotations
+
+import errno
+import mimetypes
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+import unicodedata
+
+from services.storage_service.backends import LocalBackend, S3Backend, StorageBackend
+from services.storage_service.cache import CacheLocal
+
+MEDIA_ROOT = os.getenv("MEDIA_ROOT", "media")
+
+# copias de adjuntos en paralelo por import (I/O: threads, no procesos)
+MEDIA_COPY_WORKERS = int(os.getenv("MEDIA_COPY_WORKERS", "8"))
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local")
+S3_BUCKET = os.getenv("S3_BUCKET", "")
+S3_PREFIX = os.getenv("S3_PREFIX", "media")
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL") or None
+MEDIA_CACHE_MAX_BYTES = int(os.getenv("MEDIA_CACHE_MAX_BYTES", str(10 * 1024 ** 3)))
+
+# Regex para detectar nombres de archivos adjuntos mencionados en el texto del chat.
+# Soporta espacios, puntos, guiones, paréntesis y extensiones comunes,
+# ya que WhatsApp exporta adjuntos con nombres "humanos" (ej: "CamScanner 18-11-2025 11.50.pdf").
+_ATTACHMENT_TOKEN_RE = re.compile(
+    r"(?P<name>[\w\s\-\(\)\.]+?\.(?:jpg|jpeg|png|gif|webp|mp4|mov|mkv|mp3|wav|m4a|opus|ogg|pdf|doc|docx|xls|xlsx|ppt|pptx|txt|zip|rar))",
+    re.IGNORECASE,
+)
+
+
+@dataclass(frozen=True)
+class StoredFile:
+    filename: str
+    path: str
+    mime_type: str | None
+    size: int
+    tipo: str
+
+
+def _norm(s: str) -> str:
+    """
+    Normaliza texto y nombres de archivo para comparaciones confiables.
+    Elimina caracteres invisibles de WhatsApp (LRM, BOM) y unifica Unicode.
+    """
+    return (
+        unicodedata.normalize("NFKC", s or "")
+        .replace("\u200e", "")   # LRM WhatsApp
+        .replace("\ufeff", "")   # BOM
+        .strip()
+    )
+
+
+def _safe_mkdir(path: Path) -> None:
+    path.mkdir(parents=True, exist_ok=True)
+
+
+def _guess_tipo_from_mime(mime_type: str | None) -> str:
+    if not mime_type:
+        return "file"
+    major = mime_type.split("/", 1)[0].lower()
+    if major in {"image", "audio", "video"}:
+        return major
+    return "file"
+
+
+# -------------------------
+# Backend + cache
+# -------------------------
+
+_backend: StorageBackend | None = None
+_cache: CacheLocal | None = None
+_backend_lock = threading.Lock()
+
+
+def get_backend() -> StorageBackend:
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            if STORAGE_BACKEND == "s3":
+                if not S3_BUCKET:
+                    raise RuntimeError("STORAGE_BACKEND=s3 necesita S3_BUCKET")
+                _backend = S3Backend(S3_BUCKET, prefijo=S3_PREFIX, endpoint_url=S3_ENDPOINT_URL)
+            else:
+                _backend = LocalBackend(MEDIA_ROOT)
+        return _backend
+
+
+def set_backend(backend: StorageBackend | None) -> None:
+    """Cambia el backend (None = volver a leerlo del entorno). Para scripts y pruebas."""
+    global _backend, _cache
+    with _backend_lock:
+        _backend = backend
+        _cache = None
+
+
+def _get_cache() -> CacheLocal:
+    global _cache
+    with _backend_lock:
+        if _cache is None:
+            _cache = CacheLocal(MEDIA_ROOT, MEDIA_CACHE_MAX_BYTES)
+        return _cache
+
+
+def _clave_local(ruta: str | Path) -> str:
+    return Path(ruta).relative_to(MEDIA_ROOT).as_posix()
+
+
+def ruta_local(path: str) -> str:
+    """
+    Ruta en disco de un adjunto (Archivo.path / transcode_path). Con backend
+    remoto lo baja al cache si no está; las rutas locales (filas de antes de
+    pasar a S3) se devuelven tal cual. FileNotFoundError si no existe.
+    """
+    backend = get_backend()
+    clave = backend.clave(path) if backend.remoto else None
+    if clave is None:
+        return path
+
+    destino = Path(MEDIA_ROOT) / clave
+    if destino.is_file():
+        _get_cache().usar(str(destino))
+        return str(destino)
+
+    _safe_mkdir(destino.parent)
+    tmp = destino.with_name(f"{destino.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        backend.bajar(clave, str(tmp))
+        os.replace(tmp, destino)
+    finally:
+        tmp.unlink(missing_ok=True)
+    _get_cache().agregar(str(destino))
+    return str(destino)
+
+
+def ruta_local_fijada(path: str) -> str:
+    """
+    Como ruta_local, pero el archivo queda fijado en el cache (no se evicta)
+    hasta soltar(ruta): para servirlo sin que otro request lo borre en el medio.
+    Si se evictó entre que se eligió y se fijó, se vuelve a bajar.
+    """
+    for _ in range(3):
+        ruta = ruta_local(path)
+        if not get_backend().remoto or _get_cache().fijar(ruta):
+            return ruta
+    raise FileNotFoundError(path)
+
+
+def soltar(ruta: str) -> None:
+    if get_backend().remoto:
+        _get_cache().soltar(ruta)
+
+
+def publicar(ruta: str) -> str:
+    """
+    Sube al backend un archivo derivado que se generó en MEDIA_ROOT (ej: el
+    transcode de un audio) y devuelve lo que va en la DB.
+    """
+    backend = get_backend()
+    if not backend.remoto:
+        return ruta
+    clave = _clave_local(ruta)
+    backend.subir(ruta, clave)
+    _get_cache().agregar(ruta)
+    return backend.uri(clave)
+
+
+def registrar_en_cache(ruta: str) -> None:
+    """Cuenta en el cache un archivo que solo vive en este nodo (ej: miniaturas)."""
+    if get_backend().remoto:
+        _get_cache().agregar(ruta)
+
+
+def _destino(src: Path, *, team_id: int, chat_id: int, lote: str | None = None) -> tuple[Path, str | None, str]:
+    mime_type, _ = mimetypes.guess_type(src.name)
+    tipo = _guess_tipo_from_mime(mime_type)
+    dest_dir = Path(MEDIA_ROOT) / f"team_{team_id}" / f"chat_{chat_id}" / tipo
+    if lote:
+        dest_dir = dest_dir / lote
+    _safe_mkdir(dest_dir)
+    return dest_dir / src.name, mime_type, tipo
+
+
+def _reservar(dest: Path) -> Path:
+    """
+    Crea vacío el primer nombre libre (foo.jpg, foo__2.jpg, ...) con O_EXCL:
+    dos copias en paralelo (o dos imports) nunca eligen el mismo destino.
+    """
+    candidate, i = dest, 2
+    while True:
+        try:
+            os.close(os.open(candidate, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644))
+            return candidate
+        except FileExistsError:
+            candidate = dest.with_name(f"{dest.stem}__{i}{dest.suffix}")
+            i += 1
+
+
+# errores de copy_file_range/sendfile que significan "no soportado acá"
+_ERRNOS_SIN_SOPORTE = {
+    errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP, errno.EBADF,
+}
+
+
+def _copiar_contenido(src: Path, dest: Path, size: int) -> None:
+    """
+    Copia en el kernel (copy_file_range, si no sendfile) sin pasar los bytes
+    por Python; si el FS/SO no lo soporta, copia por bloques. Conserva
+    permisos y fechas como shutil.copy2.
+    """
+    with open(src, "rb") as fsrc, open(dest, "wb") as fdst:
+        copiado = 0
+        for syscall in ("copy_file_range", "sendfile"):
+            fn = getattr(os, syscall, None)
+            if fn is None:
+                continue
+            try:
+                while copiado < size:
+                    if syscall == "copy_file_range":
+                        n = fn(fsrc.fileno(), fdst.fileno(), size - copiado)
+                    else:
+                        n = fn(fdst.fileno(), fsrc.fileno(), copiado, size - copiado)
+                    if n == 0:
+                        break
+                    copiado += n
+                break
+            except OSError as e:
+                # EXDEV, ENOSYS, EINVAL...: se prueba la siguiente forma desde donde quedó
+                if e.errno not in _ERRNOS_SIN_SOPORTE:
+                    raise
+                fsrc.seek(copiado)
+                fdst.seek(copiado)
+        if copiado < size:
+            # sin soporte, o el syscall devolvió 0 antes de tiempo: el resto por bloques
+            fsrc.seek(copiado)
+            fdst.seek(copiado)
+            shutil.copyfileobj(fsrc, fdst, 1024 * 1024)
+    shutil.copystat(src, dest)
+
+
+@dataclass
+class MediaCopyStats:
+    archivos: int = 0
+    bytes: int = 0
+    segundos: float = 0.0
+
+    @property
+    def mb_s(self) -> float:
+        return self.bytes / (1024 * 1024) / self.segundos if self.segundos else 0.0
+
+    def sumar(self, otro: MediaCopyStats) -> None:
+        self.archivos += otro.archivos
+        self.bytes += otro.bytes
+        self.segundos += otro.segundos
+
+
+def store_media_file(*, src_path: str, team_id: int, chat_id: int) -> StoredFile:
+    stored, _ = store_media_files([src_path], team_id=team_id, chat_id=chat_id, workers=1)
+    if stored[0] is None:
+        raise FileNotFoundError(src_path)
+    return stored[0]
+
+
+def store_media_files(
+    src_paths: list[str],
+    *,
+    team_id: int,
+    chat_id: int,
+    workers: int | None = None,
+) -> tuple[list[StoredFile | None], MediaCopyStats]:
+    """
+    Copia varios adjuntos a MEDIA_ROOT con un pool de threads acotado
+    (MEDIA_COPY_WORKERS). Los destinos se reservan antes, en orden, así los
+    nombres (foo__2.jpg) salen igual que copiando de a uno.
+
+    Con backend remoto cada archivo se sube después de copiarlo (queda en el
+    cache local) y path es la URI. Las claves llevan un directorio único por
+    llamada: el O_EXCL local no ve lo que ya está en el bucket (ni lo de
+    otros nodos), así nunca se pisa un objeto existente.
+
+    Devuelve un StoredFile por src, en el mismo orden (None si el src no
+    existe), y el throughput de la copia.
+    """
+    t0 = time.perf_counter()
+    backend = get_backend()
+    lote = uuid.uuid4().hex[:12] if backend.remoto else None
+    pendientes: list[tuple[int, Path, Path, int]] = []
+    stored: list[StoredFile | None] = [None] * len(src_paths)
+
+    for i, src_path in enumerate(src_paths):
+        src = Path(src_path)
+        try:
+            size = src.stat().st_size
+        except FileNotFoundError:
+            continue
+        dest, mime_type, tipo = _destino(src, team_id=team_id, chat_id=chat_id, lote=lote)
+        dest = _reservar(dest)
+        path = backend.uri(_clave_local(dest)) if backend.remoto else str(dest)
+        stored[i] = StoredFile(filename=dest.name, path=path, mime_type=mime_type, size=size, tipo=tipo)
+        pendientes.append((i, src, dest, size))
+
+    def copiar(item: tuple[int, Path, Path, int]) -> bool:
+        i, src, dest, size = item
+        try:
+            _copiar_contenido(src, dest, size)
+        except FileNotFoundError:
+            # se borró entre el stat y la copia: mismo trato que si no estuviera
+            dest.unlink(missing_ok=True)
+            return False
+        if backend.remoto:
+            backend.subir(str(dest), _clave_local(dest))
+            _get_cache().agregar(str(dest))
+        return True
+
+    workers = min(workers or MEDIA_COPY_WORKERS, len(pendientes))
+    if workers <= 1:
+        resultados = list(map(copiar, pendientes))
+    else:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="media-copy") as pool:
+            resultados = list(pool.map(copiar, pendientes))
+
+    stats = MediaCopyStats(segundos=time.perf_counter() - t0)
+    for (i, _, _, size), ok in zip(pendientes, resultados):
+        if ok:
+            stats.archivos += 1
+            stats.bytes += size
+        else:
+            stored[i] = None
+    return stored, stats
+
+
+def index_extracted_files(extract_dir: str, *, chat_txt_path: str) -> dict[str, str]:
+    """
+    Indexa todos los archivos extraídos del ZIP (excepto el .txt del chat)
+    para poder resolver adjuntos mencionados en los mensajes.
+    """
+    indexed: dict[str, str] = {}
+    chat_txt_abs = str(Path(chat_txt_path).resolve())
+
+    for root, _, files in os.walk(extract_dir):
+        for name in files:
+            full = str(Path(root, name).resolve())
+            if full == chat_txt_abs:
+                continue
+            indexed[name] = full
+    return indexed
+
+
+def resolve_message_attachments(*, message_text: str, extracted_index: dict[str, str]) -> list[str]:
+    """
+    Detecta archivos adjuntos mencionados en el texto del mensaje
+    comparando contra los archivos realmente extraídos del ZIP,
+    de forma tolerante a espacios, Unicode y caracteres invisibles.
+    """
+    if not message_text:
+        return []
+
+    text = _norm(message_text).lower()
+    out: list[str] = []
+
+    for filename, full_path in extracted_index.items():
+        fname = _norm(filename).lower()
+        if fname and fname in text:
+            out.append(full_path)
+
+    return list(dict.fromkeys(out))
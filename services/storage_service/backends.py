@@ -0,0 +1,146 @@
+# path: services/storage_service/backends.py
+"""
+Dónde viven los adjuntos. Cada backend trabaja con claves relativas
+("team_1/chat_2/image/foo.jpg") y sabe armar/leer la URI que se guarda en
+Archivo.path:
+
+- LocalBackend: la URI es la ruta en MEDIA_ROOT (como siempre).
+- S3Backend: s3://bucket/prefijo/clave. Sirve con AWS o con cualquier
+  compatible (MinIO: S3_ENDPOINT_URL=http://localhost:9000). boto3 es
+  opcional: solo hace falta con STORAGE_BACKEND=s3.
+"""
+from __future__ import annotations
+
+import os
+from collections.abc import Iterator
+from pathlib import Path
+
+
+class StorageBackend:
+    # True: los archivos no están en este nodo y MEDIA_ROOT es solo cache
+    remoto = False
+
+    def uri(self, clave: str) -> str:
+        raise NotImplementedError
+
+    def clave(self, uri: str) -> str | None:
+        """Clave de una URI de este backend; None si la URI no es suya."""
+        raise NotImplementedError
+
+    def subir(self, ruta_local: str, clave: str) -> None:
+        raise NotImplementedError
+
+    def bajar(self, clave: str, destino: str) -> None:
+        """Baja la clave a `destino`. FileNotFoundError si no existe."""
+        raise NotImplementedError
+
+    def borrar(self, clave: str) -> None:
+        raise NotImplementedError
+
+    def listar(self, prefijo: str = "") -> Iterator[tuple[str, int, float]]:
+        """
+        (clave, bytes, mtime) de todo lo guardado bajo `prefijo`, en orden
+        binario de clave (el de COLLATE "C"), sin cargar todo en memoria.
+        """
+        raise NotImplementedError
+
+
+class LocalBackend(StorageBackend):
+    def __init__(self, root: str):
+        self.root = Path(root)
+
+    def uri(self, clave: str) -> str:
+        return str(self.root / clave)
+
+    def clave(self, uri: str) -> str | None:
+        try:
+            return Path(uri).relative_to(self.root).as_posix()
+        except ValueError:
+            return None
+
+    def subir(self, ruta_local: str, clave: str) -> None:
+        # store_media_files ya copió a MEDIA_ROOT/clave: no hay nada que subir
+        destino = self.root / clave
+        if Path(ruta_local) != destino:
+            destino.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(ruta_local, destino)
+
+    def bajar(self, clave: str, destino: str) -> None:
+        if not (self.root / clave).is_file():
+            raise FileNotFoundError(clave)
+
+    def borrar(self, clave: str) -> None:
+        (self.root / clave).unlink(missing_ok=True)
+
+    def listar(self, prefijo: str = "") -> Iterator[tuple[str, int, float]]:
+        base = self.root / prefijo if prefijo else self.root
+        if not base.is_dir():
+            return
+
+        def recorrer(directorio: Path, rel: str):
+            # un directorio a la vez en memoria; los subdirectorios se ordenan
+            # como "nombre/" para que el orden sea el de la clave completa
+            # ("a.b" < "a/b" porque "." < "/")
+            with os.scandir(directorio) as it:
+                entradas = [(e.name + "/" if e.is_dir(follow_symlinks=False) else e.name, e) for e in it]
+            for nombre, e in sorted(entradas, key=lambda x: x[0].encode("utf-8", "surrogateescape")):
+                if nombre.endswith("/"):
+                    yield from recorrer(Path(e.path), f"{rel}{nombre}")
+                elif e.is_file(follow_symlinks=False):
+                    st = e.stat(follow_symlinks=False)
+                    yield f"{rel}{nombre}", st.st_size, st.st_mtime
+
+        yield from recorrer(base, f"{prefijo.rstrip('/')}/" if prefijo else "")
+
+
+class S3Backend(StorageBackend):
+    remoto = True
+
+    def __init__(
+        self,
+        bucket: str,
+        *,
+        prefijo: str = "",
+        endpoint_url: str | None = None,
+        client=None,
+    ):
+        if client is None:
+            try:
+                import boto3
+            except ImportError as e:
+                raise RuntimeError("STORAGE_BACKEND=s3 necesita boto3 (pip install boto3)") from e
+            client = boto3.client("s3", endpoint_url=endpoint_url)
+        self.client = client
+        self.bucket = bucket
+        self.prefijo = prefijo.strip("/") + "/" if prefijo.strip("/") else ""
+        self._uri_base = f"s3://{bucket}/{self.prefijo}"
+
+    def uri(self, clave: str) -> str:
+        return self._uri_base + clave
+
+    def clave(self, uri: str) -> str | None:
+        return uri[len(self._uri_base):] if uri.startswith(self._uri_base) else None
+
+    def subir(self, ruta_local: str, clave: str) -> None:
+        self.client.upload_file(ruta_local, self.bucket, self.prefijo + clave)
+
+    def bajar(self, clave: str, destino: str) -> None:
+        from botocore.exceptions import ClientError
+
+        try:
+            self.client.download_file(self.bucket, self.prefijo + clave, destino)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey"):
+                raise FileNotFoundError(clave) from e
+            raise
+
+    def borrar(self, clave: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=self.prefijo + clave)
+
+    def listar(self, prefijo: str = "") -> Iterator[tuple[str, int, float]]:
+        # S3 lista en orden de clave (UTF-8 binario)
+        paginas = self.client.get_paginator("list_objects_v2").paginate(
+            Bucket=self.bucket, Prefix=self.prefijo + prefijo)
+        for pagina in paginas:
+            for obj in pagina.get("Contents", []):
+                yield obj["Key"][len(self.prefijo):], obj["Size"], obj["LastModified"].timestamp()
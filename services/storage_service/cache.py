@@ -0,0 +1,94 @@
+# path: services/storage_service/cache.py
+"""
+Cache LRU en disco de cada nodo, acotado en bytes. Con un backend remoto
+MEDIA_ROOT deja de ser el storage y pasa a ser esto: lo caliente se sirve
+del disco local, lo frío se vuelve a bajar cuando se pide.
+
+Un archivo fijado (fijar/soltar, mientras se está mandando en una descarga)
+no se evicta: si no, otro request podría borrarlo entre que se eligió la
+ruta y FileResponse lo abre.
+"""
+from __future__ import annotations
+
+import os
+import threading
+from collections import Counter, OrderedDict
+
+
+class CacheLocal:
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._entradas: OrderedDict[str, int] = OrderedDict()  # ruta -> bytes, el más viejo primero
+        self._total = 0
+        self._fijadas: Counter[str] = Counter()  # ruta -> descargas en curso
+        self._cargada = False
+        self._lock = threading.Lock()
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total
+
+    def _cargar(self) -> None:
+        # lo que quedó en disco de antes, del menos al más recientemente usado
+        encontrados = []
+        for dirpath, _, files in os.walk(self.root):
+            for name in files:
+                if name.endswith(".tmp"):
+                    continue
+                ruta = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(ruta)
+                except FileNotFoundError:
+                    continue
+                encontrados.append((max(st.st_atime, st.st_mtime), ruta, st.st_size))
+        for _, ruta, size in sorted(encontrados):
+            self._entradas[ruta] = size
+            self._total += size
+        self._cargada = True
+
+    def usar(self, ruta: str) -> None:
+        with self._lock:
+            if ruta in self._entradas:
+                self._entradas.move_to_end(ruta)
+
+    def fijar(self, ruta: str) -> bool:
+        """Protege la ruta del evict hasta soltar(); False si ya no está en disco."""
+        with self._lock:
+            if not os.path.isfile(ruta):
+                return False
+            self._fijadas[ruta] += 1
+            if ruta in self._entradas:
+                self._entradas.move_to_end(ruta)
+            return True
+
+    def soltar(self, ruta: str) -> None:
+        with self._lock:
+            self._fijadas[ruta] -= 1
+            if self._fijadas[ruta] <= 0:
+                del self._fijadas[ruta]
+
+    def agregar(self, ruta: str) -> None:
+        try:
+            size = os.path.getsize(ruta)
+        except FileNotFoundError:
+            return
+        with self._lock:
+            if not self._cargada:
+                self._cargar()
+            self._total += size - self._entradas.pop(ruta, 0)
+            self._entradas[ruta] = size
+            self._evictar(conservar=ruta)
+
+    def _evictar(self, *, conservar: str) -> None:
+        # del menos usado al más usado, salteando lo fijado y lo que se acaba de agregar
+        for ruta in list(self._entradas):
+            if self._total <= self.max_bytes:
+                break
+            if ruta == conservar or ruta in self._fijadas:
+                continue
+            self._total -= self._entradas.pop(ruta)
+            try:
+                os.unlink(ruta)
+            except FileNotFoundError:
+                pass
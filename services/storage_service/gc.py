@@ -0,0 +1,197 @@
+# path: services/storage_service/gc.py
+"""
+Reconciliación storage <-> DB.
+
+- huérfanos: archivos sin fila en Archivo (imports cortados a la mitad,
+  copias __2 de un bloque que falló). Se borran con --borrar.
+- filas colgadas: Archivo.path / transcode_path que apuntan a algo que ya
+  no está. Se reportan; con --borrar-filas se borra la fila (o se limpia
+  el transcode_path).
+
+Las dos listas se recorren ordenadas por clave (el backend en orden binario,
+la DB con ORDER BY ... COLLATE "C") y se cruzan como un merge: la memoria no
+depende de cuántos archivos haya. Los huérfanos más nuevos que --min-edad-horas
+no se tocan: pueden ser de un import en curso que todavía no commiteó.
+
+    python -m services.storage_service.gc [--borrar] [--borrar-filas] [--prefijo team_1/]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from collections.abc import Iterator
+from pathlib import Path
+
+from sqlalchemy import delete, literal, select, union_all, update
+
+from models.archivos import Archivo
+from services.storage_service import MEDIA_ROOT, get_backend
+
+THUMBS_DIRNAME = ".thumbs"
+
+# filas leídas por vuelta del cursor y filas borradas por transacción
+GC_LOTE = 5_000
+# ejemplos que se guardan en el reporte
+GC_MUESTRA = 50
+
+
+def _es_derivado(clave: str) -> bool:
+    # las miniaturas se regeneran solas y se borran junto con su original
+    return f"/{THUMBS_DIRNAME}/" in f"/{clave}"
+
+
+def _claves_db(conn, backend, prefijo: str, reporte: dict) -> Iterator[tuple[str, int, str]]:
+    """(clave, archivo_id, columna) de cada path/transcode_path, ordenado por clave."""
+    a = Archivo.__table__
+    paths = union_all(
+        select(a.c.path.label("p"), a.c.id, literal("path").label("campo")),
+        select(a.c.transcode_path, a.c.id, literal("transcode_path"))
+        .where(a.c.transcode_path.isnot(None)),
+    ).subquery()
+    orden = paths.c.p.collate("C") if conn.dialect.name == "postgresql" else paths.c.p
+
+    result = conn.execution_options(stream_results=True, yield_per=GC_LOTE).execute(
+        select(paths.c.p, paths.c.id, paths.c.campo).order_by(orden))
+    ultima = None
+    for path, archivo_id, campo in result:
+        clave = backend.clave(path)
+        if clave is None:
+            # fila de otro backend / otra raíz: no se puede cruzar con este storage
+            reporte["filas_fuera_de_storage"] += 1
+            continue
+        if prefijo and not clave.startswith(prefijo):
+            continue
+        if ultima is not None and clave < ultima:
+            raise RuntimeError(
+                "Archivo.path no sale ordenado por clave (¿rutas guardadas con prefijos distintos?): "
+                f"{ultima!r} > {clave!r}")
+        ultima = clave
+        yield clave, archivo_id, campo
+
+
+def _muestra(lista: list, item) -> None:
+    if len(lista) < GC_MUESTRA:
+        lista.append(item)
+
+
+def _borrar_archivo(backend, clave: str) -> None:
+    backend.borrar(clave)
+    local = Path(MEDIA_ROOT) / clave
+    if backend.remoto:
+        local.unlink(missing_ok=True)
+    for thumb in (local.parent / THUMBS_DIRNAME).glob(f"{local.name}.*.jpg"):
+        thumb.unlink(missing_ok=True)
+
+
+def _borrar_filas(engine, filas: list[tuple[int, str]]) -> int:
+    a = Archivo.__table__
+    ids_path = [archivo_id for archivo_id, campo in filas if campo == "path"]
+    ids_transcode = [archivo_id for archivo_id, campo in filas if campo == "transcode_path"]
+    with engine.begin() as conn:
+        if ids_transcode:
+            conn.execute(update(a).where(a.c.id.in_(ids_transcode)).values(transcode_path=None))
+        if ids_path:
+            conn.execute(delete(a).where(a.c.id.in_(ids_path)))
+    return len(filas)
+
+
+def reconciliar(
+    engine,
+    *,
+    borrar: bool = False,
+    borrar_filas: bool = False,
+    min_edad_horas: float = 24,
+    prefijo: str = "",
+) -> dict:
+    t0 = time.perf_counter()
+    backend = get_backend()
+    # siempre un directorio completo: "team_1" no debe incluir "team_10/"
+    prefijo = prefijo.strip("/") + "/" if prefijo.strip("/") else ""
+    limite_edad = time.time() - min_edad_horas * 3600
+    reporte = {
+        "archivos": 0,
+        "bytes": 0,
+        "referenciados": 0,
+        "huerfanos": {"cantidad": 0, "bytes": 0, "borrados": 0, "muestra": []},
+        "huerfanos_recientes": 0,
+        "filas_colgadas": {"cantidad": 0, "borradas": 0, "muestra": []},
+        "filas_fuera_de_storage": 0,
+    }
+    huerfanos = reporte["huerfanos"]
+    colgadas = reporte["filas_colgadas"]
+    filas_a_borrar: list[tuple[int, str]] = []
+
+    with engine.connect() as conn:
+        archivos = (x for x in backend.listar(prefijo) if not _es_derivado(x[0]))
+        filas = _claves_db(conn, backend, prefijo, reporte)
+        archivo = next(archivos, None)
+        fila = next(filas, None)
+
+        while archivo is not None or fila is not None:
+            if fila is None or (archivo is not None and archivo[0] < fila[0]):
+                # archivo sin fila
+                clave, size, mtime = archivo
+                reporte["archivos"] += 1
+                reporte["bytes"] += size
+                if mtime > limite_edad:
+                    reporte["huerfanos_recientes"] += 1
+                else:
+                    huerfanos["cantidad"] += 1
+                    huerfanos["bytes"] += size
+                    _muestra(huerfanos["muestra"], clave)
+                    if borrar:
+                        _borrar_archivo(backend, clave)
+                        huerfanos["borrados"] += 1
+                archivo = next(archivos, None)
+
+            elif archivo is None or fila[0] < archivo[0]:
+                # fila sin archivo
+                clave, archivo_id, campo = fila
+                colgadas["cantidad"] += 1
+                _muestra(colgadas["muestra"], {"archivo_id": archivo_id, "campo": campo, "clave": clave})
+                if borrar_filas:
+                    filas_a_borrar.append((archivo_id, campo))
+                    if len(filas_a_borrar) >= GC_LOTE:
+                        colgadas["borradas"] += _borrar_filas(engine, filas_a_borrar)
+                        filas_a_borrar = []
+                fila = next(filas, None)
+
+            else:
+                # mismo archivo (puede haber más de una fila apuntándolo)
+                clave, size, _ = archivo
+                reporte["archivos"] += 1
+                reporte["bytes"] += size
+                reporte["referenciados"] += 1
+                while fila is not None and fila[0] == clave:
+                    fila = next(filas, None)
+                archivo = next(archivos, None)
+
+    if filas_a_borrar:
+        colgadas["borradas"] += _borrar_filas(engine, filas_a_borrar)
+
+    reporte["segundos"] = round(time.perf_counter() - t0, 3)
+    return reporte
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reconciliación de adjuntos: storage vs tabla archivo")
+    parser.add_argument("--borrar", action="store_true", help="borra los archivos huérfanos")
+    parser.add_argument("--borrar-filas", action="store_true", help="borra las filas sin archivo")
+    parser.add_argument("--min-edad-horas", type=float, default=24)
+    parser.add_argument("--prefijo", default="", help='ej: "team_1/" para un solo team')
+    args = parser.parse_args()
+
+    from database import engine
+
+    print(json.dumps(
+        reconciliar(
+            engine,
+            borrar=args.borrar,
+            borrar_filas=args.borrar_filas,
+            min_edad_horas=args.min_edad_horas,
+            prefijo=args.prefijo,
+        ),
+        ensure_ascii=False,
+        indent=2,
+    ))
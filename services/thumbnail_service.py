@@ -0,0 +1,168 @@
+# path: services/thumbnail_service.py
+"""
+Miniaturas de imágenes y videos guardados por storage_service.
+
+Se guardan al lado del original, en `.thumbs/<nombre>.<lado>.jpg`, una por
+tamaño: el archivo es el cache (se regenera si el original es más nuevo).
+Con backend remoto quedan solo en el cache local del nodo.
+Se generan al importar (en un pool de threads, sin frenar el import) o la
+primera vez que se piden.
+
+- imágenes: Pillow (opcional; sin Pillow no hay miniaturas de imágenes)
+- videos: un frame con ffmpeg (opcional; si no está en el PATH, no hay)
+"""
+from __future__ import annotations
+
+import os
+import shutil
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from services.storage_service import registrar_en_cache, ruta_local
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # pragma: no cover - depende del entorno
+    Image = None
+    ImageOps = None
+
+# una vez al importar, como Pillow: soporta_thumbnail se llama por cada
+# adjunto de un listado (hasta 500) y which() recorre el PATH cada vez
+FFMPEG_DISPONIBLE = shutil.which("ffmpeg") is not None
+
+THUMBS_DIRNAME = ".thumbs"
+
+# lados (px) permitidos: cualquier otro se lleva al más cercano, así el cache
+# no crece con un archivo por cada tamaño que pida la UI
+THUMB_SIZES = (160, 320, 640)
+THUMB_SIZE_DEFAULT = 320
+THUMB_QUALITY = 80
+
+THUMBS_ON_IMPORT = os.getenv("THUMBS_ON_IMPORT", "1") == "1"
+THUMB_WORKERS = int(os.getenv("THUMB_WORKERS", "2"))
+FFMPEG_TIMEOUT = 30
+
+_pool: ThreadPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+def normalizar_lado(lado: int | None) -> int:
+    if not lado:
+        return THUMB_SIZE_DEFAULT
+    return min(THUMB_SIZES, key=lambda s: abs(s - lado))
+
+
+def _tipo_media(mime_type: str | None) -> str | None:
+    major = (mime_type or "").split("/", 1)[0].lower()
+    return major if major in ("image", "video") else None
+
+
+def soporta_thumbnail(mime_type: str | None) -> bool:
+    tipo = _tipo_media(mime_type)
+    if tipo == "image":
+        return Image is not None
+    if tipo == "video":
+        return FFMPEG_DISPONIBLE
+    return False
+
+
+def thumb_path(original_path: str, lado: int) -> Path:
+    original = Path(original_path)
+    return original.parent / THUMBS_DIRNAME / f"{original.name}.{lado}.jpg"
+
+
+def _vigente(thumb: Path, original: Path) -> bool:
+    try:
+        return thumb.stat().st_mtime >= original.stat().st_mtime
+    except FileNotFoundError:
+        return False
+
+
+def _thumb_imagen(src: Path, tmp: Path, lado: int) -> None:
+    with Image.open(src) as img:
+        # draft: JPEGs grandes se decodifican ya reducidos (mucho menos RAM/CPU)
+        img.draft("RGB", (lado, lado))
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail((lado, lado))
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        img.save(tmp, "JPEG", quality=THUMB_QUALITY, optimize=True)
+
+
+def _thumb_video(src: Path, tmp: Path, lado: int) -> None:
+    escala = f"scale='min({lado},iw)':'min({lado},ih)':force_original_aspect_ratio=decrease"
+    # primer intento a 1s (evita frames negros del inicio); videos más cortos: frame 0
+    for seek in ("1", "0"):
+        subprocess.run(
+            ["ffmpeg", "-v", "error", "-y", "-ss", seek, "-i", str(src),
+             "-frames:v", "1", "-vf", escala, "-f", "image2", "-update", "1", "-c:v", "mjpeg", str(tmp)],
+            timeout=FFMPEG_TIMEOUT,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        if tmp.exists() and tmp.stat().st_size > 0:
+            return
+    raise ValueError("ffmpeg no devolvió ningún frame")
+
+
+def generar_thumbnail(original_path: str, mime_type: str | None, lado: int = THUMB_SIZE_DEFAULT) -> Path | None:
+    """
+    Devuelve la miniatura de `lado` px (la genera si falta o quedó vieja).
+    None si el tipo no tiene miniatura, falta Pillow/ffmpeg o el archivo no
+    se pudo decodificar.
+    """
+    if not soporta_thumbnail(mime_type):
+        return None
+
+    try:
+        # Archivo.path puede ser una URI del backend: se usa la copia local
+        original = Path(ruta_local(original_path))
+    except FileNotFoundError:
+        return None
+    lado = normalizar_lado(lado)
+    thumb = thumb_path(str(original), lado)
+    if _vigente(thumb, original):
+        return thumb
+
+    thumb.parent.mkdir(parents=True, exist_ok=True)
+    # se escribe aparte y se renombra: dos pedidos a la vez nunca ven un jpg a medias
+    tmp = thumb.with_name(f"{thumb.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        if _tipo_media(mime_type) == "image":
+            _thumb_imagen(original, tmp, lado)
+        else:
+            _thumb_video(original, tmp, lado)
+        os.replace(tmp, thumb)
+    except Exception:
+        tmp.unlink(missing_ok=True)
+        return None
+    registrar_en_cache(str(thumb))
+    return thumb
+
+
+def _get_pool() -> ThreadPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=THUMB_WORKERS, thread_name_prefix="thumbs")
+        return _pool
+
+
+def encolar_thumbnails(archivos: list[tuple[str, str | None]], lado: int = THUMB_SIZE_DEFAULT) -> int:
+    """
+    Genera en segundo plano la miniatura de cada (path, mime_type) que la
+    soporte. No espera: el import sigue y la miniatura queda lista para la
+    galería (o se genera al pedirla si todavía no terminó).
+    """
+    if not THUMBS_ON_IMPORT:
+        return 0
+    pool = None
+    encolados = 0
+    for path, mime_type in archivos:
+        if not soporta_thumbnail(mime_type):
+            continue
+        pool = pool or _get_pool()
+        pool.submit(generar_thumbnail, path, mime_type, lado)
+        encolados += 1
+    return encolados
@@ -0,0 +1,73 @@
+# path: services/upserts.py
+"""
+Altas seguras con imports en paralelo (varios workers contra la misma DB).
+
+- insert_on_conflict: INSERT ... ON CONFLICT sobre un índice único
+  (Postgres / SQLite). En otros motores: INSERT en un savepoint.
+- team_xact_lock: pg_advisory_xact_lock por team para serializar
+  "buscar y si no existe crear" cuando la búsqueda no es por igualdad
+  (sufijo de teléfono, nombre) y no alcanza con un índice único.
+"""
+from __future__ import annotations
+
+from typing import Any
+
+from sqlalchemy import insert, text
+from sqlalchemy.exc import IntegrityError
+
+# namespaces de pg_advisory_xact_lock(ns, team_id)
+LOCK_NS_CONTACTO_NOMBRE = 7_260_032
+LOCK_NS_CHAT = 7_260_033
+
+
+def _dialect_name(session) -> str:
+    return session.get_bind().dialect.name
+
+
+def team_xact_lock(session, namespace: int, team_id: int) -> None:
+    """Se libera con el commit/rollback de la transacción. No-op fuera de Postgres."""
+    if _dialect_name(session) == "postgresql":
+        session.execute(
+            text("SELECT pg_advisory_xact_lock(:ns, :team_id)"),
+            {"ns": namespace, "team_id": team_id},
+        )
+
+
+def insert_on_conflict(
+    session,
+    table,
+    values: dict[str, Any],
+    *,
+    index_elements: list[str],
+    index_where=None,
+    set_: dict[str, Any] | None = None,
+) -> int | None:
+    """
+    INSERT ... ON CONFLICT (index_elements) [WHERE index_where]
+    DO UPDATE SET set_ (o DO NOTHING si set_ es None) RETURNING id.
+
+    Devuelve el id insertado o actualizado; None si chocó y no hubo UPDATE
+    (DO NOTHING, o motor sin ON CONFLICT): el caller relee la fila existente.
+    """
+    dialect = _dialect_name(session)
+
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+
+        stmt = dialect_insert(table).values(**values)
+        if set_:
+            stmt = stmt.on_conflict_do_update(
+                index_elements=index_elements, index_where=index_where, set_=set_)
+        else:
+            stmt = stmt.on_conflict_do_nothing(
+                index_elements=index_elements, index_where=index_where)
+        return session.execute(stmt.returning(table.c.id)).scalar()
+
+    try:
+        with session.begin_nested():
+            return session.execute(insert(table).values(**values)).inserted_primary_key[0]
+    except IntegrityError:
+        return None
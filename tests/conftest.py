@@ -0,0 +1,16 @@
+# path: tests/conftest.py
+"""
+python -m pytest -q (desde la raíz del repo)
+
+Los tests de EXPLAIN necesitan un Postgres descartable en TEST_DATABASE_URL
+(crean el esquema y cargan datos dentro de una transacción que se descarta);
+sin él se saltean. El resto no toca la DB.
+"""
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+# database.py exige DATABASE_URL al importarse; los tests nunca usan ese engine
+os.environ.setdefault("DATABASE_URL", os.getenv("TEST_DATABASE_URL") or "sqlite://")
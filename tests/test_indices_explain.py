@@ -0,0 +1,218 @@
+# path: tests/test_indices_explain.py
+"""
+Regresión de índices: cada consulta caliente de chat_service y
+services/metrics tiene que poder resolverse con el índice que se creó para
+ella (migrations/m0001 y siguientes).
+
+Se corren las mismas funciones que llaman las rutas, se guarda el SQL que
+emiten y se le saca EXPLAIN con enable_seqscan y enable_bitmapscan en off: si
+el índice sirve para la consulta el planner lo elige, y si alguien cambia la
+consulta (o el índice) de forma que ya no encaja, desaparece del plan. Sin eso
+el resultado dependería del tamaño de los datos de prueba, no de la forma de
+la consulta.
+"""
+from __future__ import annotations
+
+import os
+
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlmodel import Session, SQLModel
+
+from migrations import m0001_hot_query_indexes, m0007_user_actions_indexes
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL", "")
+
+necesita_postgres = pytest.mark.skipif(
+    not TEST_DATABASE_URL.startswith("postgresql"),
+    reason="necesita TEST_DATABASE_URL apuntando a un Postgres descartable",
+)
+
+TEAM = 1
+OTRO_TEAM = 2
+CHATS = 300
+MENSAJES_POR_CHAT = 20
+# el chat de get_chat_full: con muchos mensajes, ordenar sin el índice sí cuesta
+MENSAJES_CHAT_GRANDE = 2000
+
+
+def _sembrar(conn) -> int:
+    """Dos teams chicos (uno para que el filtro por team_id importe). Devuelve el chat grande."""
+    conn.execute(text("INSERT INTO team (id, nombre, created_at, activo) VALUES (:a, 'explain-a', now(), true), "
+                      "(:b, 'explain-b', now(), true)"), {"a": TEAM, "b": OTRO_TEAM})
+    conn.execute(text("""
+        INSERT INTO pipeline_estado (id, nombre, score_min, score_max)
+        VALUES (1, 'Interesado', 0, 10), (2, 'Potencial venta', 11, 20), (3, 'Perdido', -100, -1)
+    """))
+    # distribuciones selectivas (pocos chats sin pipeline, creado_en en ~400 días) para
+    # que el índice pensado para cada filtro gane claro y no por empate de costos
+    conn.execute(text("""
+        INSERT INTO contacto (id, team_id, nombre, telefono, telefono_key, estado, created_at)
+        SELECT g, CASE WHEN g % 2 = 0 THEN :a ELSE :b END, 'contacto ' || g, '+54 9 261 555-' || g,
+               '+549261555' || g, g % 3, now()
+        FROM generate_series(1, :n) g
+    """), {"a": TEAM, "b": OTRO_TEAM, "n": CHATS * 2})
+    conn.execute(text("""
+        INSERT INTO chat (id, team_id, nombre, numero, score_actual, pipeline_estado_id, creado_en)
+        SELECT g, CASE WHEN g % 2 = 0 THEN :a ELSE :b END, 'contacto ' || g, '+54 9 261 555-' || g,
+               (g * 7) % 40 - 10,
+               CASE WHEN g % 20 = 0 THEN 1 WHEN g % 20 = 1 THEN 2 WHEN g % 20 = 2 THEN NULL ELSE 3 END,
+               now() - (g % 400) * interval '1 day'
+        FROM generate_series(1, :n) g
+    """), {"a": TEAM, "b": OTRO_TEAM, "n": CHATS * 2})
+    conn.execute(text("""
+        INSERT INTO mensaje (chat_id, contacto_id, tipo, texto, from_me, created_at)
+        SELECT ch.id, ch.id, 1, 'hola ' || g, g % 2 = 0, ch.creado_en + g * interval '1 minute'
+        FROM chat ch CROSS JOIN generate_series(1, :m) g
+    """), {"m": MENSAJES_POR_CHAT})
+    conn.execute(text("""
+        INSERT INTO mensaje (chat_id, contacto_id, tipo, texto, from_me, created_at)
+        SELECT :c, :c, 1, 'más ' || g, false, now() - g * interval '1 minute'
+        FROM generate_series(1, :m) g
+    """), {"c": TEAM * 2, "m": MENSAJES_CHAT_GRANDE})
+    conn.execute(text("""
+        INSERT INTO archivo (mensaje_id, chat_id, tipo, filename, path, size)
+        SELECT m.id, m.chat_id, 'image', 'f' || m.id || '.jpg', '/media/f' || m.id || '.jpg', 1000
+        FROM mensaje m WHERE m.texto LIKE '%5'
+    """))
+    conn.execute(text("""
+        INSERT INTO chatscoreevent (chat_id, origen, motivo, delta, creado_en)
+        SELECT ch.id, 'rule', 'Pidió precio', 2, ch.creado_en + g * interval '1 hour'
+        FROM chat ch CROSS JOIN generate_series(1, 3) g
+    """))
+    for tabla in ("team", "pipeline_estado", "contacto", "chat"):
+        # los ids se cargaron a mano: que los INSERT de las funciones no choquen
+        conn.execute(text(f"SELECT setval(pg_get_serial_sequence('{tabla}', 'id'), (SELECT max(id) FROM {tabla}))"))
+    for tabla in ("contacto", "chat", "mensaje", "archivo", "chatscoreevent", "pipeline_estado"):
+        conn.execute(text(f"ANALYZE {tabla}"))
+    return TEAM * 2
+
+
+@pytest.fixture(scope="module")
+def sesion():
+    import models  # noqa: F401  registra todas las tablas
+
+    # esquema propio dentro de una transacción que se descarta: cada corrida
+    # arranca de tablas vacías (sin filas muertas de corridas anteriores que
+    # cambien los costos) y no toca lo que haya en la base
+    engine = create_engine(TEST_DATABASE_URL)
+    conn = engine.connect()
+    trans = conn.begin()
+    try:
+        conn.execute(text("CREATE SCHEMA explain_indices"))
+        conn.execute(text("SET LOCAL search_path TO explain_indices"))
+        # los índices de las migraciones están declarados en los modelos (ver test_migraciones_declaradas)
+        SQLModel.metadata.create_all(conn)
+        chat_id = _sembrar(conn)
+        conn.execute(text("SET LOCAL enable_seqscan = off"))
+        conn.execute(text("SET LOCAL enable_bitmapscan = off"))
+        session = Session(bind=conn, join_transaction_mode="create_savepoint")
+        yield conn, session, chat_id
+        session.close()
+    finally:
+        trans.rollback()
+        conn.close()
+        engine.dispose()
+
+
+def _nodos(plan: dict):
+    yield plan
+    for hijo in plan.get("Plans", []):
+        yield from _nodos(hijo)
+
+
+def _indices_usados(conn, fn) -> set[str]:
+    sentencias: list[tuple[str, object]] = []
+
+    def registrar(_conn, cursor, statement, parameters, context, executemany):
+        sentencias.append((statement, parameters))
+
+    event.listen(conn, "before_cursor_execute", registrar)
+    try:
+        fn()
+    finally:
+        event.remove(conn, "before_cursor_execute", registrar)
+
+    indices: set[str] = set()
+    for sql, parametros in sentencias:
+        if not sql.lstrip().upper().startswith(("SELECT", "WITH")):
+            continue
+        plan = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {sql}", parametros).scalar()[0]["Plan"]
+        indices |= {n["Index Name"] for n in _nodos(plan) if "Index Name" in n}
+    return indices
+
+
+def _casos():
+    from controllers.storage_controller import listar_archivos_de_chat
+    from services import chat_service
+    from services.metrics.chat_list_service import get_chats_by_categoria
+    from services.metrics.chat_metrics_service import get_chat_metrics
+    from services.metrics.pipeline_metrics_service import get_pipeline_metrics
+    from services.metrics.score_metrics_service import get_score_distribution
+    from services.metrics.timeseries_metrics_service import get_timeseries
+
+    # nombre -> (fn(session, chat_id), índices que tienen que aparecer en el plan)
+    return {
+        "get_chat_full": (
+            lambda s, c: chat_service.get_chat_full(TEAM, c, s),
+            {"ix_mensaje_chat_id_created_at", "ix_chatscoreevent_chat_id_creado_en"},
+        ),
+        "get_all_chat": (
+            lambda s, c: chat_service.get_all_chat(TEAM, s),
+            {"ix_mensaje_chat_id_contacto_id"},
+        ),
+        "upsert_contacto": (
+            lambda s, c: chat_service.upsert_contacto(
+                s, team_id=TEAM, nombre="nuevo", telefono="+54 9 261 444-0000", estado=0),
+            {"ux_contacto_team_id_telefono_key"},
+        ),
+        "metrics_pipeline": (
+            lambda s, c: get_pipeline_metrics(TEAM, s),
+            {"ix_mensaje_chat_id_contacto_id"},
+        ),
+        "metrics_score": (
+            lambda s, c: get_score_distribution(TEAM, s),
+            {"ix_chat_team_id_score_actual_creado_en"},
+        ),
+        "metrics_timeseries": (
+            lambda s, c: get_timeseries(TEAM, s, days=7),
+            {"ix_chat_team_id_creado_en"},
+        ),
+        "metrics_lista": (
+            lambda s, c: get_chats_by_categoria(
+                team_id=TEAM, session=s, categoria="no_cliente", q=None, limit=50, offset=0),
+            {"ix_mensaje_chat_id_contacto_id"},
+        ),
+        "metrics_chats": (
+            lambda s, c: get_chat_metrics(TEAM, s),
+            {"ix_chat_team_id_pipeline_estado_id"},
+        ),
+        "archivos_de_chat": (
+            lambda s, c: listar_archivos_de_chat(chat_id=c, team_id=TEAM, session=s),
+            {"ix_archivo_chat_id_mensaje_id_id"},
+        ),
+    }
+
+
+@necesita_postgres
+@pytest.mark.parametrize("nombre", list(_casos()))
+def test_consulta_usa_su_indice(sesion, nombre):
+    conn, session, chat_id = sesion
+    fn, esperados = _casos()[nombre]
+    usados = _indices_usados(conn, lambda: fn(session, chat_id))
+    assert esperados <= usados, f"{nombre}: faltan {sorted(esperados - usados)} en el plan (usó {sorted(usados)})"
+
+
+def _indices_de_modelos() -> set[str]:
+    import models  # noqa: F401
+
+    return {i.name for t in SQLModel.metadata.tables.values() for i in t.indexes}
+
+
+def test_migraciones_declaradas():
+    # el esquema de arriba sale de create_all: los índices de las migraciones
+    # tienen que estar también en los modelos, con el mismo nombre
+    de_migraciones = {nombre for nombre, _, _ in m0001_hot_query_indexes.INDEXES}
+    de_migraciones |= {nombre for nombre, _ in m0007_user_actions_indexes.INDEXES}
+    de_migraciones |= {"ix_archivo_chat_id_mensaje_id_id", "ix_archivo_chat_id_tipo_mensaje_id_id"}  # m0006
+    assert de_migraciones <= _indices_de_modelos()
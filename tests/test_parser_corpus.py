@@ -0,0 +1,70 @@
+# path: tests/test_parser_corpus.py
+"""
+Corpus de conformidad de parser.py: exports chicos escritos a mano en
+tests/corpus_chats/ (Android es/en, iOS es/en, 12 h de es-AR con "p. m.",
+orden mes/día vs día/mes, líneas del sistema y mensajes multilínea), cada uno
+con su <nombre>.json: formato y orden de fecha que se tienen que detectar y
+los mensajes que tiene que devolver parsear_chat.
+
+parsear_chat_paralelo se compara contra parsear_chat sobre los mismos
+archivos, con varios workers para que haya cortes aunque el export sea chico.
+"""
+from __future__ import annotations
+
+import json
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+import parser
+
+CORPUS = Path(__file__).parent / "corpus_chats"
+NOMBRES = sorted(p.stem for p in CORPUS.glob("*.txt"))
+
+
+def _esperado(nombre: str) -> dict:
+    return json.loads((CORPUS / f"{nombre}.json").read_text(encoding="utf-8"))
+
+
+def _mensajes(esperado: dict) -> list[parser.MensajeChat]:
+    return [
+        parser.MensajeChat(datetime.fromisoformat(created_at), usuario, mensaje)
+        for created_at, usuario, mensaje in esperado["mensajes"]
+    ]
+
+
+def _detectar(path: Path):
+    with open(path, encoding="utf-8-sig") as f:
+        lineas = f.readlines()
+    formato = parser.detectar_formato(lineas)
+    return formato, parser.detectar_orden_fecha(lineas, formato)
+
+
+@pytest.mark.parametrize("nombre", NOMBRES)
+def test_deteccion(nombre):
+    esperado = _esperado(nombre)
+    formato, orden = _detectar(CORPUS / f"{nombre}.txt")
+    assert (formato.nombre, orden) == (esperado["formato"], esperado["orden"])
+
+
+@pytest.mark.parametrize("nombre", NOMBRES)
+def test_parsear_chat(nombre):
+    assert parser.parsear_chat(CORPUS / f"{nombre}.txt") == _mensajes(_esperado(nombre))
+
+
+@pytest.mark.parametrize("nombre", NOMBRES)
+def test_bom_y_crlf(nombre, tmp_path):
+    # los exports guardados en Windows traen BOM y fines de línea \r\n
+    path = tmp_path / f"{nombre}.txt"
+    texto = (CORPUS / f"{nombre}.txt").read_text(encoding="utf-8")
+    path.write_bytes(b"\xef\xbb\xbf" + texto.replace("\n", "\r\n").encode("utf-8"))
+    assert parser.parsear_chat(path) == _mensajes(_esperado(nombre))
+
+
+@pytest.mark.parametrize("nombre", NOMBRES)
+def test_paralelo_igual_a_secuencial(nombre):
+    path = CORPUS / f"{nombre}.txt"
+    formato, orden = _detectar(path)
+    paralelo = parser.parsear_chat_paralelo(path, formato, orden == "mdy", workers=3)
+    assert paralelo == parser.parsear_chat(path)